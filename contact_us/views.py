@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from .models import ContactUs
 from .serializers import ContactUsSerializer
 from users.permissions import role_based_permission_class
+from recipe_config.streaming import StreamingListMixin
 
 
 class ContactUsAPIView(APIView):
@@ -16,7 +17,8 @@ class ContactUsAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # API to list all contact messages (accessible only to admins)
-class ContactUsListAPIView(generics.ListAPIView):
+# ?stream=true streams it one message at a time, for exports
+class ContactUsListAPIView(StreamingListMixin, generics.ListAPIView):
     queryset = ContactUs.objects.all().order_by('-created_at')
     serializer_class = ContactUsSerializer
     permission_classes = [IsAuthenticated, role_based_permission_class(allowed_roles=['Admin'])]
\ No newline at end of file
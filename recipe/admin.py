@@ -6,7 +6,12 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',), }
 
 admin.site.register(models.Category, CategoryAdmin)
-admin.site.register(models.Recipe)
+class RecipeAdmin(admin.ModelAdmin):
+    list_display = ['title', 'user', 'created_on', 'duplicate_of']
+    list_filter = [('duplicate_of', admin.EmptyFieldListFilter)]
+    raw_id_fields = ['duplicate_of']
+
+admin.site.register(models.Recipe, RecipeAdmin)
 admin.site.register(models.Reaction)
 admin.site.register(models.Comment)
 admin.site.register(models.Review)
\ No newline at end of file
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        import recipe.signals
+        from django.db.backends.signals import connection_created
+        from recipe_config.sqlite import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='recipe_config.sqlite')
@@ -0,0 +1,199 @@
+import asyncio
+import math
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from recipe_config.renderers import render_json
+from users.authentication import aauthenticate
+from . import models
+from .representation import (
+    RECIPE_VALUES, REACTION_TYPES,
+    recipe_data, comment_data, category_data,
+    reaction_count_rows, category_rows, comment_rows, viewer_reaction_rows, viewer_save_rows,
+)
+from .views import RecipeFilter, RecipePagination
+
+# Async twins of the hot read endpoints, for deployments served through
+# recipe_config/asgi.py. Output is byte-compatible with the DRF views; see
+# recipe/representation.py.
+
+
+def render(data, status=200):
+    return HttpResponse(render_json(data), content_type='application/json', status=status)
+
+
+def error(exc):
+    detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    status = exc.status_code
+    if status == 401:
+        # DRF answers 403 here too: SessionAuthentication comes first and
+        # sends no WWW-Authenticate header
+        status = 403
+    return render(detail, status=status)
+
+
+async def _reaction_counts(recipe_ids):
+    counts = {}
+    async for row in reaction_count_rows(recipe_ids):
+        counts.setdefault(row['recipe_id'], {})[row['reaction_type']] = row['count']
+    return counts
+
+
+async def _categories(recipe_ids):
+    categories = {}
+    async for recipe_id, category_id, name in category_rows(recipe_ids):
+        categories.setdefault(recipe_id, []).append((category_id, name))
+    return categories
+
+
+async def _comments(recipe_ids, viewer):
+    comments = {}
+    async for row in comment_rows(recipe_ids):
+        comments.setdefault(row['recipe_id'], []).append(comment_data(row, viewer))
+    return comments
+
+
+async def _viewer_reactions(recipe_ids, viewer):
+    if not viewer.is_authenticated:
+        return {}
+    return {recipe_id: reaction_type async for recipe_id, reaction_type in viewer_reaction_rows(recipe_ids, viewer)}
+
+
+async def _viewer_saves(recipe_ids, viewer):
+    if not viewer.is_authenticated:
+        return set()
+    return {recipe_id async for recipe_id in viewer_save_rows(recipe_ids, viewer)}
+
+
+async def recipes_payload(rows, viewer):
+    recipe_ids = [row['id'] for row in rows]
+    if not recipe_ids:
+        return []
+    counts, categories, comments, reactions, saves = await asyncio.gather(
+        _reaction_counts(recipe_ids),
+        _categories(recipe_ids),
+        _comments(recipe_ids, viewer),
+        _viewer_reactions(recipe_ids, viewer),
+        _viewer_saves(recipe_ids, viewer),
+    )
+    return [
+        recipe_data(
+            row,
+            categories.get(row['id'], []),
+            comments.get(row['id'], []),
+            counts.get(row['id'], {}),
+            user_reaction=reactions.get(row['id']),
+            is_saved=row['id'] in saves,
+        )
+        for row in rows
+    ]
+
+
+class AsyncRecipeListView(View):
+    async def get(self, request):
+        try:
+            user, _ = await aauthenticate(request)
+        except exceptions.APIException as exc:
+            return error(exc)
+
+        queryset = models.Recipe.objects.all()
+        if request.GET.get('my_recipes') == 'true' and user.is_authenticated:
+            queryset = queryset.filter(user_id=user.pk)
+        elif request.GET.get('saved_recipes') == 'true' and user.is_authenticated:
+            queryset = queryset.filter(saved_by=user.pk)
+
+        filterset = RecipeFilter(request.GET, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            return render(filterset.errors, status=400)
+        if request.GET.get('search_mode') == 'fuzzy' and request.GET.get('search'):
+            # Candidate lookup and rerank in recipe/search.py are sync
+            queryset = await sync_to_async(lambda: filterset.qs)()
+        else:
+            queryset = filterset.qs
+
+        paginator = RecipePagination()
+        page_size = paginator.page_size
+        if paginator.page_size_query_param in request.GET:
+            try:
+                requested = int(request.GET[paginator.page_size_query_param])
+                if requested > 0:
+                    page_size = min(requested, paginator.max_page_size)
+            except ValueError:
+                pass
+
+        count = await queryset.acount()
+        num_pages = max(math.ceil(count / page_size), 1)
+        page_number = request.GET.get(paginator.page_query_param, 1)
+        if page_number in paginator.last_page_strings:
+            page_number = num_pages
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            return render({'detail': str(paginator.invalid_page_message)}, status=404)
+        if page_number < 1 or page_number > num_pages:
+            return render({'detail': str(paginator.invalid_page_message)}, status=404)
+
+        offset = (page_number - 1) * page_size
+        rows = [row async for row in queryset.values(*RECIPE_VALUES)[offset:offset + page_size]]
+        url = request.build_absolute_uri()
+        next_url = replace_query_param(url, paginator.page_query_param, page_number + 1) if page_number < num_pages else None
+        if page_number <= 1:
+            previous_url = None
+        elif page_number - 1 == 1:
+            previous_url = remove_query_param(url, paginator.page_query_param)
+        else:
+            previous_url = replace_query_param(url, paginator.page_query_param, page_number - 1)
+
+        return render({
+            'count': count,
+            'next': next_url,
+            'previous': previous_url,
+            'results': await recipes_payload(rows, user),
+        })
+
+
+class AsyncRecipeDetailView(View):
+    async def get(self, request, pk):
+        try:
+            user, _ = await aauthenticate(request)
+        except exceptions.APIException as exc:
+            return error(exc)
+
+        try:
+            row = await models.Recipe.objects.values(*RECIPE_VALUES).aget(pk=pk)
+        except models.Recipe.DoesNotExist:
+            return render({'detail': 'No Recipe matches the given query.'}, status=404)
+
+        counts, categories, comments, reactions, saves = await asyncio.gather(
+            models.Reaction.objects.filter(recipe_id=pk).aaggregate(
+                **{reaction_type: Count('id', filter=Q(reaction_type=reaction_type)) for reaction_type in REACTION_TYPES}
+            ),
+            _categories([pk]),
+            _comments([pk], user),
+            _viewer_reactions([pk], user),
+            _viewer_saves([pk], user),
+        )
+        return render(recipe_data(
+            row, categories.get(pk, []), comments.get(pk, []), counts,
+            user_reaction=reactions.get(pk), is_saved=pk in saves,
+        ))
+
+
+class AsyncCategoryListView(View):
+    async def get(self, request):
+        rows = models.Category.objects.values('id', 'name', 'slug')
+        return render([category_data(row) async for row in rows])
+
+
+class AsyncRecipeCommentListView(View):
+    async def get(self, request, recipe_pk):
+        try:
+            user, _ = await aauthenticate(request)
+        except exceptions.APIException as exc:
+            return error(exc)
+
+        comments = await _comments([recipe_pk], user)
+        return render(comments.get(recipe_pk, []))
@@ -0,0 +1,246 @@
+import heapq
+import threading
+import time
+import unicodedata
+import logging
+from django.conf import settings
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    # Case-fold and drop accents on Latin letters so "Crème Brûlée" is found
+    # by "creme bru"; marks on other scripts (e.g. Bengali) are meaningful.
+    chars = []
+    latin_base = False
+    for ch in unicodedata.normalize('NFKD', text or ''):
+        if unicodedata.combining(ch):
+            if latin_base:
+                continue
+        else:
+            latin_base = ch.isascii()
+        chars.append(ch)
+    return unicodedata.normalize('NFC', ''.join(chars)).casefold()
+
+
+def tokenize(text):
+    # Letters, marks and digits form tokens; `\w` alone would split Bengali
+    # words at every vowel sign.
+    tokens = []
+    current = []
+    for ch in normalize(text):
+        if unicodedata.category(ch)[0] in 'LMN':
+            current.append(ch)
+        elif current:
+            tokens.append(''.join(current))
+            current = []
+    if current:
+        tokens.append(''.join(current))
+    return tokens
+
+
+class _Node:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        # Every recipe with a term passing through this node, so a prefix
+        # lookup is a single walk instead of a subtree traversal.
+        self.ids = set()
+
+
+class PrefixIndex:
+    """In-memory prefix trie over recipe title and category name tokens."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Held by the one thread rebuilding; searches keep reading the old
+        # trie until the new one is swapped in.
+        self._build_lock = threading.Lock()
+        self._touched = None
+        self._stale = False
+        self._root = _Node()
+        self._terms = {}
+        self._titles = {}
+        self._scores = {}
+        self._built_at = None
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def _needs_build(self):
+        if self._built_at is None or self._stale:
+            return True
+        max_age = getattr(settings, 'RECIPE_AUTOCOMPLETE_REBUILD_SECONDS', 300)
+        return bool(max_age) and time.monotonic() - self._built_at > max_age
+
+    def _insert(self, term, recipe_id):
+        node = self._root
+        for ch in term:
+            node = node.children.setdefault(ch, _Node())
+            node.ids.add(recipe_id)
+
+    def _discard(self, term, recipe_id):
+        node = self._root
+        path = []
+        for ch in term:
+            child = node.children.get(ch)
+            if child is None:
+                break
+            path.append((node, ch, child))
+            child.ids.discard(recipe_id)
+            node = child
+        # Prune branches no recipe uses anymore
+        for parent, ch, child in reversed(path):
+            if child.ids or child.children:
+                break
+            del parent.children[ch]
+
+    def _add(self, recipe_id, title, category_names):
+        terms = set(tokenize(title))
+        for name in category_names:
+            terms.update(tokenize(name))
+        for term in terms:
+            self._insert(term, recipe_id)
+        self._terms[recipe_id] = terms
+        self._titles[recipe_id] = title
+
+    def _remove(self, recipe_id):
+        for term in self._terms.pop(recipe_id, ()):
+            self._discard(term, recipe_id)
+        self._titles.pop(recipe_id, None)
+
+    def build(self):
+        with self._lock:
+            # Recipes changed from here on may be missing from the rows read
+            # below; they are refreshed again once the new trie is in place.
+            self._touched = set()
+            self._stale = False
+        try:
+            root, terms, titles, scores = self._load()
+        except BaseException:
+            with self._lock:
+                self._touched = None
+                self._stale = True
+            raise
+        with self._lock:
+            self._root = root
+            self._terms = terms
+            self._titles = titles
+            self._scores = scores
+            self._built_at = time.monotonic()
+            touched, self._touched = self._touched, None
+        for recipe_id in touched:
+            self.refresh(recipe_id)
+        logger.info("Built recipe autocomplete index with %d recipes", len(self._titles))
+
+    def _load(self):
+        from .models import Recipe, Reaction
+
+        categories = {}
+        for recipe_id, name in Recipe.category.through.objects.values_list('recipe_id', 'category__name'):
+            categories.setdefault(recipe_id, []).append(name)
+
+        scores = {}
+        reaction_counts = (
+            Reaction.objects.filter(recipe__isnull=False)
+            .values('recipe_id').annotate(count=Count('id'))
+            .values_list('recipe_id', 'count')
+        )
+        for recipe_id, count in reaction_counts:
+            scores[recipe_id] = scores.get(recipe_id, 0) + count
+        save_counts = (
+            Recipe.saved_by.through.objects
+            .values('recipe_id').annotate(count=Count('id'))
+            .values_list('recipe_id', 'count')
+        )
+        for recipe_id, count in save_counts:
+            scores[recipe_id] = scores.get(recipe_id, 0) + count
+
+        # Filled off to the side so searches are not blocked meanwhile
+        fresh = PrefixIndex()
+        for recipe_id, title in Recipe.objects.values_list('id', 'title'):
+            fresh._add(recipe_id, title, categories.get(recipe_id, ()))
+        return fresh._root, fresh._terms, fresh._titles, scores
+
+    def ensure_built(self):
+        if not self._needs_build():
+            return
+        # A stale index is still served while another thread rebuilds it;
+        # only an index that was never built makes searches wait.
+        if not self._build_lock.acquire(blocking=not self.is_built):
+            return
+        try:
+            if self._needs_build():
+                self.build()
+        finally:
+            self._build_lock.release()
+
+    def refresh(self, recipe_id):
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(recipe_id)
+        if not self.is_built:
+            return
+        from .models import Recipe
+
+        row = Recipe.objects.filter(id=recipe_id).values_list('title', flat=True).first()
+        names = []
+        if row is not None:
+            names = list(
+                Recipe.category.through.objects.filter(recipe_id=recipe_id)
+                .values_list('category__name', flat=True)
+            )
+        with self._lock:
+            self._remove(recipe_id)
+            if row is not None:
+                self._add(recipe_id, row, names)
+
+    def invalidate(self):
+        # Rebuilt from the database on the next search, which meanwhile
+        # still gets the current trie
+        with self._lock:
+            self._stale = True
+
+    def discard(self, recipe_id):
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(recipe_id)
+            self._remove(recipe_id)
+            self._scores.pop(recipe_id, None)
+
+    def bump(self, recipe_id, delta):
+        with self._lock:
+            self._scores[recipe_id] = max(self._scores.get(recipe_id, 0) + delta, 0)
+
+    def search(self, query, limit=10):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        self.ensure_built()
+        with self._lock:
+            candidates = []
+            for token in tokens:
+                node = self._root
+                for ch in token:
+                    node = node.children.get(ch)
+                    if node is None:
+                        return []
+                candidates.append(node.ids)
+            # Intersect starting from the rarest token to keep the work small
+            candidates.sort(key=len)
+            matches = candidates[0]
+            for ids in candidates[1:]:
+                matches = matches & ids
+                if not matches:
+                    return []
+            ranked = heapq.nsmallest(
+                limit, matches,
+                key=lambda recipe_id: (-self._scores.get(recipe_id, 0), self._titles[recipe_id].lower(), recipe_id),
+            )
+            return [{'id': recipe_id, 'title': self._titles[recipe_id]} for recipe_id in ranked]
+
+
+recipe_index = PrefixIndex()
@@ -0,0 +1,106 @@
+import hashlib
+import random
+import logging
+from django.db import transaction
+from .autocomplete import tokenize
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# Estimated Jaccard similarity above which a new recipe is flagged. With
+# 16 bands of 4 rows a pair at similarity s shares a bucket with
+# probability 1 - (1 - s^4)^16: > 0.999 at this threshold, 0.64 at 0.5,
+# 0.34 at 0.4, 0.12 at 0.3 and 0.03 at 0.2. Candidates below the threshold
+# cost one signature comparison and are dropped.
+DUPLICATE_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+# Fixed seed so signatures stay comparable across processes and deploys
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(*texts):
+    tokens = []
+    for text in texts:
+        tokens.extend(tokenize(text))
+    if len(tokens) < SHINGLE_SIZE:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    if not shingle_set:
+        return None
+    hashes = [_hash(shingle) for shingle in shingle_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        keys.append(f"{band}:{hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()}")
+    return keys
+
+
+def estimate_similarity(a, b):
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def recipe_signature(recipe):
+    return minhash(shingles(recipe.ingredients, recipe.instructions))
+
+
+def index_recipe(recipe):
+    from .models import RecipeSignature, RecipeBucket
+
+    signature = recipe_signature(recipe)
+    with transaction.atomic():
+        RecipeBucket.objects.filter(recipe=recipe).delete()
+        if signature is None:
+            RecipeSignature.objects.filter(recipe=recipe).delete()
+            return None
+        RecipeSignature.objects.update_or_create(recipe=recipe, defaults={'minhash': signature})
+        RecipeBucket.objects.bulk_create(
+            RecipeBucket(recipe=recipe, key=key) for key in band_keys(signature)
+        )
+    return signature
+
+
+def find_duplicates(recipe, signature=None, threshold=DUPLICATE_THRESHOLD):
+    """Existing recipes likely to be copies of `recipe`, most similar first.
+
+    Only recipes sharing at least one LSH bucket are compared, so the cost
+    depends on the number of near matches rather than the catalog size.
+    """
+    from .models import RecipeSignature, RecipeBucket
+
+    if signature is None:
+        signature = RecipeSignature.objects.filter(recipe=recipe).values_list('minhash', flat=True).first()
+    if signature is None:
+        return []
+
+    candidate_ids = set(
+        RecipeBucket.objects.filter(key__in=band_keys(signature))
+        .exclude(recipe_id=recipe.id)
+        .values_list('recipe_id', flat=True)
+    )
+    if not candidate_ids:
+        return []
+
+    matches = []
+    for recipe_id, other in RecipeSignature.objects.filter(recipe_id__in=candidate_ids).values_list('recipe_id', 'minhash'):
+        score = estimate_similarity(signature, other)
+        if score >= threshold:
+            matches.append((score, recipe_id))
+    matches.sort(key=lambda item: (-item[0], item[1]))
+    logger.debug("Recipe %s: %d LSH candidates, %d duplicates", recipe.id, len(candidate_ids), len(matches))
+    return matches
@@ -0,0 +1,70 @@
+import asyncio
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+
+# (label, sync path, async path)
+ENDPOINTS = [
+    ('recipe list', '/recipes/lists/', '/recipes/async/lists/'),
+    ('recipe list x100', '/recipes/lists/?page_size=100', '/recipes/async/lists/?page_size=100'),
+    ('categories', '/recipes/categories/', '/recipes/async/categories/'),
+]
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync DRF read views with their async variants under concurrent "
+            "load, driving both through Django's ASGI handler.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--recipe', type=int, help="Also benchmark retrieve and comments for this recipe id")
+        parser.add_argument('--token', help="Bearer token, to include per-user fields and the profile endpoint")
+
+    async def _run(self, path, total, concurrency, headers):
+        client = AsyncClient(headers=headers)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        statuses = set()
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                statuses.add(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'rps': total / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'statuses': statuses,
+        }
+
+    def handle(self, *args, **options):
+        endpoints = list(ENDPOINTS)
+        if options['recipe']:
+            pk = options['recipe']
+            endpoints += [
+                ('recipe detail', f'/recipes/lists/{pk}/', f'/recipes/async/lists/{pk}/'),
+                ('recipe comments', f'/recipes/lists/{pk}/comments/', f'/recipes/async/lists/{pk}/comments/'),
+            ]
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+            endpoints.append(('profile', '/accounts/profile/', '/accounts/async/profile/'))
+
+        self.stdout.write(f"{options['requests']} requests per endpoint, concurrency {options['concurrency']}")
+        self.stdout.write(f"{'endpoint':<18}{'mode':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}  status")
+        for label, sync_path, async_path in endpoints:
+            for mode, path in (('sync', sync_path), ('async', async_path)):
+                result = asyncio.run(self._run(path, options['requests'], options['concurrency'], headers))
+                self.stdout.write(
+                    f"{label:<18}{mode:<7}{result['rps']:>9.1f}{result['p50']:>9.1f}{result['p95']:>9.1f}  "
+                    f"{','.join(map(str, sorted(result['statuses'])))}"
+                )
@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from recipe.models import Category, Recipe
+from recipe.views import RecipeFilter
+from users.models import User
+
+WORDS = [
+    "chicken", "beef", "mutton", "fish", "prawn", "egg", "rice", "dal", "potato", "spinach",
+    "curry", "bhuna", "kosha", "jhol", "fry", "biryani", "khichuri", "pulao", "bhorta", "chop",
+]
+
+
+class Command(BaseCommand):
+    help = ("Time the recipe list's category and search filters, as the old JOIN + DISTINCT "
+            "queries and as the current semijoins, on synthetic catalogs. The data is "
+            "created inside a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, nargs='+', default=[10_000, 1_000_000])
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for size in options['recipes']:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self._populate(size, options['categories'])
+                self.stdout.write(f"\n{size} recipes (generated in {time.perf_counter() - started:.1f}s)")
+                self._compare(options['repeat'])
+                transaction.set_rollback(True)
+
+    def _populate(self, size, category_count):
+        rng = random.Random(size)
+        user = User.objects.create(
+            email=f"benchmark-{time.time_ns()}@example.com", firstName="Bench", lastName="Mark",
+            password=make_password(None),
+        )
+        categories = Category.objects.bulk_create(
+            Category(name=f"{WORDS[i % len(WORDS)]} {i}", slug=f"benchmark-{time.time_ns()}-{i}")
+            for i in range(category_count)
+        )
+        through = Recipe.category.through
+        for start in range(0, size, 5000):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    title=" ".join(rng.sample(WORDS, 3)), ingredients="rice, salt", instructions="cook",
+                    user=user,
+                )
+                for _ in range(min(5000, size - start))
+            )
+            through.objects.bulk_create(
+                through(recipe_id=recipe.id, category_id=category.id)
+                for recipe in recipes
+                for category in rng.sample(categories, 2)
+            )
+        self._category_ids = [str(category.id) for category in categories[:3]]
+
+    def _scenarios(self):
+        ids = [int(i) for i in self._category_ids]
+        joined = {
+            'categories': lambda qs: qs.filter(category__id__in=ids).distinct(),
+            'search': lambda qs: qs.filter(Q(title__icontains='kosha') | Q(category__name__icontains='kosha')).distinct(),
+        }
+        params = {'categories': {'categories': ','.join(self._category_ids)}, 'search': {'search': 'kosha'}}
+        yield 'categories', joined['categories'](Recipe.objects.all()), params['categories']
+        yield 'search', joined['search'](Recipe.objects.all()), params['search']
+        yield ('categories + search', joined['search'](joined['categories'](Recipe.objects.all())),
+               {**params['categories'], **params['search']})
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _compare(self, repeat):
+        self.stdout.write(f"{'filter':<22}{'query':<8}{'JOIN+DISTINCT':>16}{'semijoin':>12}")
+        for name, legacy, params in self._scenarios():
+            legacy = legacy.order_by(*RecipeFilter.DEFAULT_ORDERING)
+            current = RecipeFilter(params, queryset=Recipe.objects.all()).qs
+            assert legacy.count() == current.count()
+            for label, run in (
+                ('count', lambda qs: qs.count()),
+                ('page', lambda qs: list(qs.values_list('id', flat=True)[:10])),
+            ):
+                before = self._time(lambda: run(legacy), repeat)
+                after = self._time(lambda: run(current), repeat)
+                self.stdout.write(f"{name:<22}{label:<8}{before:>13.1f} ms{after:>9.1f} ms")
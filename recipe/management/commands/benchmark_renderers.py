@@ -0,0 +1,87 @@
+import statistics
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from recipe.models import Category, Comment, Recipe
+from recipe.serializers import RecipeSerializer
+from recipe_config import renderers
+from users.models import User
+
+
+def page(results):
+    # Same envelope as RecipePagination
+    return {'count': len(results) * 20, 'next': 'http://testserver/recipes/lists/?page=2',
+            'previous': None, 'results': results}
+
+
+class Command(BaseCommand):
+    help = ("Time rendering recipe list pages with DRF's JSONRenderer and with FastJSONRenderer, "
+            "on its stdlib path and with orjson when installed, and check the bytes match. "
+            "Pages are serialized from synthetic recipes created in a rolled-back transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 50, 100])
+        parser.add_argument('--comments', type=int, default=5, help="Comments per recipe.")
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        sizes = options['page_sizes']
+        with transaction.atomic():
+            recipes = self._populate(max(sizes), options['comments'])
+            pages = {size: page(RecipeSerializer(recipes[:size], many=True).data) for size in sizes}
+            transaction.set_rollback(True)
+
+        stdlib = renderers.FastJSONRenderer()
+        stdlib.use_orjson = False
+        candidates = [('DRF JSONRenderer', JSONRenderer()), ('stdlib', stdlib)]
+        if renderers.orjson is not None:
+            candidates.append(('orjson', renderers.FastJSONRenderer()))
+        else:
+            self.stdout.write("orjson is not installed; timing the stdlib path only")
+
+        self.stdout.write(f"{'page size':<10}{'bytes':>9}" + ''.join(f"{name:>18}" for name, _ in candidates))
+        for size, data in pages.items():
+            expected = JSONRenderer().render(data)
+            row = f"{size:<10}{len(expected):>9}"
+            for name, renderer in candidates:
+                if renderer.render(data) != expected:
+                    row += f"{'DIFFERENT':>18}"
+                    continue
+                row += f"{self._time(lambda: renderer.render(data), options['repeat']):>15.2f} ms"
+            self.stdout.write(row)
+
+    def _populate(self, size, comments):
+        user = User.objects.create(
+            email=f"benchmark-{time.time_ns()}@example.com", firstName="Bench", lastName="Mark",
+            password=make_password(None),
+        )
+        categories = Category.objects.bulk_create(
+            Category(name=f"Benchmark {i}", slug=f"benchmark-{time.time_ns()}-{i}") for i in range(3)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                title=f"Shorshe ilish {i}", user=user,
+                ingredients="hilsa, mustard seeds, green chillies, turmeric, mustard oil " * 4,
+                instructions="Grind the mustard, marinate the fish and simmer gently. " * 8,
+            )
+            for i in range(size)
+        )
+        Recipe.category.through.objects.bulk_create(
+            Recipe.category.through(recipe_id=recipe.id, category_id=category.id)
+            for recipe in recipes for category in categories[:2]
+        )
+        Comment.objects.bulk_create(
+            Comment(user=user, recipe=recipe, content=f"Tried it, lovely — comment {n} ✨")
+            for recipe in recipes for n in range(comments)
+        )
+        return list(Recipe.objects.filter(user=user).order_by('id').prefetch_related('comments', 'category'))
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,131 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand
+from recipe_config.sqlite import DEFAULT_PRAGMAS, apply_pragmas, retry_on_locked
+
+SCHEMA = """
+CREATE TABLE recipe (id INTEGER PRIMARY KEY, save_count INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE saved (user_id INTEGER, recipe_id INTEGER, PRIMARY KEY (user_id, recipe_id));
+"""
+
+
+def connect(path, tuned):
+    # Stock settings are what a bare sqlite3 DATABASES entry gets from
+    # Django: rollback journal, 5 s timeout, deferred transactions
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    if tuned:
+        apply_pragmas(conn, DEFAULT_PRAGMAS)
+    return conn
+
+
+def toggle_save(conn, tuned, user_id, recipe_id):
+    # Same shape as RecipeViewSet.save: check, add or remove, bump the counter
+    def attempt():
+        conn.execute("BEGIN IMMEDIATE" if tuned else "BEGIN")
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM saved WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id)
+            ).fetchone()
+            if exists:
+                conn.execute("DELETE FROM saved WHERE user_id = ? AND recipe_id = ?", (user_id, recipe_id))
+                delta = -1
+            else:
+                conn.execute("INSERT INTO saved VALUES (?, ?)", (user_id, recipe_id))
+                delta = 1
+            conn.execute("UPDATE recipe SET save_count = save_count + ? WHERE id = ?", (delta, recipe_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    return retry_on_locked(attempt, backoff=0.005) if tuned else attempt()
+
+
+def run_workload(path, tuned, writers=8, writes=200, readers=4, recipes=20):
+    """Toggle saves from `writers` threads while `readers` threads read.
+
+    Returns {"seconds", "writes", "reads", "errors", "consistent"}; the
+    database must already hold SCHEMA.
+    """
+    setup = connect(path, tuned)
+    setup.executemany("INSERT OR IGNORE INTO recipe (id) VALUES (?)", [(i,) for i in range(1, recipes + 1)])
+    setup.close()
+
+    done = threading.Event()
+    totals = {'writes': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def writer(user_id):
+        conn = connect(path, tuned)
+        rng = random.Random(user_id)
+        ok = errors = 0
+        for _ in range(writes):
+            try:
+                toggle_save(conn, tuned, user_id, rng.randint(1, recipes))
+                ok += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        conn.close()
+        with lock:
+            totals['writes'] += ok
+            totals['errors'] += errors
+
+    def reader():
+        conn = connect(path, tuned)
+        count = 0
+        while not done.is_set():
+            try:
+                conn.execute("SELECT id, save_count FROM recipe ORDER BY save_count DESC LIMIT 10").fetchall()
+                count += 1
+            except sqlite3.OperationalError:
+                pass
+        conn.close()
+        with lock:
+            totals['reads'] += count
+
+    read_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    write_threads = [threading.Thread(target=writer, args=(user_id,)) for user_id in range(1, writers + 1)]
+    started = time.perf_counter()
+    for thread in read_threads + write_threads:
+        thread.start()
+    for thread in write_threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    done.set()
+    for thread in read_threads:
+        thread.join()
+
+    check = connect(path, tuned)
+    counted = check.execute("SELECT COALESCE(SUM(save_count), 0) FROM recipe").fetchone()[0]
+    rows = check.execute("SELECT COUNT(*) FROM saved").fetchone()[0]
+    check.close()
+    return {**totals, 'seconds': seconds, 'consistent': counted == rows}
+
+
+class Command(BaseCommand):
+    help = ("Hammer a scratch SQLite file with concurrent save toggles and readers, once "
+            "with stock settings and once with the WAL/busy_timeout/IMMEDIATE/retry setup "
+            "from recipe_config/sqlite.py, and compare throughput and lock errors.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help="Toggles per writer thread.")
+        parser.add_argument('--readers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'setup':<8}{'seconds':>9}{'writes/s':>10}{'reads/s':>10}{'errors':>8}  consistent")
+        for label, tuned in (('stock', False), ('tuned', True)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                conn = sqlite3.connect(path)
+                conn.executescript(SCHEMA)
+                conn.close()
+                result = run_workload(path, tuned, options['writers'], options['writes'], options['readers'])
+            self.stdout.write(
+                f"{label:<8}{result['seconds']:>9.2f}{result['writes'] / result['seconds']:>10.0f}"
+                f"{result['reads'] / result['seconds']:>10.0f}{result['errors']:>8}  {result['consistent']}"
+            )
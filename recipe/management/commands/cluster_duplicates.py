@@ -0,0 +1,70 @@
+from itertools import groupby
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipe.models import Recipe, RecipeBucket, RecipeSignature
+from recipe import dedup
+
+
+class Command(BaseCommand):
+    help = "Group existing near-duplicate recipes using their MinHash LSH buckets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=dedup.DUPLICATE_THRESHOLD,
+                            help="Minimum estimated Jaccard similarity (default: %(default)s)")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute every signature before clustering")
+        parser.add_argument('--mark', action='store_true',
+                            help="Point duplicate_of of every clustered recipe at the oldest one")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            recipes = Recipe.objects.only('id', 'ingredients', 'instructions')
+            for count, recipe in enumerate(recipes.iterator(), start=1):
+                dedup.index_recipe(recipe)
+                if count % 500 == 0:
+                    self.stdout.write(f"Indexed {count} recipes")
+
+        signatures = dict(RecipeSignature.objects.values_list('recipe_id', 'minhash'))
+        parent = {}
+
+        def find(recipe_id):
+            parent.setdefault(recipe_id, recipe_id)
+            while parent[recipe_id] != recipe_id:
+                parent[recipe_id] = parent[parent[recipe_id]]
+                recipe_id = parent[recipe_id]
+            return recipe_id
+
+        # Only recipes that share a bucket are ever compared
+        compared = set()
+        rows = RecipeBucket.objects.order_by('key', 'recipe_id').values_list('key', 'recipe_id')
+        for _, group in groupby(rows.iterator(), key=lambda row: row[0]):
+            members = [recipe_id for _, recipe_id in group]
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    if (left, right) in compared:
+                        continue
+                    compared.add((left, right))
+                    if find(left) == find(right):
+                        continue
+                    if dedup.estimate_similarity(signatures[left], signatures[right]) >= options['threshold']:
+                        parent[find(right)] = find(left)
+
+        clusters = {}
+        for recipe_id in parent:
+            clusters.setdefault(find(recipe_id), []).append(recipe_id)
+        clusters = sorted((sorted(members) for members in clusters.values() if len(members) > 1), key=len, reverse=True)
+
+        titles = dict(Recipe.objects.filter(id__in=[i for c in clusters for i in c]).values_list('id', 'title'))
+        for members in clusters:
+            original, copies = members[0], members[1:]
+            self.stdout.write(f"{titles[original]} (#{original}): " + ", ".join(f"#{i}" for i in copies))
+
+        if options['mark']:
+            with transaction.atomic():
+                for members in clusters:
+                    Recipe.objects.filter(id__in=members[1:]).update(duplicate_of=members[0])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(clusters)} clusters, {sum(len(c) - 1 for c in clusters)} duplicate recipes "
+            f"({len(compared)} pairs compared)"
+        ))
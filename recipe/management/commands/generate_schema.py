@@ -0,0 +1,30 @@
+import os
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipe_config.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = ("Generate the OpenAPI document once and write it to OPENAPI_SCHEMA_FILE, "
+            "so workers serve it from memory instead of introspecting every view. "
+            "Run it on each deploy.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Path to write; defaults to OPENAPI_SCHEMA_FILE.")
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        if not path:
+            raise CommandError("Set OPENAPI_SCHEMA_FILE or pass --output")
+        started = time.perf_counter()
+        body = generate_schema()
+        elapsed = time.perf_counter() - started
+
+        # Replace atomically so a starting worker never reads half a file
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as f:
+            f.write(body)
+        os.replace(f.name, path)
+        self.stdout.write(f"Wrote {len(body)} bytes to {path} in {elapsed:.2f}s")
@@ -0,0 +1,118 @@
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import get_runner
+
+# Plan lines worth a look: full scans and sorts that could not use an index.
+# SQLite reports "SCAN t", "SCAN t USING INDEX i" and "USE TEMP B-TREE FOR
+# ORDER BY"; PostgreSQL "Seq Scan on t" and "Sort".
+FINDINGS = {
+    'sqlite': re.compile(r'^SCAN (?!CONSTANT ROW)|TEMP B-TREE'),
+    'postgresql': re.compile(r'Seq Scan|^\s*(->\s*)?Sort\b'),
+}
+ROOT = str(Path(settings.BASE_DIR).resolve())
+
+
+def project_tables():
+    return {
+        model._meta.db_table
+        for model in apps.get_models(include_auto_created=True)
+        if str(Path(model._meta.app_config.path).resolve()).startswith(ROOT)
+    }
+
+
+def origin():
+    """The innermost project frame (test or app code) issuing the query."""
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        path = str(Path(frame.filename).resolve())
+        if path.startswith(ROOT) and 'site-packages' not in path and path != __file__:
+            return f"{Path(path).relative_to(ROOT)}:{frame.lineno}"
+    return '?'
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = {}
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            key = (context['connection'].alias, sql)
+            if key not in self.queries:
+                self.queries[key] = (params, origin())
+            self.counts[key] += 1
+        return execute(sql, params, many, context)
+
+
+def advisor_runner(log, report):
+    base = get_runner(settings)
+
+    class AdvisorRunner(base):
+        def run_suite(self, suite, **kwargs):
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(log))
+                return super().run_suite(suite, **kwargs)
+
+        def teardown_databases(self, old_config, **kwargs):
+            # Plans need the test schema, which is about to be dropped
+            report()
+            super().teardown_databases(old_config, **kwargs)
+
+    return AdvisorRunner
+
+
+class Command(BaseCommand):
+    help = ("Run the test suite (or the given labels) capturing every SELECT the ORM "
+            "issues, replay each distinct one through EXPLAIN and list the ones whose "
+            "plan scans a table or sorts without an index.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('labels', nargs='*', help="Test labels, as for manage.py test.")
+        parser.add_argument('--all-tables', action='store_true',
+                            help="Also report queries that only touch Django's own tables.")
+        parser.add_argument('--fail', action='store_true',
+                            help="Exit with an error when anything is reported, for CI.")
+
+    def handle(self, *args, **options):
+        log = QueryLog()
+        findings = []
+        tables = None if options['all_tables'] else project_tables()
+
+        def report():
+            findings.extend(self._explain(log, tables))
+
+        runner = advisor_runner(log, report)(verbosity=0, interactive=False, parallel=1)
+        failures = runner.run_tests(options['labels'])
+
+        self.stdout.write(f"{len(log.queries)} distinct queries captured, {len(findings)} flagged")
+        for count, where, sql, lines in sorted(findings, key=lambda f: -f[0]):
+            self.stdout.write(f"\n{count}x  {where}")
+            self.stdout.write(f"    {sql[:300]}{'...' if len(sql) > 300 else ''}")
+            for line in lines:
+                self.stdout.write(self.style.WARNING(f"    -> {line}"))
+        if failures:
+            self.stderr.write(f"{failures} test(s) failed; their queries are still included")
+        if options['fail'] and findings:
+            raise CommandError(f"{len(findings)} queries scan or sort without an index")
+
+    def _explain(self, log, tables):
+        for (alias, sql), (params, where) in log.queries.items():
+            if tables is not None and not any(f'"{table}"' in sql for table in tables):
+                continue
+            connection = connections[alias]
+            pattern = FINDINGS.get(connection.vendor)
+            if pattern is None:
+                raise CommandError(f"No plan rules for the {connection.vendor} backend")
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            lines = [line for line in plan if pattern.search(line)]
+            if lines:
+                yield log.counts[(alias, sql)], where, sql, lines
@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: this process has imported everything already
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import django
+from django.apps import AppConfig
+
+ready = {}
+create = AppConfig.create.__func__
+
+def timed_create(cls, entry):
+    config = create(cls, entry)
+    original = config.ready
+
+    def timed_ready():
+        start = time.perf_counter()
+        original()
+        ready[config.label] = time.perf_counter() - start
+    config.ready = timed_ready
+    return config
+
+AppConfig.create = classmethod(timed_create)
+phases = {}
+mark = started
+
+def phase(name):
+    global mark
+    now = time.perf_counter()
+    phases[name] = now - mark
+    mark = now
+
+django.setup()
+phase('setup')
+from django.urls import get_resolver
+get_resolver().url_patterns
+phase('urlconf')
+deferred = [name for name in %(watch)r if name not in sys.modules]
+path = %(path)r
+if path:
+    from django.test import Client
+    status = Client().get(path).status_code
+    phase('first_request')
+    Client().get(path)
+    phase('second_request')
+else:
+    status = None
+print(json.dumps({
+    'phases': phases, 'ready': ready, 'status': status, 'deferred': deferred,
+    'total': time.perf_counter() - started, 'modules': len(sys.modules),
+}))
+"""
+
+# Loaded only when enabled or on first use (see settings and urls.py)
+WATCH = ('corsheaders', 'drf_yasg.views', 'drf_yasg.generators', 'swagger_spec_validator')
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def run_probe(path=None, importtime=False, env=None):
+    """Start the app in a new interpreter; returns (report, importtime lines)."""
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c',
+               PROBE % {'watch': WATCH, 'path': path}]
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'recipe_config.settings'),
+           **(env or {})}
+    result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise CommandError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report, result.stderr.splitlines()
+
+
+def summarize_imports(lines):
+    """Import time per top-level package from `python -X importtime` output.
+
+    Returns {package: {"self", "cumulative", "modules"}} in seconds. The
+    cumulative time counts each import that another package started, so
+    it includes what the package pulled in but not its own submodules twice.
+    """
+    packages = defaultdict(lambda: {'self': 0.0, 'cumulative': 0.0, 'modules': 0})
+    # Parents are printed after their imports; walk backwards to see them first
+    stack = []
+    for line in reversed(lines):
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, module = match.groups()
+        depth = len(indent) // 2
+        del stack[depth:]
+        package = module.split('.')[0]
+        stats = packages[package]
+        stats['self'] += int(own) / 1e6
+        stats['modules'] += 1
+        if not stack or stack[-1] != package:
+            stats['cumulative'] += int(cumulative) / 1e6
+        stack.append(package)
+    return dict(packages)
+
+
+class Command(BaseCommand):
+    help = ("Start the project in fresh interpreters and report where cold-start time goes: "
+            "import time per package, each AppConfig.ready(), URLconf loading, and the time "
+            "to serve the first request (median of --runs starts).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/recipes/categories/',
+                            help="Request served after startup; '' to stop after the URLconf.")
+        parser.add_argument('--runs', type=int, default=5, help="Starts to time, without -X importtime.")
+        parser.add_argument('--top', type=int, default=15, help="Packages to list.")
+
+    def handle(self, *args, **options):
+        path, runs = options['path'] or None, max(options['runs'], 1)
+        report, lines = run_probe(path, importtime=True)
+        packages = summarize_imports(lines)
+
+        self.stdout.write(f"{'package':<32}{'self ms':>10}{'cumul. ms':>11}{'modules':>9}")
+        ranked = sorted(packages.items(), key=lambda item: -item[1]['cumulative'])
+        for name, stats in ranked[:options['top']]:
+            self.stdout.write(
+                f"{name:<32}{stats['self'] * 1000:>10.1f}{stats['cumulative'] * 1000:>11.1f}{stats['modules']:>9}"
+            )
+        self.stdout.write(f"{'all imports':<32}{sum(s['self'] for s in packages.values()) * 1000:>10.1f}"
+                          f"{'':>11}{sum(s['modules'] for s in packages.values()):>9}")
+
+        self.stdout.write("\nAppConfig.ready()")
+        for label, seconds in sorted(report['ready'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {label:<30}{seconds * 1000:>10.1f} ms")
+        if report['deferred']:
+            self.stdout.write(f"\nNot loaded before the first request: {', '.join(report['deferred'])}")
+
+        timings = [run_probe(path)[0] for _ in range(runs)]
+        self.stdout.write(f"\nMedian of {runs} starts (status {timings[0]['status']}):")
+        for name in timings[0]['phases']:
+            median = statistics.median(t['phases'][name] for t in timings)
+            self.stdout.write(f"  {name:<30}{median * 1000:>10.1f} ms")
+        key = 'first_request' if path else 'urlconf'
+        to_first = statistics.median(
+            sum(seconds for name, seconds in t['phases'].items() if name != 'second_request') for t in timings
+        )
+        self.stdout.write(f"  {'time to ' + key.replace('_', ' '):<30}{to_first * 1000:>10.1f} ms")
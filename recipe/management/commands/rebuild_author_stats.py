@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from recipe.stats import rebuild_author_stats, rebuild_recipe_counts, rebuild_recipe_ratings
+
+
+class Command(BaseCommand):
+    help = ("Recompute every AuthorStats row and the per-recipe counters and rating "
+            "aggregates from the recipe, reaction, save and review tables.")
+
+    def handle(self, *args, **options):
+        authors = rebuild_author_stats()
+        rebuild_recipe_counts()
+        recipes = rebuild_recipe_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {authors} authors and ratings for {recipes} recipes"))
@@ -0,0 +1,28 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipe_config.db_router import sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database into every SQLite replica, once or every "
+            "--lag seconds, to run the read-replica routing locally with a lagging replica.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=float, default=0,
+                            help="Seconds between copies; 0 copies once and exits.")
+
+    def handle(self, *args, **options):
+        aliases = settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError("No replicas configured; set DATABASE_REPLICA_URLS")
+        while True:
+            for alias in aliases:
+                try:
+                    sync_sqlite_replica(alias)
+                except ValueError as e:
+                    raise CommandError(str(e)) from e
+            self.stdout.write(f"Synced {', '.join(aliases)}")
+            if not options['lag']:
+                return
+            time.sleep(options['lag'])
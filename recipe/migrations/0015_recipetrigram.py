@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:55
+
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of recipe.search.text_trigrams and the tokenizer it used when
+# this migration was written, so later changes there don't rewrite history
+
+
+def normalize(text):
+    chars = []
+    latin_base = False
+    for ch in unicodedata.normalize('NFKD', text or ''):
+        if unicodedata.combining(ch):
+            if latin_base:
+                continue
+        else:
+            latin_base = ch.isascii()
+        chars.append(ch)
+    return unicodedata.normalize('NFC', ''.join(chars)).casefold()
+
+
+def tokenize(text):
+    tokens = []
+    current = []
+    for ch in normalize(text):
+        if unicodedata.category(ch)[0] in 'LMN':
+            current.append(ch)
+        elif current:
+            tokens.append(''.join(current))
+            current = []
+    if current:
+        tokens.append(''.join(current))
+    return tokens
+
+
+def text_trigrams(text):
+    trigrams = set()
+    for token in tokenize(text):
+        if token.isdigit():
+            continue
+        padded = f"  {token} "
+        trigrams |= {padded[i:i + 3] for i in range(len(padded) - 2)}
+    return trigrams
+
+
+def build_trigram_index(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    RecipeTrigram = apps.get_model('recipe', 'RecipeTrigram')
+    for recipe in Recipe.objects.only('id', 'title', 'ingredients').iterator():
+        trigrams = text_trigrams(recipe.title) | text_trigrams(recipe.ingredients)
+        RecipeTrigram.objects.bulk_create(
+            RecipeTrigram(recipe_id=recipe.id, trigram=trigram) for trigram in trigrams
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0014_alter_reaction_created_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='recipe.recipe')),
+            ],
+            options={
+                'unique_together': {('trigram', 'recipe')},
+            },
+        ),
+        migrations.RunPython(build_trigram_index, migrations.RunPython.noop),
+    ]
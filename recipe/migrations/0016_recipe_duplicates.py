@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:56
+
+import hashlib
+import random
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of recipe.dedup's signature functions and the tokenizer
+# they used when this migration was written; later changes there must not
+# rewrite history
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text):
+    chars = []
+    latin_base = False
+    for ch in unicodedata.normalize('NFKD', text or ''):
+        if unicodedata.combining(ch):
+            if latin_base:
+                continue
+        else:
+            latin_base = ch.isascii()
+        chars.append(ch)
+    return unicodedata.normalize('NFC', ''.join(chars)).casefold()
+
+
+def tokenize(text):
+    tokens = []
+    current = []
+    for ch in normalize(text):
+        if unicodedata.category(ch)[0] in 'LMN':
+            current.append(ch)
+        elif current:
+            tokens.append(''.join(current))
+            current = []
+    if current:
+        tokens.append(''.join(current))
+    return tokens
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(*texts):
+    tokens = []
+    for text in texts:
+        tokens.extend(tokenize(text))
+    if len(tokens) < SHINGLE_SIZE:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    if not shingle_set:
+        return None
+    hashes = [_hash(shingle) for shingle in shingle_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        keys.append(f"{band}:{hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()}")
+    return keys
+
+
+def build_signatures(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    RecipeSignature = apps.get_model('recipe', 'RecipeSignature')
+    RecipeBucket = apps.get_model('recipe', 'RecipeBucket')
+    for recipe in Recipe.objects.only('id', 'ingredients', 'instructions').iterator():
+        signature = minhash(shingles(recipe.ingredients, recipe.instructions))
+        if signature is None:
+            continue
+        RecipeSignature.objects.create(recipe_id=recipe.id, minhash=signature)
+        RecipeBucket.objects.bulk_create(
+            RecipeBucket(recipe_id=recipe.id, key=key) for key in band_keys(signature)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0015_recipetrigram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='recipe.recipe')),
+                ('minhash', models.JSONField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='recipe.recipe'),
+        ),
+        migrations.CreateModel(
+            name='RecipeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=24)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='recipe.recipe')),
+            ],
+        ),
+        migrations.RunPython(build_signatures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of recipe.stats.rebuild_recipe_ratings and the rating prior
+# in settings when this migration was written; later changes there must
+# not rewrite history
+
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 5
+
+
+def build_ratings(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Review = apps.get_model('recipe', 'Review')
+    ratings = {}
+    rows = Review.objects.values('recipe_id', 'rating').annotate(n=models.Count('id')).order_by()
+    for row in rows:
+        recipe = ratings.setdefault(row['recipe_id'], {
+            'rating_sum': 0, 'rating_count': 0,
+            **{f'rating_{stars}_count': 0 for stars in range(1, 6)},
+        })
+        recipe['rating_sum'] += row['rating'] * row['n']
+        recipe['rating_count'] += row['n']
+        recipe[f'rating_{row["rating"]}_count'] = row['n']
+    for recipe_id, fields in ratings.items():
+        fields['rating_score'] = (
+            (PRIOR_MEAN * PRIOR_WEIGHT + fields['rating_sum']) / (PRIOR_WEIGHT + fields['rating_count'])
+        )
+        Recipe.objects.filter(pk=recipe_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0016_recipe_duplicates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['rating_score', 'id'], name='recipe_rating_idx'),
+        ),
+        migrations.RunPython(build_ratings, migrations.RunPython.noop),
+    ]
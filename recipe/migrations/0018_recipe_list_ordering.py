@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# Frozen copy of recipe.stats.rebuild_recipe_counts as it was when this
+# migration was written; later changes there must not rewrite history
+
+def build_counts(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Reaction = apps.get_model('recipe', 'Reaction')
+    saves = Recipe._meta.get_field('saved_by').remote_field.through
+    Recipe.objects.update(
+        reaction_count=Coalesce(Subquery(
+            Reaction.objects.filter(recipe=OuterRef('pk')).values('recipe').annotate(n=Count('id')).values('n')
+        ), 0),
+        save_count=Coalesce(Subquery(
+            saves.objects.filter(recipe=OuterRef('pk')).values('recipe').annotate(n=Count('id')).values('n')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0017_recipe_ratings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='reaction_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='save_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_on', 'id'], name='recipe_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['title', 'id'], name='recipe_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['reaction_count', 'id'], name='recipe_reactions_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['save_count', 'id'], name='recipe_saves_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'created_on', 'id'], name='recipe_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'reaction_count', 'id'], name='recipe_user_reactions_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'save_count', 'id'], name='recipe_user_saves_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'rating_score', 'id'], name='recipe_user_rating_idx'),
+        ),
+        migrations.RunPython(build_counts, migrations.RunPython.noop),
+    ]
@@ -25,6 +25,41 @@ class Recipe(models.Model):
     instructions = models.TextField()
     created_on = models.DateField(auto_now_add=True, null=True, blank=True)
     saved_by = models.ManyToManyField(User, related_name='saved_recipes', blank=True)
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates'
+    )
+    # Engagement counters for ?ordering=reactions / saves, kept in step by
+    # recipe/signals.py
+    reaction_count = models.IntegerField(default=0)
+    save_count = models.IntegerField(default=0)
+    # Review aggregates, kept in step by recipe/signals.py.
+    # rating_score is the Bayesian average used for ?ordering=-rating; it
+    # stays 0 until the first review so unrated recipes sort last.
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    rating_score = models.FloatField(default=0)
+
+    class Meta:
+        # One index per sort key for the list, and one per sort key under an
+        # author filter; each ends in id to match the tie-breaker. Date
+        # ranges ride on the created_on indexes.
+        indexes = [
+            models.Index(fields=['rating_score', 'id'], name='recipe_rating_idx'),
+            models.Index(fields=['created_on', 'id'], name='recipe_created_idx'),
+            models.Index(fields=['title', 'id'], name='recipe_title_idx'),
+            models.Index(fields=['reaction_count', 'id'], name='recipe_reactions_idx'),
+            models.Index(fields=['save_count', 'id'], name='recipe_saves_idx'),
+            models.Index(fields=['user', 'created_on', 'id'], name='recipe_user_created_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_idx'),
+            models.Index(fields=['user', 'reaction_count', 'id'], name='recipe_user_reactions_idx'),
+            models.Index(fields=['user', 'save_count', 'id'], name='recipe_user_saves_idx'),
+            models.Index(fields=['user', 'rating_score', 'id'], name='recipe_user_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} of Mr. {self.user.firstName} {self.user.lastName}"
@@ -41,6 +76,7 @@ class Recipe(models.Model):
         counts['total'] = sum(counts.values()) 
         return counts
 
+
 class Reaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, null=True, blank=True)
@@ -53,6 +89,11 @@ class Reaction(models.Model):
             ('user', 'recipe'),  # One reaction per user per recipe
             ('user', 'comment'),  # One reaction per user per comment
         ]
+        indexes = [
+            # Per-type counts in get_reaction_counts
+            models.Index(fields=['recipe', 'reaction_type'], name='reaction_recipe_type_idx'),
+            models.Index(fields=['comment', 'reaction_type'], name='reaction_comment_type_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(recipe__isnull=False) | models.Q(comment__isnull=False),
@@ -77,6 +118,9 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('reviewer', 'recipe')
+        indexes = [
+            models.Index(fields=['recipe', 'created'], name='review_recipe_created_idx'),
+        ]
 
     def clean(self):
         # Skip the duplicate check since it's already handled in the view :)
@@ -98,6 +142,11 @@ class Comment(models.Model):
     content = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipe', 'created'], name='comment_recipe_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.content} Comment by {self.user.firstName} on {self.recipe.title}"
 
@@ -111,4 +160,31 @@ class Comment(models.Model):
         }
 
     def can_delete(self, user):
-        return user == self.user or user.role == 'Admin'
\ No newline at end of file
+        return user == self.user or user.role == 'Admin'
+
+class RecipeTrigram(models.Model):
+    # Posting list for typo-tolerant search over titles and ingredients
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('trigram', 'recipe')
+
+    def __str__(self):
+        return f"{self.trigram!r} -> {self.recipe_id}"
+
+class RecipeSignature(models.Model):
+    # MinHash of shingled ingredients + instructions, see recipe/dedup.py
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.JSONField()
+
+    def __str__(self):
+        return f"Signature of recipe {self.recipe_id}"
+
+class RecipeBucket(models.Model):
+    # One row per LSH band; the key is "<band>:<hash of the band's rows>"
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='lsh_buckets')
+    key = models.CharField(max_length=24, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> {self.recipe_id}"
\ No newline at end of file
@@ -0,0 +1,132 @@
+import logging
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, When, IntegerField
+from .autocomplete import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Recipes pulled from the posting table before the Python rerank, and the
+# postings read per query trigram (newest recipes first) to find them; the
+# two keep fuzzy search cost flat as the catalog grows. Rare trigrams, which
+# say the most about a match, are read in full.
+CANDIDATE_LIMIT = 200
+POSTINGS_PER_TRIGRAM = 500
+SIMILARITY_THRESHOLD = 0.3
+INGREDIENT_WEIGHT = 0.9
+
+
+def word_trigrams(word):
+    # Same padding as pg_trgm: two spaces in front, one behind
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def search_tokens(text):
+    return {token for token in tokenize(text) if not token.isdigit()}
+
+
+def text_trigrams(text):
+    trigrams = set()
+    for token in search_tokens(text):
+        trigrams |= word_trigrams(token)
+    return trigrams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def index_recipe(recipe):
+    from .models import RecipeTrigram
+
+    trigrams = text_trigrams(recipe.title) | text_trigrams(recipe.ingredients)
+    with transaction.atomic():
+        RecipeTrigram.objects.filter(recipe=recipe).delete()
+        RecipeTrigram.objects.bulk_create(
+            RecipeTrigram(recipe=recipe, trigram=trigram) for trigram in trigrams
+        )
+
+
+def _score(query_grams, title, ingredients):
+    title_grams = [word_trigrams(token) for token in search_tokens(title)]
+    ingredient_grams = [word_trigrams(token) for token in search_tokens(ingredients)]
+    total = 0.0
+    for grams in query_grams:
+        best = max((similarity(grams, other) for other in title_grams), default=0.0)
+        best = max(
+            best,
+            max((similarity(grams, other) for other in ingredient_grams), default=0.0) * INGREDIENT_WEIGHT,
+        )
+        total += best
+    return total / len(query_grams)
+
+
+def candidate_ids(queryset, wanted):
+    """Recipes in `queryset` sharing the most trigrams with the query, from
+    at most POSTINGS_PER_TRIGRAM postings per trigram."""
+    from .models import RecipeTrigram
+
+    postings = RecipeTrigram.objects.order_by('-recipe_id')
+    if queryset.query.where:
+        # Unfiltered, the final queryset.filter() is enough; a subquery
+        # over every recipe would cost more than the postings themselves
+        postings = postings.filter(recipe__in=queryset.values('id'))
+    shared = Counter()
+    for trigram in sorted(wanted):
+        shared.update(postings.filter(trigram=trigram).values_list('recipe_id', flat=True)[:POSTINGS_PER_TRIGRAM])
+    ranked = sorted(shared.items(), key=lambda item: (-item[1], item[0]))
+    return [recipe_id for recipe_id, _ in ranked[:CANDIDATE_LIMIT]]
+
+
+def category_matches(queryset, query_grams):
+    """{recipe id: score} for recipes in categories whose name is close to
+    the query, as exact search matches category names too."""
+    from .models import Category, Recipe
+
+    scores = {}
+    for category_id, name in Category.objects.values_list('id', 'name'):
+        score = _score(query_grams, name, '')
+        if score >= SIMILARITY_THRESHOLD:
+            scores[category_id] = score
+    if not scores:
+        return {}
+    matches = {}
+    rows = (
+        Recipe.category.through.objects.filter(category_id__in=scores, recipe__in=queryset.values('id'))
+        .order_by('-recipe_id').values_list('recipe_id', 'category_id')[:CANDIDATE_LIMIT]
+    )
+    for recipe_id, category_id in rows:
+        matches[recipe_id] = max(matches.get(recipe_id, 0.0), scores[category_id])
+    return matches
+
+
+def fuzzy_search(queryset, value):
+    query_grams = [word_trigrams(token) for token in search_tokens(value)]
+    if not query_grams:
+        return queryset
+
+    candidates = candidate_ids(queryset, set().union(*query_grams))
+    by_category = category_matches(queryset, query_grams)
+    if not candidates and not by_category:
+        return queryset.none()
+
+    scored = []
+    rows = queryset.model.objects.filter(id__in=set(candidates) | set(by_category)).values_list('id', 'title', 'ingredients')
+    for recipe_id, title, ingredients in rows:
+        score = max(_score(query_grams, title, ingredients), by_category.get(recipe_id, 0.0))
+        if score >= SIMILARITY_THRESHOLD:
+            scored.append((score, recipe_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    logger.debug("Fuzzy search %r: %d candidates, %d by category, %d above threshold",
+                 value, len(candidates), len(by_category), len(scored))
+
+    ranked = [recipe_id for _, recipe_id in scored]
+    if not ranked:
+        return queryset.none()
+    return queryset.filter(id__in=ranked).order_by(
+        Case(*[When(id=recipe_id, then=position) for position, recipe_id in enumerate(ranked)],
+             output_field=IntegerField())
+    )
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Recipe, Comment, Category, Reaction, Review
+from .representation import RATING_VALUES, rating_data
 from users.models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -61,6 +62,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True, read_only=True, source='category', slug_field='name'
     )
     reaction_counts = serializers.SerializerMethodField()
+    rating = serializers.SerializerMethodField()
     user_reaction = serializers.SerializerMethodField()
     is_liked_by_user = serializers.SerializerMethodField()
     is_saved_by_user = serializers.SerializerMethodField()
@@ -70,13 +72,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'ingredients', 'instructions', 'created_on', 'category',
             'category_ids', 'category_names', 'img', 'user', 'comments',
-            'reaction_counts', 'user_reaction', 'is_liked_by_user', 'is_saved_by_user'
+            'reaction_counts', 'rating', 'user_reaction', 'is_liked_by_user', 'is_saved_by_user', 'duplicate_of'
         ]
-        read_only_fields = ['user', 'comments', 'created_on', 'category', 'category_names', 'reaction_counts', 'is_liked_by_user', 'is_saved_by_user']
+        read_only_fields = ['user', 'comments', 'created_on', 'category', 'category_names', 'reaction_counts', 'rating', 'is_liked_by_user', 'is_saved_by_user', 'duplicate_of']
 
     def get_reaction_counts(self, obj):
         return obj.get_reaction_counts()
 
+    def get_rating(self, obj):
+        return rating_data({field: getattr(obj, field) for field in RATING_VALUES})
+
     def get_user_reaction(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
@@ -0,0 +1,188 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from users.models import AuthorStats, User
+from .models import Recipe, Reaction, Category, Review
+from .autocomplete import recipe_index
+from . import search, dedup, stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'title' not in update_fields:
+        return
+    recipe_index.refresh(instance.id)
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_trigrams(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'ingredients'} & set(update_fields):
+        return
+    search.index_recipe(instance)
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_signature(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'ingredients', 'instructions'} & set(update_fields):
+        return
+    dedup.index_recipe(instance)
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    recipe_index.discard(instance.id)
+
+@receiver(m2m_changed, sender=Recipe.category.through)
+def reindex_recipe_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipe_index.refresh(instance.id)
+    elif pk_set:
+        # category.recipe_set.add(...) passes the recipe ids in pk_set
+        for recipe_id in pk_set:
+            recipe_index.refresh(recipe_id)
+    else:
+        recipe_index.invalidate()
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reindex_category(sender, instance, **kwargs):
+    # A renamed category touches every recipe filed under it
+    recipe_index.invalidate()
+
+@receiver(post_save, sender=Reaction)
+def count_recipe_reaction(sender, instance, created, **kwargs):
+    if created and instance.recipe_id:
+        recipe_index.bump(instance.recipe_id, 1)
+
+@receiver(post_delete, sender=Reaction)
+def uncount_recipe_reaction(sender, instance, **kwargs):
+    if instance.recipe_id:
+        recipe_index.bump(instance.recipe_id, -1)
+
+@receiver(m2m_changed, sender=Recipe.saved_by.through)
+def count_recipe_save(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        for recipe_id in pk_set:
+            recipe_index.bump(recipe_id, delta)
+    else:
+        recipe_index.bump(instance.id, delta * len(pk_set))
+
+# Author statistics (users.AuthorStats). Reactions and reviews removed by a
+# cascading delete still send post_delete, before their recipe row goes.
+
+@receiver(post_save, sender=Recipe)
+def count_author_recipe(sender, instance, created, **kwargs):
+    if not created:
+        return
+    _, new = AuthorStats.objects.get_or_create(user_id=instance.user_id, defaults={'recipe_count': 1})
+    if not new:
+        stats.bump_author(instance.user_id, recipes=1)
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_author_recipe(sender, instance, **kwargs):
+    # Saves are cleared with a bulk delete that sends no m2m_changed
+    stats.bump_author(instance.user_id, recipes=-1, saves=-instance.saved_by.count())
+
+@receiver(pre_delete, sender=User)
+def uncount_user_saves(sender, instance, **kwargs):
+    stats.bump_recipe_authors(instance.saved_recipes.values_list('id', flat=True), -1)
+
+@receiver(post_save, sender=Reaction)
+def count_author_reaction(sender, instance, created, **kwargs):
+    if created and instance.recipe_id:
+        stats.bump_recipe_author(instance.recipe_id, reactions=1)
+
+@receiver(post_delete, sender=Reaction)
+def uncount_author_reaction(sender, instance, **kwargs):
+    if instance.recipe_id:
+        stats.bump_recipe_author(instance.recipe_id, reactions=-1)
+
+@receiver(m2m_changed, sender=Recipe.saved_by.through)
+def count_author_save(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            stats.bump_recipe_authors(instance.saved_recipes.values_list('id', flat=True), -1)
+        else:
+            stats.bump_author(instance.user_id, saves=-instance.saved_by.count())
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    sign = 1 if action == 'post_add' else -1
+    if reverse:
+        stats.bump_recipe_authors(pk_set, sign)
+    else:
+        stats.bump_author(instance.user_id, saves=sign * len(pk_set))
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if not instance._state.adding:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('recipe_id', 'rating').first()
+
+@receiver(post_save, sender=Review)
+def count_author_rating(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created:
+        stats.bump_recipe_author(instance.recipe_id, rating=instance.rating, ratings=1)
+    elif previous is not None and previous != (instance.recipe_id, instance.rating):
+        recipe_id, rating = previous
+        stats.bump_recipe_author(recipe_id, rating=-rating, ratings=-1)
+        stats.bump_recipe_author(instance.recipe_id, rating=instance.rating, ratings=1)
+
+@receiver(post_delete, sender=Review)
+def uncount_author_rating(sender, instance, **kwargs):
+    stats.bump_recipe_author(instance.recipe_id, rating=-instance.rating, ratings=-1)
+
+# Per-recipe reaction and save counters (Recipe.reaction_count, save_count)
+
+@receiver(post_save, sender=Reaction)
+def count_recipe_reaction_column(sender, instance, created, **kwargs):
+    if created and instance.recipe_id:
+        stats.bump_recipes([instance.recipe_id], reactions=1)
+
+@receiver(post_delete, sender=Reaction)
+def uncount_recipe_reaction_column(sender, instance, **kwargs):
+    if instance.recipe_id:
+        stats.bump_recipes([instance.recipe_id], reactions=-1)
+
+@receiver(m2m_changed, sender=Recipe.saved_by.through)
+def count_recipe_save_column(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            stats.bump_recipes(instance.saved_recipes.values_list('id', flat=True), saves=-1)
+        else:
+            Recipe.objects.filter(pk=instance.pk).update(save_count=0)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    sign = 1 if action == 'post_add' else -1
+    if reverse:
+        stats.bump_recipes(pk_set, saves=sign)
+    else:
+        stats.bump_recipes([instance.pk], saves=sign * len(pk_set))
+
+@receiver(pre_delete, sender=User)
+def uncount_user_save_columns(sender, instance, **kwargs):
+    stats.bump_recipes(instance.saved_recipes.values_list('id', flat=True), saves=-1)
+
+# Per-recipe rating aggregates (Recipe.rating_*), kept here rather than in
+# ReviewViewSet so admin edits, shell work and cascades (a deleted
+# reviewer) keep them right too
+
+@receiver(post_save, sender=Review)
+def count_recipe_rating(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created:
+        stats.apply_rating(instance.recipe_id, instance.rating)
+    elif previous is not None and previous != (instance.recipe_id, instance.rating):
+        recipe_id, rating = previous
+        stats.apply_rating(recipe_id, rating, -1)
+        stats.apply_rating(instance.recipe_id, instance.rating)
+
+@receiver(post_delete, sender=Review)
+def uncount_recipe_rating(sender, instance, **kwargs):
+    stats.apply_rating(instance.recipe_id, instance.rating, -1)
@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
+from users.models import AuthorStats
+from .models import Recipe, Reaction, Review
+
+
+def _changes(recipes=0, reactions=0, saves=0, rating=0, ratings=0):
+    changes = {}
+    if recipes:
+        changes['recipe_count'] = F('recipe_count') + recipes
+    if reactions:
+        changes['reaction_count'] = F('reaction_count') + reactions
+    if saves:
+        changes['save_count'] = F('save_count') + saves
+    if rating or ratings:
+        changes['rating_sum'] = F('rating_sum') + rating
+        changes['rating_count'] = F('rating_count') + ratings
+        # The right-hand side sees the old values, hence the repeated deltas
+        changes['average_rating'] = Coalesce(
+            Cast(F('rating_sum') + rating, FloatField())
+            / Cast(NullIf(F('rating_count') + ratings, 0), FloatField()),
+            Value(0.0),
+        )
+    return changes
+
+
+def bump_author(user_id, **deltas):
+    changes = _changes(**deltas)
+    if changes:
+        AuthorStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def bump_recipe_author(recipe_id, **deltas):
+    # One UPDATE with the author looked up in a subquery
+    changes = _changes(**deltas)
+    if changes:
+        author = Recipe.objects.filter(pk=recipe_id).values('user_id')[:1]
+        AuthorStats.objects.filter(user_id=Subquery(author)).update(**changes)
+
+
+def bump_recipe_authors(recipe_ids, sign):
+    """Adjust save counts for a set of recipes saved or unsaved by one user."""
+    rows = Recipe.objects.filter(pk__in=recipe_ids).values('user_id').annotate(n=Count('id')).order_by()
+    for row in rows:
+        bump_author(row['user_id'], saves=sign * row['n'])
+
+
+def bump_recipes(recipe_ids, reactions=0, saves=0):
+    changes = {}
+    if reactions:
+        changes['reaction_count'] = F('reaction_count') + reactions
+    if saves:
+        changes['save_count'] = F('save_count') + saves
+    if changes:
+        Recipe.objects.filter(pk__in=recipe_ids).update(**changes)
+
+
+def rebuild_recipe_counts():
+    saves = Recipe.saved_by.through
+    Recipe.objects.update(
+        reaction_count=Coalesce(Subquery(
+            Reaction.objects.filter(recipe=OuterRef('pk')).values('recipe').annotate(n=Count('id')).values('n')
+        ), 0),
+        save_count=Coalesce(Subquery(
+            saves.objects.filter(recipe=OuterRef('pk')).values('recipe').annotate(n=Count('id')).values('n')
+        ), 0),
+    )
+
+
+def _rating_prior():
+    return settings.RECIPE_RATING_PRIOR_MEAN, settings.RECIPE_RATING_PRIOR_WEIGHT
+
+
+def bayesian_score(rating_sum, rating_count):
+    if not rating_count:
+        return 0.0
+    mean, weight = _rating_prior()
+    return (mean * weight + rating_sum) / (weight + rating_count)
+
+
+def apply_rating(recipe_id, rating, sign=1):
+    """Add (sign=1) or remove (sign=-1) one review's rating on a recipe.
+
+    A single UPDATE, so concurrent reviews never lose each other's counts.
+    """
+    mean, weight = _rating_prior()
+    new_sum = F('rating_sum') + sign * rating
+    new_count = F('rating_count') + sign
+    Recipe.objects.filter(pk=recipe_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        **{f'rating_{rating}_count': F(f'rating_{rating}_count') + sign},
+        rating_score=Case(
+            # The last review was removed
+            When(rating_count=-sign, then=Value(0.0)),
+            default=(Cast(new_sum, FloatField()) + mean * weight) / Cast(new_count + weight, FloatField()),
+        ),
+    )
+
+
+def compute_recipe_ratings():
+    """Rating aggregates for every reviewed recipe, keyed by recipe id."""
+    ratings = {}
+    rows = Review.objects.values('recipe_id', 'rating').annotate(n=Count('id')).order_by()
+    for row in rows:
+        recipe = ratings.setdefault(row['recipe_id'], {
+            'rating_sum': 0, 'rating_count': 0,
+            **{f'rating_{stars}_count': 0 for stars in range(1, 6)},
+        })
+        recipe['rating_sum'] += row['rating'] * row['n']
+        recipe['rating_count'] += row['n']
+        recipe[f'rating_{row["rating"]}_count'] = row['n']
+    for recipe in ratings.values():
+        recipe['rating_score'] = bayesian_score(recipe['rating_sum'], recipe['rating_count'])
+    return ratings
+
+
+def rebuild_recipe_ratings():
+    ratings = compute_recipe_ratings()
+    empty = {'rating_sum': 0, 'rating_count': 0, 'rating_score': 0.0,
+             **{f'rating_{stars}_count': 0 for stars in range(1, 6)}}
+    with transaction.atomic():
+        Recipe.objects.exclude(pk__in=list(ratings)).exclude(rating_count=0).update(**empty)
+        for recipe_id, fields in ratings.items():
+            Recipe.objects.filter(pk=recipe_id).update(**fields)
+    return len(ratings)
+
+
+def compute_author_stats():
+    """Aggregate every author's totals from scratch, keyed by user id."""
+    stats = {}
+
+    def row(user_id):
+        return stats.setdefault(user_id, {
+            'recipe_count': 0, 'reaction_count': 0, 'save_count': 0,
+            'rating_sum': 0, 'rating_count': 0, 'average_rating': 0.0,
+        })
+
+    for item in Recipe.objects.values('user_id').annotate(n=Count('id')).order_by():
+        row(item['user_id'])['recipe_count'] = item['n']
+    reactions = Reaction.objects.filter(recipe__isnull=False)
+    for item in reactions.values('recipe__user_id').annotate(n=Count('id')).order_by():
+        row(item['recipe__user_id'])['reaction_count'] = item['n']
+    saves = Recipe.saved_by.through.objects
+    for item in saves.values('recipe__user_id').annotate(n=Count('id')).order_by():
+        row(item['recipe__user_id'])['save_count'] = item['n']
+    for item in Review.objects.values('recipe__user_id').annotate(s=Sum('rating'), n=Count('id')).order_by():
+        author = row(item['recipe__user_id'])
+        author['rating_sum'] = item['s']
+        author['rating_count'] = item['n']
+        author['average_rating'] = item['s'] / item['n']
+    return stats
+
+
+def rebuild_author_stats():
+    stats = compute_author_stats()
+    with transaction.atomic():
+        AuthorStats.objects.all().delete()
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=user_id, **fields) for user_id, fields in stats.items()], batch_size=500
+        )
+    return len(stats)
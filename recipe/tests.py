@@ -1,3 +1,1108 @@
-from django.test import TestCase
+import importlib
+import io
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from unittest import mock
+from datetime import date
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from recipe_config import renderers, schema
+from recipe_config.log import JSONFormatter, QueueConsoleHandler, SamplingFilter
+from recipe_config.db_router import PrimaryReplicaRouter, RoutingState, _state, sync_sqlite_replica
+from recipe_config.sqlite import apply_pragmas, retry_on_locked
+from recipe_config.streaming import stream_json
+from contact_us.models import ContactUs
+from users.authentication import invalidate_cached_user
+from users.models import AuthorStats, User
+from users.revocation import revocation_filter
+from .management.commands.benchmark_sqlite_writes import SCHEMA, run_workload
+from .management.commands.index_advisor import QueryLog
+from .management.commands.profile_startup import WATCH, run_probe, summarize_imports
+from . import dedup, search
+from .autocomplete import PrefixIndex, recipe_index
+from .dedup import band_keys, estimate_similarity, find_duplicates, minhash, shingles
+from .models import Category, Comment, Reaction, Recipe, Review
+from .representation import RATING_VALUES, RECIPE_VALUES, recipes_data
+from .serializers import RecipeSerializer
+from .views import RecipeFilter
+from .stats import compute_author_stats, rebuild_author_stats, rebuild_recipe_ratings
 
-# Create your tests here.
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthorStatsTests(TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        self.fan = User.objects.create_user("fan@example.com", "password123", firstName="Bo", lastName="Fan")
+        self.other = User.objects.create_user("other@example.com", "password123", firstName="Cy", lastName="Other")
+
+    def recipe(self, title="Khichuri", user=None):
+        return Recipe.objects.create(title=title, ingredients="rice, lentils", instructions="boil", user=user or self.chef)
+
+    def stats(self, user=None):
+        return AuthorStats.objects.values(
+            'recipe_count', 'reaction_count', 'save_count', 'rating_sum', 'rating_count', 'average_rating'
+        ).get(user=user or self.chef)
+
+    def assertMatchesRebuild(self):
+        live = {row.pop('user_id'): row for row in AuthorStats.objects.values()}
+        self.assertEqual(live, compute_author_stats())
+
+    def test_counts_follow_engagement(self):
+        first, second = self.recipe(), self.recipe("Biryani")
+        Reaction.objects.create(user=self.fan, recipe=first, reaction_type='LIKE')
+        Reaction.objects.create(user=self.other, recipe=second, reaction_type='WOW')
+        first.saved_by.add(self.fan, self.other)
+        self.fan.saved_recipes.add(second)
+        Review.objects.create(reviewer=self.fan, recipe=first, rating=5)
+        review = Review.objects.create(reviewer=self.other, recipe=second, rating=2)
+        self.assertEqual(self.stats(), {
+            'recipe_count': 2, 'reaction_count': 2, 'save_count': 3,
+            'rating_sum': 7, 'rating_count': 2, 'average_rating': 3.5,
+        })
+
+        review.rating = 4
+        review.save()
+        self.assertEqual(self.stats()['average_rating'], 4.5)
+        first.saved_by.remove(self.fan)
+        self.fan.saved_recipes.clear()
+        self.assertEqual(self.stats()['save_count'], 1)
+        self.assertMatchesRebuild()
+
+    def test_deletes_cascade_into_stats(self):
+        first, second = self.recipe(), self.recipe("Biryani")
+        Reaction.objects.create(user=self.fan, recipe=first, reaction_type='LIKE')
+        Reaction.objects.create(user=self.other, recipe=second, reaction_type='LOVE')
+        first.saved_by.add(self.fan)
+        second.saved_by.add(self.other)
+        Review.objects.create(reviewer=self.fan, recipe=first, rating=5)
+        Review.objects.create(reviewer=self.other, recipe=second, rating=3)
+
+        first.delete()
+        self.assertEqual(self.stats(), {
+            'recipe_count': 1, 'reaction_count': 1, 'save_count': 1,
+            'rating_sum': 3, 'rating_count': 1, 'average_rating': 3.0,
+        })
+        self.other.delete()
+        self.assertEqual(self.stats(), {
+            'recipe_count': 1, 'reaction_count': 0, 'save_count': 0,
+            'rating_sum': 0, 'rating_count': 0, 'average_rating': 0.0,
+        })
+        self.assertMatchesRebuild()
+
+    def test_rebuild(self):
+        recipe = self.recipe()
+        Reaction.objects.create(user=self.fan, recipe=recipe, reaction_type='LIKE')
+        AuthorStats.objects.update(reaction_count=40)
+        self.assertEqual(rebuild_author_stats(), 1)
+        self.assertEqual(self.stats()['reaction_count'], 1)
+
+    def test_migration_backfill(self):
+        recipe = self.recipe()
+        Reaction.objects.create(user=self.fan, recipe=recipe, reaction_type='LIKE')
+        recipe.saved_by.add(self.other)
+        Review.objects.create(reviewer=self.fan, recipe=recipe, rating=4)
+        AuthorStats.objects.all().delete()
+        with mock.patch('recipe.stats.compute_author_stats') as live_code:
+            importlib.import_module('users.migrations.0010_authorstats').build_stats(apps, None)
+        live_code.assert_not_called()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.stats()['save_count'], 1)
+
+    def test_profile_and_leaderboard(self):
+        recipe = self.recipe()
+        Reaction.objects.create(user=self.fan, recipe=recipe, reaction_type='LIKE')
+        self.recipe("Bhorta", user=self.fan)
+        client = APIClient()
+        client.force_authenticate(self.fan)
+
+        response = client.get('/accounts/profile/chef@example.com/')
+        self.assertEqual(response.data["data"]["stats"], {
+            "recipe_count": 1, "reaction_count": 1, "save_count": 0, "rating_count": 0, "average_rating": 0.0,
+        })
+        response = client.get('/accounts/profile/other@example.com/')
+        self.assertEqual(response.data["data"]["stats"]["recipe_count"], 0)
+
+        response = APIClient().get('/accounts/top-chefs/')
+        # Only Chefs and Admins are ranked, and anyone may look
+        self.assertEqual([row["id"] for row in response.data["data"]], [self.chef.id])
+        self.assertNotIn("email", response.data["data"][0])
+        self.assertEqual(client.get('/accounts/top-chefs/', {"ordering": "rating"}).data["data"], [])
+        self.assertEqual(client.get('/accounts/top-chefs/', {"ordering": "views"}).status_code, 400)
+
+    def test_leaderboard_walks_index(self):
+        plan = AuthorStats.objects.order_by('-reaction_count', 'user_id')[:10].explain()
+        self.assertIn("author_top_reactions_idx", plan)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    RECIPE_RATING_PRIOR_MEAN=3.0, RECIPE_RATING_PRIOR_WEIGHT=5,
+)
+class RecipeRatingTests(TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        self.fans = [
+            User.objects.create_user(f"fan{i}@example.com", "password123", firstName="Fan", lastName=str(i))
+            for i in range(3)
+        ]
+        self.khichuri = Recipe.objects.create(title="Khichuri", ingredients="rice", instructions="boil", user=self.chef)
+        self.biryani = Recipe.objects.create(title="Biryani", ingredients="rice", instructions="layer", user=self.chef)
+        self.client = APIClient()
+
+    def review(self, user, recipe, rating):
+        self.client.force_authenticate(user)
+        response = self.client.post('/recipes/reviews/', {"recipe": recipe.id, "rating": rating, "body": ""}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def rating(self, recipe):
+        return self.client.get(f'/recipes/lists/{recipe.id}/').data["rating"]
+
+    def test_aggregates_follow_review_writes(self):
+        first = self.review(self.fans[0], self.khichuri, 5)
+        self.review(self.fans[1], self.khichuri, 4)
+        self.assertEqual(self.rating(self.khichuri), {
+            "average": 4.5, "count": 2, "score": 3.4286,
+            "histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1},
+        })
+
+        self.client.force_authenticate(self.fans[0])
+        self.client.patch(f'/recipes/reviews/{first}/', {"rating": 1}, format='json')
+        rating = self.rating(self.khichuri)
+        self.assertEqual((rating["average"], rating["histogram"]["1"], rating["histogram"]["5"]), (2.5, 1, 0))
+
+        self.client.delete(f'/recipes/reviews/{first}/')
+        self.assertEqual(self.rating(self.khichuri)["count"], 1)
+        self.client.force_authenticate(self.fans[1])
+        self.client.delete(f'/recipes/reviews/{Review.objects.get().id}/')
+        self.assertEqual(self.rating(self.khichuri), {
+            "average": None, "count": 0, "score": 0.0,
+            "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+        })
+
+    def test_aggregates_follow_cascades_and_orm_writes(self):
+        self.review(self.fans[0], self.khichuri, 5)
+        review = Review.objects.create(reviewer=self.fans[1], recipe=self.khichuri, rating=2)
+        review.recipe = self.biryani
+        review.save()
+        self.assertEqual((self.rating(self.khichuri)["count"], self.rating(self.biryani)["average"]), (1, 2.0))
+
+        # The reviews go with their reviewer
+        self.fans[0].delete()
+        self.fans[1].delete()
+        self.client.force_authenticate(None)
+        for recipe in (self.khichuri, self.biryani):
+            self.assertEqual(self.rating(recipe), {
+                "average": None, "count": 0, "score": 0.0,
+                "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+            })
+
+    def test_order_by_bayesian_score(self):
+        # One 5-star review ranks below three 4-star reviews once the prior is applied
+        self.review(self.fans[0], self.biryani, 5)
+        for fan in self.fans:
+            self.review(fan, self.khichuri, 4)
+        third = Recipe.objects.create(title="Bhorta", ingredients="potato", instructions="mash", user=self.chef)
+
+        response = self.client.get('/recipes/lists/', {"ordering": "-rating"})
+        self.assertEqual([r["id"] for r in response.data["results"]], [self.khichuri.id, self.biryani.id, third.id])
+        self.assertEqual(self.client.get('/recipes/lists/', {"ordering": "stars"}).status_code, 500)
+
+    def test_rebuild_matches_incremental(self):
+        self.review(self.fans[0], self.khichuri, 5)
+        self.review(self.fans[1], self.khichuri, 2)
+        live = list(Recipe.objects.order_by('id').values(*RATING_VALUES))
+        Recipe.objects.update(rating_sum=0, rating_count=0, rating_score=0)
+        rebuild_recipe_ratings()
+        self.assertEqual(list(Recipe.objects.order_by('id').values(*RATING_VALUES)), live)
+
+    def test_migration_backfill_is_frozen(self):
+        self.review(self.fans[0], self.khichuri, 5)
+        self.review(self.fans[1], self.khichuri, 2)
+        live = list(Recipe.objects.order_by('id').values(*RATING_VALUES))
+        Recipe.objects.update(rating_sum=0, rating_count=0, rating_score=0)
+        migration = importlib.import_module('recipe.migrations.0017_recipe_ratings')
+        # The prior in settings now is not the one the migration was written for
+        with override_settings(RECIPE_RATING_PRIOR_MEAN=1.0), mock.patch('recipe.stats.compute_recipe_ratings') as live_code:
+            migration.build_ratings(apps, None)
+        live_code.assert_not_called()
+        self.assertEqual(list(Recipe.objects.order_by('id').values(*RATING_VALUES)), live)
+
+    def test_rating_sort_uses_index(self):
+        plan = Recipe.objects.order_by('-rating_score', '-id')[:10].explain()
+        self.assertIn("recipe_rating_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RecipeListOrderingTests(TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        self.fan = User.objects.create_user("fan@example.com", "password123", firstName="Bo", lastName="Fan")
+        self.recipes = [
+            Recipe.objects.create(title=title, ingredients="rice", instructions="cook", user=user)
+            for title, user in (("Bhorta", self.chef), ("Achar", self.fan), ("Chop", self.chef))
+        ]
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(created_on=date(2024, 1, 10))
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(created_on=date(2024, 3, 5))
+        Recipe.objects.filter(pk=self.recipes[2].pk).update(created_on=date(2024, 3, 5))
+        Reaction.objects.create(user=self.fan, recipe=self.recipes[0], reaction_type='LIKE')
+        self.recipes[2].saved_by.add(self.fan, self.chef)
+        self.client = APIClient()
+
+    def titles(self, **params):
+        response = self.client.get('/recipes/lists/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe["title"] for recipe in response.data["results"]]
+
+    def test_orderings_and_filters(self):
+        self.assertEqual(self.titles(), ["Chop", "Achar", "Bhorta"])
+        self.assertEqual(self.titles(ordering="title"), ["Achar", "Bhorta", "Chop"])
+        self.assertEqual(self.titles(ordering="-reactions"), ["Bhorta", "Chop", "Achar"])
+        self.assertEqual(self.titles(ordering="-saves"), ["Chop", "Achar", "Bhorta"])
+        self.assertEqual(self.titles(created_after="2024-02-01", ordering="created_on"), ["Achar", "Chop"])
+        self.assertEqual(self.titles(created_before="2024-02-01"), ["Bhorta"])
+        self.assertEqual(self.titles(author=self.chef.id, ordering="-title"), ["Chop", "Bhorta"])
+
+    def test_counters_follow_engagement(self):
+        self.fan.saved_recipes.clear()
+        self.recipes[0].delete()
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list('reaction_count', 'save_count')), [(0, 0), (0, 1)]
+        )
+        Reaction.objects.create(user=self.chef, recipe=self.recipes[1], reaction_type='WOW')
+        self.chef.delete()
+        self.assertEqual(list(Recipe.objects.values_list('reaction_count', 'save_count')), [(0, 0)])
+
+    def test_migration_backfill(self):
+        Recipe.objects.update(reaction_count=0, save_count=0)
+        importlib.import_module('recipe.migrations.0018_recipe_list_ordering').build_counts(apps, None)
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list('reaction_count', 'save_count')), [(1, 0), (0, 0), (0, 2)]
+        )
+
+    def test_no_combination_scans_and_sorts(self):
+        orderings = [None] + [prefix + key for key in RecipeFilter.ORDERINGS for prefix in ('', '-')]
+        ranges = [{}, {"created_after": "2024-01-01"}, {"created_before": "2025-01-01"},
+                  {"created_after": "2024-01-01", "created_before": "2025-01-01"}]
+        for ordering, author, date_range in itertools.product(orderings, (None, self.chef.id), ranges):
+            params = dict(date_range)
+            if ordering:
+                params["ordering"] = ordering
+            if author:
+                params["author"] = author
+            with self.subTest(**params):
+                filterset = RecipeFilter(params, queryset=Recipe.objects.all())
+                self.assertTrue(filterset.is_valid())
+                plan = filterset.qs[:10].explain()
+                self.assertNotRegex(plan, r"SCAN recipe_recipe(?! USING)")
+                if not date_range:
+                    # Only a date range paired with another sort key needs a sort step
+                    self.assertNotIn("TEMP B-TREE", plan)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RecipeSemijoinFilterTests(TestCase):
+    def setUp(self):
+        chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        self.curry, self.fry, self.rice = (
+            Category.objects.create(name=name, slug=name.lower()) for name in ("Curry", "Fry", "Rice")
+        )
+        self.kosha = Recipe.objects.create(title="Kosha mangsho", ingredients="mutton", instructions="cook", user=chef)
+        self.kosha.category.set([self.curry, self.fry])
+        self.khichuri = Recipe.objects.create(title="Khichuri", ingredients="rice", instructions="cook", user=chef)
+        self.khichuri.category.set([self.rice, self.curry])
+        self.chop = Recipe.objects.create(title="Curry chop", ingredients="potato", instructions="fry", user=chef)
+
+    def filtered(self, **params):
+        filterset = RecipeFilter(params, queryset=Recipe.objects.all())
+        self.assertTrue(filterset.is_valid())
+        return filterset.qs
+
+    def test_rows_stay_unique(self):
+        ids = f"{self.curry.id},{self.fry.id}"
+        self.assertEqual(list(self.filtered(categories=ids)), [self.khichuri, self.kosha])
+        self.assertEqual(list(self.filtered(search="curry")), [self.chop, self.khichuri, self.kosha])
+        self.assertEqual(list(self.filtered(categories=f"{self.rice.id}", search="curry")), [self.khichuri])
+        self.assertEqual(self.filtered(categories=ids, search="curry").count(), 2)
+
+    def test_no_distinct_or_joins(self):
+        cases = [
+            {"categories": f"{self.curry.id},{self.fry.id}"},
+            {"search": "curry"},
+            {"categories": f"{self.curry.id}", "search": "curry"},
+        ]
+        for params in cases:
+            with self.subTest(**params):
+                queryset = self.filtered(**params)
+                sql = str(queryset.query)
+                self.assertNotIn("DISTINCT", sql)
+                self.assertNotIn("JOIN", sql)
+                self.assertNotIn("TEMP B-TREE FOR DISTINCT", queryset.explain())
+                with CaptureQueriesContext(connection) as queries:
+                    queryset.count()
+                # A plain COUNT(*), not COUNT over a DISTINCT subquery
+                self.assertRegex(queries[0]["sql"], r'^SELECT COUNT\(\*\) AS "__count" FROM "recipe_recipe" WHERE')
+                self.assertRegex(queryset.explain(), r"SEARCH \S+ USING INDEX recipe_recipe_category_category_id")
+
+
+class HotPathIndexTests(TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        self.recipe = Recipe.objects.create(title="Khichuri", ingredients="rice", instructions="cook", user=self.chef)
+        self.comment = Comment.objects.create(recipe=self.recipe, user=self.chef, content="Good")
+
+    def test_plans_use_composite_indexes(self):
+        cases = [
+            (Reaction.objects.filter(recipe=self.recipe, reaction_type="LIKE"), "reaction_recipe_type_idx"),
+            (Reaction.objects.filter(comment=self.comment, reaction_type="LIKE"), "reaction_comment_type_idx"),
+            (Comment.objects.filter(recipe=self.recipe).order_by("created"), "comment_recipe_created_idx"),
+            (Review.objects.filter(recipe=self.recipe).order_by("-created"), "review_recipe_created_idx"),
+            (Recipe.objects.filter(user=self.chef).order_by("-created_on", "-id"), "recipe_user_created_idx"),
+        ]
+        for queryset, index in cases:
+            with self.subTest(index=index):
+                plan = queryset.explain()
+                self.assertIn(index, plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+        self.assertRegex(
+            Reaction.objects.filter(recipe=self.recipe, reaction_type="LIKE").values("id").explain(),
+            r"SEARCH \S+ USING COVERING INDEX reaction_recipe_type_idx",
+        )
+
+    def test_query_log_records_distinct_selects_with_origin(self):
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            self.recipe.get_reaction_counts()
+            self.recipe.get_reaction_counts()
+            Category.objects.create(name="Rice", slug="rice")
+        # One entry per SQL text, whatever the parameters; the INSERT is skipped
+        [((alias, sql), (params, where))] = log.queries.items()
+        self.assertEqual(log.counts[(alias, sql)], 8)
+        self.assertTrue(sql.startswith("SELECT COUNT(*)"))
+        self.assertEqual(params, (self.recipe.id, "LIKE"))
+        self.assertTrue(where.startswith("recipe/models.py:"), where)
+
+
+class SQLiteTuningTests(TestCase):
+    def test_new_connections_get_pragmas(self):
+        with connection.cursor() as cursor:
+            values = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("synchronous", "busy_timeout", "cache_size", "temp_store")
+            }
+        # synchronous=NORMAL is 1, temp_store=MEMORY is 2
+        self.assertEqual(values, {"synchronous": 1, "busy_timeout": 5000, "cache_size": -20000, "temp_store": 2})
+
+    def test_file_database_switches_to_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            conn = sqlite3.connect(os.path.join(directory, "db.sqlite3"))
+            apply_pragmas(conn, {"journal_mode": "WAL"})
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            conn.close()
+        with self.assertRaises(ValueError):
+            apply_pragmas(connection.cursor(), {"cache_size": "1; DROP TABLE recipe_recipe"})
+
+    @mock.patch("recipe_config.sqlite.time.sleep")
+    def test_retry_on_locked(self, sleep):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "done"
+
+        self.assertEqual(retry_on_locked(flaky, attempts=5), "done")
+        self.assertEqual((len(calls), sleep.call_count), (3, 2))
+
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            retry_on_locked(flaky, attempts=2)
+        with self.assertRaises(OperationalError):
+            retry_on_locked(mock.Mock(side_effect=OperationalError("no such table: x")))
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_concurrent_writers_do_not_fail(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "db.sqlite3")
+            sqlite3.connect(path).executescript(SCHEMA).connection.close()
+            result = run_workload(path, tuned=True, writers=6, writes=40, readers=2)
+        self.assertEqual((result["writes"], result["errors"]), (240, 0))
+        self.assertTrue(result["consistent"])
+
+    def test_like_and_save_toggle(self):
+        chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        recipe = Recipe.objects.create(title="Khichuri", ingredients="rice", instructions="cook", user=chef)
+        client = APIClient()
+        client.force_authenticate(chef)
+        url = f"/recipes/lists/{recipe.id}/"
+
+        statuses = [client.post(url + "like/", {"reaction_type": kind}).data["status"] for kind in ("LIKE", "WOW", "WOW")]
+        self.assertEqual(statuses, ["reaction added: LIKE", "reaction updated to WOW", "reaction removed"])
+        self.assertFalse(Reaction.objects.exists())
+
+        response = client.post(url + "save/")
+        self.assertEqual((response.data["is_saved_by_user"], response.data["saved_by_count"]), (True, 1))
+        response = client.post(url + "save/")
+        self.assertEqual((response.data["status"], response.data["saved_by_count"]), ("recipe unsaved", 0))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.save_count, 0)
+
+
+@override_settings(DATABASE_REPLICAS=["lagging"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Primary is the test database, the replica a SQLite file that only
+    catches up when synced, like a lagging replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Registered here rather than in settings, so the runner does not
+        # try to create a test database for it
+        cls.databases = {"default", "lagging"}
+        cls.directory = tempfile.TemporaryDirectory()
+        replica = {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.directory.name, "replica.sqlite3")}
+        connections.settings["lagging"] = connections.configure_settings(
+            {"default": connections.settings["default"], "lagging": replica}
+        )["lagging"]
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["lagging"].close()
+        del connections.settings["lagging"]
+        del connections._connections.lagging
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        self.recipe = Recipe.objects.create(title="Khichuri", ingredients="rice", instructions="cook", user=self.chef)
+        sync_sqlite_replica("lagging")
+        self.client = APIClient()
+
+    def test_safe_reads_use_replica_until_synced(self):
+        Recipe.objects.create(title="Bhorta", ingredients="potato", instructions="mash", user=self.chef)
+        self.assertEqual(self.client.get("/recipes/lists/").data["count"], 1)
+        self.assertEqual(self.client.get("/recipes/categories/").status_code, 200)
+        sync_sqlite_replica("lagging")
+        self.assertEqual(self.client.get("/recipes/lists/").data["count"], 2)
+
+    def test_reads_after_write_stick_to_primary(self):
+        self.client.force_authenticate(self.chef)
+        response = self.client.post(f"/recipes/lists/{self.recipe.id}/like/", {"reaction_type": "LOVE"})
+        self.assertEqual(response.cookies["db_primary"]["max-age"], 10)
+        # The replica has not seen the reaction yet; the cookie routes to the primary
+        detail = self.client.get(f"/recipes/lists/{self.recipe.id}/").data
+        self.assertEqual(detail["reaction_counts"]["LOVE"], 1)
+
+        self.client.cookies.clear()
+        detail = self.client.get(f"/recipes/lists/{self.recipe.id}/").data
+        self.assertEqual(detail["reaction_counts"]["LOVE"], 0)
+
+    def test_auth_reads_ignore_replica(self):
+        cache.clear()
+        access = RefreshToken.for_user(self.chef).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.get("/recipes/lists/").status_code, 200)
+
+        # Logged out on another worker; only the primary knows the jti
+        revocation_filter.revoke_token(access, self.chef)
+        revocation_filter._bloom = None
+        self.assertEqual(self.client.get("/recipes/lists/").status_code, 403)
+
+        access = RefreshToken.for_user(self.chef).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        User.objects.filter(pk=self.chef.pk).update(is_active=False)
+        invalidate_cached_user(self.chef.pk)
+        self.assertEqual(self.client.get("/recipes/lists/").status_code, 403)
+
+    def test_streamed_list_reads_one_snapshot(self):
+        # The primary has a comment the replica has not seen yet
+        Comment.objects.create(recipe=self.recipe, user=self.chef, content="Needs salt")
+        streamed = self.client.get("/recipes/lists/", {"stream": "true"})
+        data = json.loads(b"".join(streamed.streaming_content))
+        self.assertEqual([r["id"] for r in data["results"]], [self.recipe.id])
+        self.assertEqual(data["results"][0]["comments"], [])
+
+    def test_router_rules(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), "default")
+        state = RoutingState()
+        state.use_replica = True
+        token = _state.set(state)
+        try:
+            self.assertEqual(router.db_for_read(Recipe), "lagging")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Recipe), "default")
+            self.assertEqual(router.db_for_write(Recipe), "default")
+            # Later reads in the same request see the write
+            self.assertEqual(router.db_for_read(Recipe), "default")
+        finally:
+            _state.reset(token)
+        self.assertFalse(router.allow_migrate("lagging", "recipe"))
+        self.assertIsNone(router.allow_migrate("default", "recipe"))
+
+
+class CachedSchemaTests(TestCase):
+    def setUp(self):
+        schema._cache.clear()
+        self.addCleanup(schema._cache.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "openapi.json")
+        self.enterContext(override_settings(OPENAPI_SCHEMA_FILE=self.path))
+
+    def test_generated_once_and_served_with_etag(self):
+        with mock.patch.object(schema, 'generate_schema', wraps=schema.generate_schema) as generate:
+            first = self.client.get('/swagger/?format=openapi')
+            second = self.client.get('/redoc/?format=openapi')
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Content-Type"], "application/openapi+json; charset=utf-8")
+        self.assertEqual(first.content, second.content)
+        self.assertIn("/recipes/lists/", json.loads(first.content)["paths"])
+        self.assertNotIn("host", json.loads(first.content))
+
+        revalidated = self.client.get('/swagger/?format=openapi', HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], first["ETag"])
+        # Same body, different type, different tag
+        self.assertNotEqual(self.client.get('/swagger/?format=json')["ETag"], first["ETag"])
+
+    def test_yaml_is_derived_from_the_cached_document(self):
+        response = self.client.get('/swagger/?format=yaml')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"/recipes/lists/:", response.content)
+
+    def test_ui_page_does_not_generate(self):
+        with mock.patch.object(schema, 'generate_schema') as generate:
+            response = self.client.get('/swagger/', HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, 200)
+        generate.assert_not_called()
+
+    def test_serves_file_written_by_command(self):
+        call_command('generate_schema', stdout=io.StringIO())
+        with open(self.path, 'rb') as f:
+            written = f.read()
+        with mock.patch.object(schema, 'generate_schema') as generate:
+            response = self.client.get('/swagger/?format=openapi')
+        generate.assert_not_called()
+        self.assertEqual(response.content, written)
+
+    def test_no_file_by_default(self):
+        # A file left over from an earlier deploy is not served
+        with open(self.path, 'wb') as f:
+            f.write(b'{"stale": true}')
+        with override_settings(OPENAPI_SCHEMA_FILE=None):
+            response = self.client.get('/swagger/?format=openapi')
+            with self.assertRaises(CommandError):
+                call_command('generate_schema', stdout=io.StringIO())
+        self.assertIn("/recipes/lists/", json.loads(response.content)["paths"])
+
+
+class LoggingTests(TestCase):
+    def record(self, name, level=logging.INFO, msg="hello %s", args=("world",), exc_info=None):
+        return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+    def test_sampling_filter(self):
+        sampler = SamplingFilter({"users": 1.0, "users.permissions": 0.0})
+        self.assertFalse(sampler.filter(self.record("users.permissions")))
+        self.assertFalse(sampler.filter(self.record("users.permissions.roles", logging.DEBUG)))
+        # Warnings are never dropped, and the prefix only matches whole names
+        self.assertTrue(sampler.filter(self.record("users.permissions", logging.WARNING)))
+        self.assertTrue(sampler.filter(self.record("users.permissionsx")))
+        self.assertTrue(sampler.filter(self.record("users.views")))
+        self.assertTrue(sampler.filter(self.record("recipe.views")))
+
+    def test_sampling_rate(self):
+        sampler = SamplingFilter({"recipe.views": 0.25})
+        with mock.patch("recipe_config.log.random.random", side_effect=[0.1, 0.5]):
+            self.assertTrue(sampler.filter(self.record("recipe.views")))
+            self.assertFalse(sampler.filter(self.record("recipe.views")))
+
+    def test_json_formatter(self):
+        payload = json.loads(JSONFormatter().format(self.record("recipe.views", args=("ভাত",))))
+        self.assertEqual(
+            {k: payload[k] for k in ("level", "logger", "message")},
+            {"level": "INFO", "logger": "recipe.views", "message": "hello ভাত"},
+        )
+        self.assertIn("time", payload)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            line = JSONFormatter().format(self.record("recipe.views", logging.ERROR, exc_info=sys.exc_info()))
+        self.assertEqual(len(line.splitlines()), 1)
+        self.assertIn("ValueError: boom", json.loads(line)["exc"])
+
+    def test_queue_handler_formats_on_listener(self):
+        stream = io.StringIO()
+        handler = QueueConsoleHandler(stream)
+        handler.setFormatter(JSONFormatter())
+        args = ["before"]
+        try:
+            handler.handle(self.record("users.views", args=(args,)))
+            # The message holds the arguments as they were when logged
+            args[0] = "after"
+        finally:
+            handler.close()
+        self.assertEqual(json.loads(stream.getvalue())["message"], "hello ['before']")
+
+    def test_users_logger_skips_debug(self):
+        self.assertFalse(logging.getLogger("users.views").isEnabledFor(logging.DEBUG))
+        self.assertTrue(logging.getLogger("users.views").isEnabledFor(logging.INFO))
+
+
+class StartupProfileTests(TestCase):
+    def test_summarize_imports(self):
+        lines = [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     yaml.error",
+            "import time:       300 |        400 |   yaml",
+            "import time:        50 |         50 |     drf_yasg.errors",
+            "import time:       200 |        250 |   drf_yasg.utils",
+            "import time:      1000 |       1650 | drf_yasg",
+        ]
+        packages = summarize_imports(lines)
+        self.assertEqual(packages["drf_yasg"]["modules"], 3)
+        self.assertAlmostEqual(packages["drf_yasg"]["self"], 0.00125)
+        # Its own submodules are not counted again
+        self.assertAlmostEqual(packages["drf_yasg"]["cumulative"], 0.00165)
+        self.assertAlmostEqual(packages["yaml"]["cumulative"], 0.0004)
+
+    def test_docs_and_cors_are_not_loaded_at_startup(self):
+        report, _ = run_probe(env={"CORS_ALLOWED_ORIGINS": ""})
+        self.assertEqual(report["deferred"], list(WATCH))
+        self.assertIn("users", report["ready"])
+        self.assertEqual(set(report["phases"]), {"setup", "urlconf"})
+        # The default origins install it
+        report, _ = run_probe()
+        self.assertNotIn("corsheaders", report["deferred"])
+
+    def test_configured_origin_gets_cors_headers(self):
+        origin = "https://recipe-hubb.netlify.app"
+        response = self.client.options('/recipes/categories/', HTTP_ORIGIN=origin,
+                                       HTTP_ACCESS_CONTROL_REQUEST_METHOD="POST")
+        self.assertEqual(response["Access-Control-Allow-Origin"], origin)
+        self.assertEqual(response["Access-Control-Allow-Credentials"], "true")
+        response = self.client.get('/recipes/categories/', HTTP_ORIGIN="https://evil.example.com")
+        self.assertNotIn("Access-Control-Allow-Origin", response)
+
+
+class FastJSONTests(TestCase):
+    def payload(self):
+        import datetime, decimal, uuid
+        from django.utils.translation import gettext_lazy
+        utc = datetime.timezone.utc
+        return {
+            "created": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=utc),
+            "local": datetime.datetime(2024, 5, 1, 18, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=6))),
+            "naive": datetime.datetime(2024, 5, 1, 12, 30),
+            "day": datetime.date(2024, 5, 1),
+            "at": datetime.time(7, 45),
+            "took": datetime.timedelta(minutes=90),
+            "price": decimal.Decimal("12.50"),
+            "average": 4.333333333333333,
+            "id": uuid.UUID(int=1),
+            "label": gettext_lazy("Recipe"),
+            "text": "ইলিশ\u2028line\u2029",
+            "counts": {1: 2, "LIKE": 3},
+            "big": 2 ** 70,
+            "nested": [(1, 2), {"a": None, "b": True}],
+        }
+
+    def test_matches_drf_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+        expected = JSONRenderer().render(self.payload())
+        self.assertEqual(renderers.FastJSONRenderer().render(self.payload()), expected)
+        stdlib = renderers.FastJSONRenderer()
+        stdlib.use_orjson = False
+        self.assertEqual(stdlib.render(self.payload()), expected)
+        self.assertIn(b'"created":"2024-05-01T12:30:15.123456Z"', expected)
+        self.assertIn(b"\\u2028", expected)
+
+    def test_indent_and_errors_follow_drf(self):
+        import datetime
+        renderer = renderers.FastJSONRenderer()
+        self.assertEqual(renderer.render({"a": [1]}, "application/json; indent=2"), b'{\n  "a": [\n    1\n  ]\n}')
+        self.assertEqual(renderer.render(None), b"")
+        aware = datetime.time(7, 45, tzinfo=datetime.timezone.utc)
+        with self.assertRaisesMessage(ValueError, "timezone-aware times"):
+            renderer.render({"at": aware})
+
+    def test_parser(self):
+        from rest_framework.exceptions import ParseError
+        parser = renderers.FastJSONParser()
+        body = '{"title": "ইলিশ", "rating": 4.5, "ids": [1, 2]}'.encode()
+        self.assertEqual(parser.parse(io.BytesIO(body)), {"title": "ইলিশ", "rating": 4.5, "ids": [1, 2]})
+        latin = '{"title": "café"}'.encode("latin-1")
+        self.assertEqual(parser.parse(io.BytesIO(latin), parser_context={"encoding": "latin-1"}), {"title": "café"})
+        for bad in (b'{"title": ', b'{"rating": NaN}'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(bad))
+
+    def test_parser_keeps_wide_integers(self):
+        parser = renderers.FastJSONParser()
+        for body in (b'{"id": 123456789012345678901234567890}', b'[-9223372036854775809, 18446744073709551616, 1.5]'):
+            parsed = parser.parse(io.BytesIO(body))
+            self.assertEqual(parsed, json.loads(body))
+            self.assertEqual(repr(parsed), repr(json.loads(body)))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_api_uses_fast_renderer_and_parser(self):
+        user = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Admin")
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/recipes/categories/', {"name": "Bhorta", "slug": "bhorta"}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(json.loads(response.content)["name"], "Bhorta")
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RecipeFastPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        cls.fan = User.objects.create_user("fan@example.com", "password123", firstName="Bo", lastName="Fán")
+        cls.admin = User.objects.create_user("admin@example.com", "password123", firstName="Cy", lastName="Admin", role="Admin")
+        categories = [Category.objects.create(name=f"Bhorta {i}", slug=f"bhorta-{i}") for i in range(3)]
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                title=f"Recipe {i} ভর্তা", ingredients="aloo, mustard oil", instructions="mash\u2028serve",
+                user=cls.chef if i % 2 else cls.fan, img=f"https://example.com/{i}.jpg" if i % 3 else None,
+            )
+            recipe.category.set(categories[i % 3:])
+            if i % 2:
+                Comment.objects.create(user=cls.fan, recipe=recipe, content="Lovely")
+                Comment.objects.create(user=cls.chef, recipe=recipe, content="Thanks")
+            if i % 3 == 0:
+                Reaction.objects.create(user=cls.fan, recipe=recipe, reaction_type="LOVE")
+                Reaction.objects.create(user=cls.admin, recipe=recipe, reaction_type="LIKE")
+                Review.objects.create(reviewer=cls.fan, recipe=recipe, rating=4)
+                Review.objects.create(reviewer=cls.admin, recipe=recipe, rating=i % 5 + 1)
+            if i % 4 == 0:
+                recipe.saved_by.add(cls.fan)
+        Recipe.objects.filter(title="Recipe 5 ভর্তা").update(duplicate_of=Recipe.objects.get(title="Recipe 1 ভর্তা"))
+        rebuild_recipe_ratings()
+
+    def render(self, data):
+        return renderers.FastJSONRenderer().render(data)
+
+    def test_matches_serializer_byte_for_byte(self):
+        from types import SimpleNamespace
+        from django.contrib.auth.models import AnonymousUser
+        recipes = Recipe.objects.order_by(*RecipeFilter.DEFAULT_ORDERING)
+        for viewer in (AnonymousUser(), self.fan, self.chef, self.admin):
+            expected = RecipeSerializer(recipes, many=True, context={'request': SimpleNamespace(user=viewer)}).data
+            fast = recipes_data(list(recipes.values(*RECIPE_VALUES)), viewer)
+            self.assertEqual(self.render(fast), self.render(expected))
+
+    def test_list_and_by_user_views(self):
+        client = APIClient()
+        client.force_authenticate(self.fan)
+        with self.assertNumQueries(7):  # count, page, five lookups for the page
+            response = client.get('/recipes/lists/?page_size=5&page=2')
+        recipes = Recipe.objects.order_by(*RecipeFilter.DEFAULT_ORDERING)[5:10]
+        expected = RecipeSerializer(recipes, many=True, context={'request': response.wsgi_request}).data
+        self.assertEqual(json.loads(response.content)["results"], json.loads(self.render(expected)))
+
+        client.force_authenticate(self.admin)
+        response = client.get('/recipes/by-user/chef@example.com/')
+        recipes = Recipe.objects.filter(user=self.chef).order_by(*RecipeFilter.DEFAULT_ORDERING)
+        expected = RecipeSerializer(recipes, many=True, context={'request': response.wsgi_request}).data
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["results"]["data"], json.loads(self.render(expected)))
+
+
+class StreamingListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        cls.admin = User.objects.create_user("admin@example.com", "password123", firstName="Cy", lastName="Admin", role="Admin")
+        for i in range(30):
+            recipe = Recipe.objects.create(title=f"Recipe {i} ভর্তা", ingredients="aloo", instructions="mash\u2028serve", user=cls.chef)
+            if i % 2:
+                Comment.objects.create(user=cls.admin, recipe=recipe, content="Lovely")
+        for i in range(3):
+            ContactUs.objects.create(name=f"Guest {i}", email=f"guest{i}@example.com", message="Hello")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def streamed(self, path, params):
+        response = self.client.get(path, {**params, "stream": "true"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        return b"".join(response.streaming_content)
+
+    def test_stream_json_matches_render(self):
+        items = [{"n": i, "text": "ভর্তা\u2028" * i} for i in range(50)]
+        envelope = {"count": 50, "results": {"status": "success", "data": items, "tail": None}}
+        with mock.patch("recipe_config.streaming.CHUNK_BYTES", 100):
+            chunks = list(stream_json(iter(items), envelope, path=("results", "data")))
+            self.assertGreater(len(chunks), 2)
+            self.assertEqual(b"".join(chunks), renderers.render_json(envelope))
+        self.assertEqual(b"".join(stream_json(iter(items))), renderers.render_json(items))
+        self.assertEqual(b"".join(stream_json(iter([]), {"results": []})), b'{"results":[]}')
+
+    def test_recipe_list(self):
+        for params in ({"page_size": 100}, {"page_size": 7, "page": 2}, {"page_size": 5, "page": 6}):
+            expected = self.client.get('/recipes/lists/', {**params, "stream": "false"}).content
+            # The page links keep the stream parameter
+            self.assertEqual(self.streamed('/recipes/lists/', params), expected.replace(b"stream=false", b"stream=true"))
+
+    def test_contact_messages(self):
+        expected = self.client.get('/contact/messages/').content
+        self.assertEqual(self.streamed('/contact/messages/', {}), expected)
+        self.assertEqual(len(json.loads(expected)), 3)
+
+
+class AsyncParityTests(TestCase):
+    """The async views must return the DRF views' bytes; representation.py
+    is kept in step with RecipeSerializer by hand."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        cls.fan = User.objects.create_user("fan@example.com", "password123", firstName="Bo", lastName="Fán")
+        categories = [Category.objects.create(name=f"Bhorta {i}", slug=f"bhorta-{i}") for i in range(3)]
+        cls.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                title=f"Recipe {i} ভর্তা", ingredients="aloo, mustard oil", instructions="mash\u2028serve",
+                user=cls.chef if i % 2 else cls.fan,
+            )
+            recipe.category.set(categories[i % 3:])
+            if i % 3 == 0:
+                Comment.objects.create(user=cls.fan, recipe=recipe, content="Lovely")
+                Reaction.objects.create(user=cls.fan, recipe=recipe, reaction_type="LOVE")
+            if i % 4 == 0:
+                recipe.saved_by.add(cls.fan)
+            cls.recipes.append(recipe)
+
+    def assertSameBytes(self, path, **auth):
+        expected = self.client.get(path, **auth)
+        headers = {"Authorization": auth["HTTP_AUTHORIZATION"]} if auth else None
+        actual = async_to_sync(self.async_client.get)(path.replace("/lists/", "/async/lists/").replace("/profile/", "/async/profile/"), headers=headers)
+        self.assertEqual(actual.status_code, expected.status_code, path)
+        # Page links name the view they came from
+        self.assertEqual(actual.content, expected.content.replace(b"/recipes/lists/", b"/recipes/async/lists/"), path)
+
+    def test_list_detail_and_profile(self):
+        token = f"Bearer {RefreshToken.for_user(self.fan).access_token}"
+        paths = [
+            "/recipes/lists/", "/recipes/lists/?page=2&page_size=5", "/recipes/lists/?saved_recipes=true",
+            f"/recipes/lists/{self.recipes[0].pk}/", f"/recipes/lists/{self.recipes[3].pk}/", "/recipes/lists/999999/",
+        ]
+        for auth in ({}, {"HTTP_AUTHORIZATION": token}):
+            for path in paths:
+                with self.subTest(path=path, auth=bool(auth)):
+                    self.assertSameBytes(path, **auth)
+        self.assertSameBytes("/accounts/profile/")
+        self.assertSameBytes("/accounts/profile/", HTTP_AUTHORIZATION=token)
+
+    def test_session_users(self):
+        self.client.force_login(self.fan)
+        self.async_client.force_login(self.fan)
+        self.assertSameBytes("/recipes/lists/?saved_recipes=true")
+        self.assertSameBytes("/accounts/profile/")
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        cls.khichuri = cls.recipe("Bhuna Khichuri")
+        cls.kheer = cls.recipe("Crème Kheer")
+
+    @classmethod
+    def recipe(cls, title):
+        return Recipe.objects.create(title=title, ingredients="rice", instructions="cook", user=cls.chef)
+
+    def snapshot(self, *recipes):
+        # What _load() returns, without reading the database
+        fresh = PrefixIndex()
+        for recipe in recipes:
+            fresh._add(recipe.id, recipe.title, ())
+        return fresh._root, fresh._terms, fresh._titles, {}
+
+    def test_endpoint(self):
+        recipe_index.invalidate()
+        response = self.client.get('/recipes/autocomplete/', {"q": "kh"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({r["id"] for r in response.json()}, {self.khichuri.id, self.kheer.id})
+        response = self.client.get('/recipes/autocomplete/', {"q": "creme k"})
+        self.assertEqual(response.json(), [{"id": self.kheer.id, "title": "Crème Kheer"}])
+
+    def test_stale_index_is_served_while_rebuilding(self):
+        index = PrefixIndex()
+        index.build()
+        index.invalidate()
+        loading, release = threading.Event(), threading.Event()
+        loads = []
+
+        def load():
+            loads.append(1)
+            loading.set()
+            release.wait(5)
+            return self.snapshot(self.khichuri)
+
+        with mock.patch.object(index, "_load", load):
+            rebuild = threading.Thread(target=index.search, args=("kheer",))
+            rebuild.start()
+            self.assertTrue(loading.wait(5))
+            # Other searches neither wait nor start a rebuild of their own
+            with self.assertNumQueries(0):
+                self.assertEqual(index.search("kheer"), [{"id": self.kheer.id, "title": "Crème Kheer"}])
+            release.set()
+            rebuild.join(5)
+        self.assertEqual(loads, [1])
+        self.assertEqual(index.search("kheer"), [])
+        self.assertEqual(index.search("bhuna"), [{"id": self.khichuri.id, "title": "Bhuna Khichuri"}])
+
+    def test_rebuild_on_age(self):
+        index = PrefixIndex()
+        index.build()
+        with mock.patch.object(index, "_load", return_value=self.snapshot(self.khichuri)) as load:
+            index.search("kheer")
+            load.assert_not_called()
+            with override_settings(RECIPE_AUTOCOMPLETE_REBUILD_SECONDS=1), \
+                    mock.patch("recipe.autocomplete.time.monotonic", return_value=index._built_at + 2):
+                self.assertEqual(index.search("kheer"), [])
+            load.assert_called_once()
+
+    def test_changes_during_rebuild_are_kept(self):
+        index = PrefixIndex()
+        index.build()
+        index.invalidate()
+        added = []
+
+        def load():
+            # Read before the recipe below is saved
+            snapshot = self.snapshot(self.khichuri, self.kheer)
+            added.append(self.recipe("Khichuri Deluxe"))
+            index.refresh(added[0].id)
+            return snapshot
+
+        with mock.patch.object(index, "_load", load):
+            index.ensure_built()
+        self.assertEqual(index.search("deluxe"), [{"id": added[0].id, "title": "Khichuri Deluxe"}])
+
+
+class FuzzySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef")
+        cls.dessert = Category.objects.create(name="Desserts", slug="desserts")
+        recipe = lambda title, ingredients: Recipe.objects.create(title=title, ingredients=ingredients, instructions="cook", user=cls.chef)
+        cls.khichuri = recipe("Bhuna Khichuri", "rice, moong dal, ghee")
+        cls.biryani = recipe("Kacchi Biryani", "mutton, basmati rice, saffron")
+        cls.payesh = recipe("Payesh", "rice, milk, jaggery")
+        cls.payesh.category.add(cls.dessert)
+        cls.bhorta = recipe("Aloo Bhorta", "potato, mustard oil, chilli")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, value, **params):
+        response = self.client.get('/recipes/lists/', {"search": value, "search_mode": "fuzzy", **params})
+        self.assertEqual(response.status_code, 200)
+        return [r["id"] for r in response.data["results"]]
+
+    def test_typos_and_ingredients(self):
+        self.assertEqual(self.search("kichuri"), [self.khichuri.id])
+        self.assertEqual(self.search("biriyani"), [self.biryani.id])
+        self.assertEqual(self.search("mustrd"), [self.bhorta.id])
+        self.assertEqual(self.search("zzzz"), [])
+
+    def test_category_names_match(self):
+        self.assertEqual(self.search("desert"), [self.payesh.id])
+        # As in exact mode
+        response = self.client.get('/recipes/lists/', {"search": "Dessert"})
+        self.assertEqual([r["id"] for r in response.data["results"]], [self.payesh.id])
+
+    def test_respects_other_filters(self):
+        other = User.objects.create_user("other@example.com", "password123", firstName="Bo", lastName="Other")
+        self.client.force_authenticate(other)
+        Recipe.objects.create(title="Khichuri", ingredients="rice", instructions="cook", user=other)
+        self.assertEqual(len(self.search("khichuri")), 2)
+        self.assertEqual(len(self.search("khichuri", my_recipes="true")), 1)
+
+    def test_postings_read_are_bounded(self):
+        for i in range(6):
+            Recipe.objects.create(title=f"Rice {i}", ingredients="rice", instructions="cook", user=self.chef)
+        with mock.patch("recipe.search.POSTINGS_PER_TRIGRAM", 2), CaptureQueriesContext(connection) as queries:
+            search.fuzzy_search(Recipe.objects.all(), "rice")
+        postings = [q["sql"] for q in queries.captured_queries if "recipe_recipetrigram" in q["sql"]]
+        # One query per query trigram, each limited
+        self.assertEqual(len(postings), len(search.word_trigrams("rice")))
+        self.assertTrue(all("LIMIT 2" in sql for sql in postings))
+
+
+class DuplicateDetectionTests(TestCase):
+    INGREDIENTS = "hilsa, mustard seeds, green chillies, turmeric, mustard oil, salt"
+    INSTRUCTIONS = "Grind the mustard seeds with chillies. Rub the fish with turmeric and salt, then simmer in mustard oil for ten minutes."
+
+    def setUp(self):
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+
+    def recipe(self, title, instructions=INSTRUCTIONS, ingredients=INGREDIENTS):
+        return Recipe.objects.create(title=title, ingredients=ingredients, instructions=instructions, user=self.chef)
+
+    def test_signatures_and_buckets(self):
+        text = shingles(self.INGREDIENTS, self.INSTRUCTIONS)
+        self.assertIn("hilsa mustard seeds", text)
+        signature = minhash(text)
+        self.assertEqual(len(signature), dedup.NUM_PERM)
+        self.assertEqual(minhash(set(text)), signature)
+        self.assertIsNone(minhash(shingles("", "")))
+        self.assertEqual(len(band_keys(signature)), dedup.BANDS)
+
+        # The estimate tracks the real Jaccard similarity
+        edited = shingles(self.INGREDIENTS, self.INSTRUCTIONS.replace("ten", "twelve"))
+        jaccard = len(text & edited) / len(text | edited)
+        self.assertAlmostEqual(estimate_similarity(signature, minhash(edited)), jaccard, delta=0.15)
+        unrelated = minhash(shingles("potato, onion", "Boil the potatoes and mash them with onion."))
+        self.assertLess(estimate_similarity(signature, unrelated), 0.1)
+        self.assertFalse(set(band_keys(signature)) & set(band_keys(unrelated)))
+
+    def test_new_copy_is_flagged(self):
+        original = self.recipe("Shorshe Ilish")
+        self.recipe("Bhorta", "Boil the potatoes and mash them with onion.", "potato, onion")
+        client = APIClient()
+        client.force_authenticate(self.chef)
+        response = client.post('/recipes/lists/', {
+            "title": "Ilish in mustard", "ingredients": self.INGREDIENTS,
+            "instructions": self.INSTRUCTIONS + " Serve hot.", "category_ids": [],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        copy = Recipe.objects.get(title="Ilish in mustard")
+        self.assertEqual(copy.duplicate_of_id, original.id)
+        self.assertEqual([recipe_id for _, recipe_id in find_duplicates(original)], [copy.id])
+
+    def test_cluster_command(self):
+        original = self.recipe("Shorshe Ilish")
+        copies = [self.recipe(f"Copy {i}", self.INSTRUCTIONS + " Serve hot." * i) for i in (1, 2)]
+        self.recipe("Bhorta", "Boil the potatoes and mash them with onion.", "potato, onion")
+        Recipe.objects.update(duplicate_of=None)
+        out = io.StringIO()
+        call_command("cluster_duplicates", "--rebuild", "--mark", stdout=out)
+        self.assertIn("1 clusters, 2 duplicate recipes", out.getvalue())
+        self.assertEqual(
+            set(Recipe.objects.filter(duplicate_of=original).values_list("id", flat=True)), {c.id for c in copies}
+        )
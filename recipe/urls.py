@@ -8,7 +8,14 @@ from .views import (
     ReviewViewSet,
     CommentViewSet,
     ReactionViewSet,
-    RecipesByUserView  
+    RecipesByUserView,
+    RecipeAutocompleteView
+)
+from .async_views import (
+    AsyncRecipeListView,
+    AsyncRecipeDetailView,
+    AsyncCategoryListView,
+    AsyncRecipeCommentListView
 )
 
 router = DefaultRouter()
@@ -25,6 +32,12 @@ urlpatterns = [
     path('lists/<int:recipe_pk>/comments/', CommentViewSet.as_view({'get': 'list', 'post': 'create'}), name='recipe-comments'),
     path('lists/<int:recipe_pk>/comments/<int:pk>/', CommentViewSet.as_view({'delete': 'destroy'}), name='comment-destroy'),
     path('by-user/<str:email>/', RecipesByUserView.as_view(), name='recipes_by_user'),
+    path('autocomplete/', RecipeAutocompleteView.as_view(), name='recipe-autocomplete'),
+    # Async read-only variants for ASGI deployments
+    path('async/lists/', AsyncRecipeListView.as_view(), name='recipe-list-async'),
+    path('async/lists/<int:pk>/', AsyncRecipeDetailView.as_view(), name='recipe-detail-async'),
+    path('async/lists/<int:recipe_pk>/comments/', AsyncRecipeCommentListView.as_view(), name='recipe-comments-async'),
+    path('async/categories/', AsyncCategoryListView.as_view(), name='category-list-async'),
 ]
 
 if settings.DEBUG:
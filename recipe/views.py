@@ -6,42 +6,99 @@ from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnl
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter, ChoiceFilter, DateFilter, NumberFilter
 from django.db import transaction
 from django.db.models import Q, Count, OuterRef, Subquery
 import logging
 from . import models
 from . import serializers
+from .autocomplete import recipe_index
+from .search import fuzzy_search
+from .dedup import find_duplicates
+from .representation import RECIPE_VALUES, iter_recipes_data, recipes_data
 from users.permissions import role_based_permission, role_based_permission_class 
 from users.models import User, UserProfile
+from users.serializers import author_stats_data
+from recipe_config.sqlite import write_transaction
+from recipe_config.streaming import StreamingJSONResponse, wants_stream
 
 logger = logging.getLogger(__name__)
 
+RecipeCategory = models.Recipe.category.through
+
 class RecipeFilter(FilterSet):
     categories = CharFilter(method='filter_categories')
     search = CharFilter(method='filter_search')
-
+    search_mode = ChoiceFilter(
+        choices=[('exact', 'Exact'), ('fuzzy', 'Fuzzy')], method='filter_search_mode'
+    )
+    created_after = DateFilter(field_name='created_on', lookup_expr='gte')
+    created_before = DateFilter(field_name='created_on', lookup_expr='lte')
+    author = NumberFilter(field_name='user_id')
+    # Sort keys end in id so pagination is stable and the matching
+    # recipe_*_idx index covers the sort, see Recipe.Meta.indexes
+    ORDERINGS = {
+        'created_on': ['created_on', 'id'],
+        'title': ['title', 'id'],
+        'reactions': ['reaction_count', 'id'],
+        'saves': ['save_count', 'id'],
+        'rating': ['rating_score', 'id'],
+    }
+    DEFAULT_ORDERING = ['-created_on', '-id']
+    ordering = ChoiceFilter(
+        choices=[(prefix + key, prefix + key) for key in ORDERINGS for prefix in ('', '-')],
+        method='filter_ordering',
+    )
+
+    # Category conditions are `pk IN (subquery)` semijoins on the through
+    # table rather than joins, so each recipe appears once without DISTINCT
+    # and combined filters add independent subqueries instead of stacking
+    # joins. SQLite evaluates these subqueries once and drives them from the
+    # category_id index; a correlated EXISTS would probe every recipe row,
+    # which made the paginator's COUNT slower than the old join.
     def filter_categories(self, queryset, name, value):
-        logger.info(f"Filtering recipes by category IDs: {value}")
+        logger.debug("Filtering recipes by category IDs: %s", value)
         if not value:
             return queryset
         try:
             category_ids = [int(cat_id.strip()) for cat_id in value.split(',') if cat_id.strip().isdigit()]
             if not category_ids:
                 return queryset
-            return queryset.filter(category__id__in=category_ids).distinct()
+            return queryset.filter(
+                pk__in=RecipeCategory.objects.filter(category_id__in=category_ids).values('recipe_id')
+            )
         except ValueError as e:
-            logger.error(f"Invalid category IDs provided: {value}, error: {str(e)}")
+            logger.error("Invalid category IDs provided: %s, error: %s", value, e)
             return queryset
 
     def filter_search(self, queryset, name, value):
-        logger.info(f"Searching recipes with query: {value}")
+        logger.debug("Searching recipes with query: %s", value)
         if not value:
             return queryset
+        if self.data.get('search_mode') == 'fuzzy':
+            return fuzzy_search(queryset, value)
+        matching_categories = models.Category.objects.filter(name__icontains=value).values('id')
         return queryset.filter(
             Q(title__icontains=value) |
-            Q(category__name__icontains=value)
-        ).distinct()
+            Q(pk__in=RecipeCategory.objects.filter(category_id__in=matching_categories).values('recipe_id'))
+        )
+
+    def filter_search_mode(self, queryset, name, value):
+        # Only changes how `search` is applied, see filter_search
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        columns = self.ORDERINGS[value.lstrip('-')]
+        if value.startswith('-'):
+            columns = ['-' + column for column in columns]
+        return queryset.order_by(*columns)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Newest first unless ?ordering= or a fuzzy search already sorted it
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(*self.DEFAULT_ORDERING)
+        return queryset
 
 class RecipePagination(pagination.PageNumberPagination):
     page_size = 10
@@ -50,6 +107,7 @@ class RecipePagination(pagination.PageNumberPagination):
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = models.Category.objects.all()
+    read_replica = True  # safe requests may read from replicas, see recipe_config/db_router.py
     serializer_class = serializers.CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -60,6 +118,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = models.Recipe.objects.all().prefetch_related('comments')
+    read_replica = True
     serializer_class = serializers.RecipeSerializer
     filter_backends = [DjangoFilterBackend]
     pagination_class = RecipePagination
@@ -83,39 +142,49 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            logger.info(f"Queryset for list: {list(queryset)}")
+            # Read-only fast path: same output as RecipeSerializer, built
+            # from .values() rows (recipe/representation.py)
+            queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*RECIPE_VALUES)
             page = self.paginate_queryset(queryset)
+            if wants_stream(request):
+                # Serialize and encode a recipe at a time inside the page envelope
+                if page is None:
+                    return StreamingJSONResponse(iter_recipes_data(queryset.iterator(), request.user))
+                envelope = self.get_paginated_response([]).data
+                return StreamingJSONResponse(iter_recipes_data(page, request.user), envelope)
             if page is not None:
-                serializer = self.get_serializer(page, many=True, context={'request': request})
-                return self.get_paginated_response(serializer.data)
-            serializer = self.get_serializer(queryset, many=True, context={'request': request})
-            return Response(serializer.data)
+                return self.get_paginated_response(recipes_data(page, request.user))
+            return Response(recipes_data(list(queryset), request.user))
         except Exception as e:
-            logger.error(f"Error in RecipeViewSet list: {str(e)}", exc_info=True)
+            logger.error("Error in RecipeViewSet list: %s", e, exc_info=True)
             return Response({"detail": "Internal Server Error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def create(self, request, *args, **kwargs):
-        logger.info(f"Create request data: {request.data}")
-        logger.info(f"Authenticated user: {request.user if request.user.is_authenticated else 'Anonymous'}")
+        logger.debug("Create recipe request from user %s", request.user)
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         if not self.request.user.is_authenticated:
             logger.error("Unauthenticated user attempted to create a recipe")
             raise ValidationError("User must be authenticated to create a recipe")
-        logger.info(f"Creating recipe for user: {self.request.user.email}")
+        logger.debug("Creating recipe for user: %s", self.request.user.email)
         try:
             recipe = serializer.save(user=self.request.user)
-            logger.info(f"Recipe {recipe.id} created successfully for user {self.request.user.email}")
+            logger.info("Recipe %s created successfully for user %s", recipe.id, self.request.user.email)
+            duplicates = find_duplicates(recipe)
+            if duplicates:
+                score, duplicate_id = duplicates[0]
+                recipe.duplicate_of_id = duplicate_id
+                recipe.save(update_fields=['duplicate_of'])
+                logger.warning("Recipe %s looks like a copy of recipe %s (similarity %.2f)", recipe.id, duplicate_id, score)
         except Exception as e:
-            logger.error(f"Error creating recipe: {str(e)}")
+            logger.error("Error creating recipe: %s", e)
             raise
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, context={'request': request})
-        logger.info(f"Retrieved recipe {instance.id} with comments: {list(instance.comments.all())}")
+        logger.debug("Retrieved recipe %s", instance.id)
         return Response(serializer.data)
 
     def update(self, request, *args, **kwargs):
@@ -147,7 +216,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         self.perform_destroy(recipe)
-        logger.info(f"User {user.email} deleted recipe {recipe.id}")
+        logger.info("User %s deleted recipe %s", user.email, recipe.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
@@ -175,43 +244,48 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        outcome = self._react(recipe, user, reaction_type)
+        if outcome == 'removed':
+            logger.info("User %s removed %s reaction from recipe %s", user.email, reaction_type, recipe.id)
+            return Response({'status': 'reaction removed'})
+        if outcome == 'updated':
+            logger.info("User %s changed reaction to %s for recipe %s", user.email, reaction_type, recipe.id)
+            return Response({'status': f'reaction updated to {reaction_type}'})
+        logger.info("User %s added %s reaction to recipe %s", user.email, reaction_type, recipe.id)
+        return Response({'status': f'reaction added: {reaction_type}'})
+
+    @write_transaction
+    def _react(self, recipe, user, reaction_type):
         reaction = models.Reaction.objects.filter(user=user, recipe=recipe).first()
-
-        if reaction:
-            if reaction.reaction_type == reaction_type:
-                reaction.delete()
-                logger.info(f"User {user.email} removed {reaction_type} reaction from recipe {recipe.id}")
-                return Response({'status': 'reaction removed'})
-            else:
-                reaction.reaction_type = reaction_type
-                reaction.save()
-                logger.info(f"User {user.email} changed reaction to {reaction_type} for recipe {recipe.id}")
-                return Response({'status': f'reaction updated to {reaction_type}'})
-        else:
+        if reaction is None:
             models.Reaction.objects.create(user=user, recipe=recipe, reaction_type=reaction_type)
-            logger.info(f"User {user.email} added {reaction_type} reaction to recipe {recipe.id}")
-            return Response({'status': f'reaction added: {reaction_type}'})
+            return 'added'
+        if reaction.reaction_type == reaction_type:
+            reaction.delete()
+            return 'removed'
+        reaction.reaction_type = reaction_type
+        reaction.save()
+        return 'updated'
 
     @action(detail=True, methods=['post'])
     def save(self, request, pk=None):
         recipe = self.get_object()
         user = request.user
-        if user in recipe.saved_by.all():
+        saved = self._toggle_save(recipe, user)
+        logger.info("User %s %s recipe %s", user.email, 'saved' if saved else 'unsaved', recipe.id)
+        return Response({
+            'status': 'recipe saved' if saved else 'recipe unsaved',
+            'is_saved_by_user': saved,
+            'saved_by_count': recipe.saved_by.count()
+        })
+
+    @write_transaction
+    def _toggle_save(self, recipe, user):
+        if recipe.saved_by.filter(pk=user.pk).exists():
             recipe.saved_by.remove(user)
-            logger.info(f"User {user.email} unsaved recipe {recipe.id}")
-            return Response({
-                'status': 'recipe unsaved',
-                'is_saved_by_user': False,
-                'saved_by_count': recipe.saved_by.count()
-            })
-        else:
-            recipe.saved_by.add(user)
-            logger.info(f"User {user.email} saved recipe {recipe.id}")
-            return Response({
-                'status': 'recipe saved',
-                'is_saved_by_user': True,
-                'saved_by_count': recipe.saved_by.count()
-            })
+            return False
+        recipe.saved_by.add(user)
+        return True
 
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = models.Review.objects.all()
@@ -236,12 +310,22 @@ class ReviewViewSet(viewsets.ModelViewSet):
             existing_review = models.Review.objects.filter(reviewer=self.request.user, recipe=recipe).first()
             if existing_review:
                 raise ValidationError("You have already reviewed this recipe. You can edit your existing review.")
-            logger.info(f"Creating review for user: {self.request.user}")
-            serializer.save(reviewer=self.request.user, recipe=recipe)
+            logger.debug("Creating review for user: %s", self.request.user)
+            # Recipe.rating_* follow through the Review signals
+            with transaction.atomic():
+                serializer.save(reviewer=self.request.user, recipe=recipe)
         except Exception as e:
-            logger.error(f"Error creating review: {str(e)}", exc_info=True)
+            logger.error("Error creating review: %s", e, exc_info=True)
             raise serializers.ValidationError(f"Failed to create review: {str(e)}")
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
     def update(self, request, *args, **kwargs):
         review = self.get_object()
         if review.reviewer != request.user and request.user.role != 'Admin':
@@ -262,6 +346,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = models.Comment.objects.all()
+    read_replica = True
     serializer_class = serializers.CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
@@ -286,14 +371,14 @@ class CommentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         try:
             recipe_pk = self.kwargs.get('recipe_pk')
-            logger.info(f"Creating comment for recipe {recipe_pk}, request data: {self.request.data}")
+            logger.debug("Creating comment for recipe %s", recipe_pk)
             if not recipe_pk:
                 raise serializers.ValidationError("Recipe ID is required and must be provided in the URL.")
             recipe = get_object_or_404(models.Recipe, id=recipe_pk)
             comment = serializer.save(user=self.request.user, recipe=recipe)
-            logger.info(f"Comment created: {comment.id} for recipe {recipe.id}")
+            logger.info("Comment created: %s for recipe %s", comment.id, recipe.id)
         except Exception as e:
-            logger.error(f"Error creating comment: {str(e)}", exc_info=True)
+            logger.error("Error creating comment: %s", e, exc_info=True)
             raise serializers.ValidationError(f"Failed to create comment: {str(e)}")
 
     def destroy(self, request, *args, **kwargs):
@@ -322,7 +407,7 @@ class ReactionViewSet(viewsets.ModelViewSet):
         return [IsAuthenticatedOrReadOnly()]
 
     def perform_create(self, serializer):
-        logger.info(f"Creating reaction for user: {self.request.user}")
+        logger.debug("Creating reaction for user: %s", self.request.user)
         serializer.save(user=self.request.user)
 
     def update(self, request, *args, **kwargs):
@@ -350,28 +435,43 @@ class RecipesByUserView(APIView):
 
     def get(self, request, email):
         try:
-            user = User.objects.get(email=email)
-            recipes = models.Recipe.objects.filter(user=user)
+            user = User.objects.select_related('author_stats').get(email=email)
+            recipes = models.Recipe.objects.filter(user=user).order_by(*RecipeFilter.DEFAULT_ORDERING).values(*RECIPE_VALUES)
             
             paginator = self.pagination_class()
             page = paginator.paginate_queryset(recipes, request)
-            serializer = serializers.RecipeSerializer(page, many=True, context={'request': request})
             
             return paginator.get_paginated_response({
                 "status": "success",
                 "message": "Request Successful",
-                "data": serializer.data,
+                "author_stats": author_stats_data(user),
+                "data": recipes_data(page, request.user),
             })
         except User.DoesNotExist:
-            logger.warning(f"User with email {email} not found")
+            logger.warning("User with email %s not found", email)
             return Response(
                 {"status": "failed", "message": "User not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
         except Exception as e:
-            logger.error(f"Error in RecipesByUserView for email {email}: {str(e)}", exc_info=True)
+            logger.error("Error in RecipesByUserView for email %s: %s", email, e, exc_info=True)
             return Response(
                 {"status": "error", "message": "Internal Server Error"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+
+
+class RecipeAutocompleteView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    max_results = 20
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_results)
+        except ValueError:
+            limit = 10
+        if limit < 1:
+            return Response([])
+        return Response(recipe_index.search(query, limit=limit))
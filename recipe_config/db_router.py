@@ -0,0 +1,132 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Routing state of the request being served; None outside requests
+# (management commands, shells), where everything uses the primary.
+_state = ContextVar('db_routing', default=None)
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a replica when the current request allows it.
+
+    A request may read from replicas when ReplicaRoutingMiddleware saw a
+    safe method on a view with `read_replica = True` and no sticky cookie.
+    Everything else goes to the primary: writes, reads after the request's
+    first write, reads inside a transaction, and work outside requests.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        aliases = replicas()
+        return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        pool = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return False if db in replicas() else None
+
+
+class ReplicaRoutingMiddleware:
+    """Decide per request whether PrimaryReplicaRouter may use replicas.
+
+    After a request that wrote, the client gets a cookie for
+    REPLICA_STICKY_SECONDS so its next reads see its own writes even
+    while the replicas lag behind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and replicas():
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, secure=request.is_secure(), samesite='None' if request.is_secure() else 'Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        state = _state.get()
+        if (
+            state is not None
+            and request.method in SAFE_METHODS
+            and getattr(view_class, 'read_replica', False)
+            and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+        ):
+            state.use_replica = True
+        return None
+
+
+def keep_routing(iterator):
+    """Run each step of `iterator` under the current request's routing.
+
+    Streamed bodies are consumed after ReplicaRoutingMiddleware has reset
+    its state; without this the rows read while streaming would come from
+    the primary even though the view read its page from a replica.
+    """
+    return _routed(iter(iterator), _state.get())
+
+
+def _routed(iterator, state):
+    while True:
+        token = _state.set(state)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield item
+
+
+def sync_sqlite_replica(alias):
+    """Copy the primary into the SQLite replica `alias`.
+
+    For local setups where replicas are plain files refreshed by
+    `manage.py sync_replicas`.
+    """
+    primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+        raise ValueError("sync_sqlite_replica only copies between SQLite databases")
+    primary.ensure_connection()
+    replica.ensure_connection()
+    primary.connection.backup(replica.connection)
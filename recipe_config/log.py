@@ -0,0 +1,91 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueConsoleHandler(QueueHandler):
+    """Console handler that hands records to a background thread.
+
+    Request threads only resolve the message and enqueue it on an unbounded
+    queue; formatting and the blocking write to the stream happen in a
+    QueueListener thread.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self._console = logging.StreamHandler(stream)
+        self._listener = None
+        self._start()
+        atexit.register(self._stop)
+        # Forked workers (gunicorn --preload) do not inherit the thread
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._listener = QueueListener(self.queue, self._console, respect_handler_level=True)
+        self._listener.start()
+
+    def _stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def setFormatter(self, fmt):
+        # The configured formatter runs on the listener thread
+        self._console.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Merge args now, while they still hold the values at call time, but
+        # leave timestamps and layout to the console handler's formatter.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        self._stop()
+        super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of sub-WARNING records from noisy loggers.
+
+    `rates` maps logger name prefixes to the fraction to keep, e.g.
+    {'users.permissions': 0.1}. The longest matching prefix wins; loggers
+    without an entry are never sampled.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
@@ -0,0 +1,92 @@
+import codecs
+import io
+import re
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib path gives the same output
+    orjson = None
+
+# Built once instead of per response, with the separators DRF would pick
+ENCODER = JSONRenderer.encoder_class(
+    ensure_ascii=not api_settings.UNICODE_JSON,
+    allow_nan=not api_settings.STRICT_JSON,
+    separators=(',', ':') if api_settings.COMPACT_JSON else (', ', ': '),
+)
+# DRF escapes these so the output is also valid JavaScript
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+# orjson turns integers past 64 bits into floats; bodies that may hold one
+# (19+ digits in a row, 2**63 has 19) are parsed by the stdlib instead
+LONG_DIGITS = re.compile(rb'\d{19}')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    The output matches DRF's: compact separators, UTF-8 without escapes,
+    \\u2028/\\u2029 escaped, and dates, times, decimals and other non-JSON
+    types converted by DRF's JSONEncoder (datetimes are passed through to
+    it, so UTC still ends in "Z"). Floats from 1e16 up or below 1e-4 may
+    spell their exponent differently ("1e16" for "1e+16"); they parse to
+    the same number.
+
+    Indented output (the browsable API) goes through DRF. Without orjson,
+    with UNICODE_JSON or COMPACT_JSON off, or when orjson refuses a value
+    (integers over 64 bits, an error from the encoder) the prebuilt stdlib
+    ENCODER is used, so such errors are DRF's too.
+    """
+    use_orjson = orjson is not None and api_settings.UNICODE_JSON and api_settings.COMPACT_JSON
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = None
+        if self.use_orjson:
+            try:
+                ret = orjson.dumps(
+                    data, default=ENCODER.default,
+                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+                )
+            except orjson.JSONEncodeError:
+                pass
+        if ret is None:
+            ret = ENCODER.encode(data).encode()
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes UTF-8 bodies with orjson when it is installed.
+
+    orjson rejects NaN and Infinity, as DRF's strict mode does. Bodies
+    that might hold integers beyond 64 bits, and bodies orjson rejects, go
+    through DRF's parser, so the result and the error are the same as
+    without orjson.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = get_encoding(parser_context or {})
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not LONG_DIGITS.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+def render_json(data):
+    """Encode `data` as the API's renderer does, for views that build their
+    own HttpResponse."""
+    return FastJSONRenderer().render(data)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import threading
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson, yaml_dump
+from drf_yasg.renderers import _SpecRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+INFO = openapi.Info(
+    title="API Documentation",
+    default_version='v1',
+    description="Recipe sharing website. Cook different recipe and make you daily life tasty!",
+)
+
+# {format: (body, etag)}, filled once per process
+_cache = {}
+_lock = threading.Lock()
+
+
+def generate_schema():
+    """Introspect every endpoint and return the OpenAPI document as JSON bytes.
+
+    Views are inspected with an anonymous GET, so the document is the
+    same for every caller. It names no host (url=''); the docs UI calls
+    the one it was loaded from.
+    """
+    request = APIView().initialize_request(APIRequestFactory().get('/swagger/?format=openapi'))
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(INFO, url='')
+    return OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=request, public=True))
+
+
+def load_schema():
+    path = getattr(settings, 'OPENAPI_SCHEMA_FILE', None)
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return generate_schema()
+
+
+def _entry(body):
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def cached_schema(fmt='json'):
+    """(body, etag) of the schema as 'json' or 'yaml'.
+
+    Read from OPENAPI_SCHEMA_FILE when `manage.py generate_schema` wrote
+    one at deploy time, generated on first use otherwise, and kept in
+    memory for the life of the process either way.
+    """
+    if fmt not in _cache:
+        with _lock:
+            if 'json' not in _cache:
+                _cache['json'] = _entry(load_schema())
+            if fmt == 'yaml' and 'yaml' not in _cache:
+                _cache['yaml'] = _entry(yaml_dump(json.loads(_cache['json'][0]), binary=True))
+    return _cache[fmt]
+
+
+class SchemaView(get_schema_view(INFO, public=True, permission_classes=(permissions.AllowAny,))):
+    """drf_yasg's schema view, serving the document from cached_schema().
+
+    The Swagger and ReDoc pages themselves introspect nothing; they load the
+    document from `?format=openapi`, which is answered from memory with an
+    ETag so repeat visits get 304s.
+    """
+
+    def get(self, request, version='', format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, _SpecRenderer):
+            return super().get(request, version, format)
+
+        body, etag = cached_schema('yaml' if renderer.format == 'yaml' else 'json')
+        # Same URL and body for the openapi and json formats, but not the same type
+        etag = f'{etag[:-1]}-{renderer.format}"'
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f"public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}",
+            'Vary': 'Accept',
+        }
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return HttpResponseNotModified(headers=headers)
+        return HttpResponse(body, content_type=f"{renderer.media_type}; charset=utf-8", headers=headers)
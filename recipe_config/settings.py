@@ -36,6 +36,15 @@ ALLOWED_HOSTS = ["*"]
 #     "http://sales201.netlify.app",
 #     "http://localhost:5173",  
 # ]
+# Override with e.g. CORS_ALLOWED_ORIGINS=https://recipe-hubb.netlify.app,http://localhost:5173
+# corsheaders is only installed when one of these allows an origin
+CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
+    "https://recipe-hubb.netlify.app",
+    "http://localhost:5173",
+    "https://recipe-drf.onrender.com",
+])
+CORS_ALLOW_ALL_ORIGINS = env.bool('CORS_ALLOW_ALL_ORIGINS', default=False)
+CORS_ENABLED = bool(CORS_ALLOWED_ORIGINS or CORS_ALLOW_ALL_ORIGINS)
 
 CORS_ALLOW_CREDENTIALS = True  # If you need to send cookies or authentication tokens
 CORS_ALLOW_METHODS = [
@@ -61,7 +70,6 @@ CORS_ALLOW_HEADERS = [
 # Application definition
 
 INSTALLED_APPS = [
-    "corsheaders",
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -70,17 +78,25 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     "rest_framework",
     'django_filters',
-    'drf_yasg',
     'users',
     'recipe',
     'contact_us',
 ]
 
+# /swagger/ and /redoc/ (and drf_yasg's templates); their views are only
+# imported on the first docs request. `manage.py profile_startup` shows
+# what startup costs.
+API_DOCS_ENABLED = env.bool('API_DOCS_ENABLED', default=True)
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index('users'), 'drf_yasg')
+if CORS_ENABLED:
+    INSTALLED_APPS.insert(0, 'corsheaders')
+
 AUTH_USER_MODEL = "users.User"
 
 MIDDLEWARE = [
-    "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    'recipe_config.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,6 +104,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if CORS_ENABLED:
+    MIDDLEWARE.insert(0, "corsheaders.middleware.CorsMiddleware")
 
 ROOT_URLCONF = 'recipe_config.urls'
 
@@ -122,9 +140,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, where
+            # busy_timeout can wait for it, instead of failing at the
+            # first write of a transaction that began as a reader
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_URLS=sqlite:////srv/replica.sqlite3
+# (comma separated). Safe requests to views with `read_replica = True`
+# read from them; see recipe_config/db_router.py.
+for number, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), start=1):
+    DATABASES[f'replica{number}'] = {**env.db_url_config(url), 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['recipe_config.db_router.PrimaryReplicaRouter']
+# After a write the client reads from the primary for this many seconds,
+# so it sees its own changes while replicas catch up
+REPLICA_STICKY_COOKIE = 'db_primary'
+REPLICA_STICKY_SECONDS = 10
+
+# Pragmas applied to every new SQLite connection, on top of the defaults in
+# recipe_config/sqlite.py (WAL, synchronous=NORMAL, busy_timeout, mmap,
+# cache_size, temp_store=MEMORY)
+SQLITE_PRAGMAS = {}
+# Retries for write_transaction() when the database is still locked after
+# busy_timeout; the wait starts at the backoff (seconds) and doubles
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_RETRY_BACKOFF = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -167,6 +212,17 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploads are stored once per distinct content (users/storage.py) and
+# served by recipe_config.views.serve_media. Unreferenced blobs older than
+# MEDIA_GC_GRACE_SECONDS are removed by `manage.py gc_media`.
+STORAGES = {
+    'default': {'BACKEND': 'users.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_BLOB_MAX_AGE = 365 * 24 * 3600
+MEDIA_LEGACY_MAX_AGE = 3600
+MEDIA_GC_GRACE_SECONDS = 24 * 3600
+
 
 # Add this to MIDDLEWARE if not already present
 # INSTALLED_APPS += ["django_cleanup"]  # Optional: Cleans up unused images
@@ -181,7 +237,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
+    ),
+    # orjson when installed, DRF's encoder otherwise; same output either
+    # way (recipe_config/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": (
+        "recipe_config.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "recipe_config.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
     # "DEFAULT_PERMISSION_CLASSES": (
     #     "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -198,8 +265,67 @@ EMAIL_PORT = 587
 EMAIL_HOST_USER = env("EMAIL")
 EMAIL_HOST_PASSWORD = env("EMAIL_PASSWORD")
 
+# Emails are queued in EmailOutbox and sent by `manage.py send_outbox`.
+# A worker holds the rows it claimed for EMAIL_OUTBOX_LEASE_SECONDS; sent
+# rows (they hold OTP codes) are deleted EMAIL_OUTBOX_RETENTION_SECONDS
+# after sending.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+EMAIL_OUTBOX_RETENTION_SECONDS = 7 * 24 * 3600
+
 FRONTEND_URL = "https://recipe-hubb.netlify.app"
 
+# Bulk user import (`manage.py import_users`, POST accounts/import/):
+# users per transaction, and password hashing processes for the command
+# (None = one per CPU); the endpoint always hashes in-process
+USER_IMPORT_BATCH_SIZE = 500
+USER_IMPORT_WORKERS = None
+
+# Profile image derivatives (longest side in px), rendered as WebP and JPEG
+# on PROFILE_IMAGE_WORKERS background threads after the upload commits
+# (0 = inline). Backfill with `manage.py build_profile_images`.
+PROFILE_IMAGE_VARIANTS = {'thumb': 96, 'card': 320, 'full': 1280}
+PROFILE_IMAGE_WORKERS = 2
+# Profile image uploads are streamed to a temporary file and rejected as
+# soon as they pass either limit or do not start like an image
+# (users/uploads.py)
+PROFILE_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+PROFILE_IMAGE_MAX_PIXELS = 24_000_000
+
+# OpenAPI document served at /swagger/?format=openapi. Each worker
+# generates it on first use unless OPENAPI_SCHEMA_FILE names a file written
+# by `manage.py generate_schema` in the same deploy; the file is trusted
+# as-is, so only set it where every deploy rewrites it. Clients may reuse
+# the document for OPENAPI_SCHEMA_MAX_AGE seconds, then revalidate with
+# its ETag.
+OPENAPI_SCHEMA_FILE = env('OPENAPI_SCHEMA_FILE', default=None)
+OPENAPI_SCHEMA_MAX_AGE = 300
+
+# Each worker keeps its own autocomplete index; rebuild it periodically so
+# recipes written through other workers show up too.
+RECIPE_AUTOCOMPLETE_REBUILD_SECONDS = 300
+
+# Prior for the Bayesian recipe rating: every recipe starts as if it had
+# RECIPE_RATING_PRIOR_WEIGHT reviews of RECIPE_RATING_PRIOR_MEAN stars.
+# Run `manage.py rebuild_author_stats` after changing them.
+RECIPE_RATING_PRIOR_MEAN = 3.0
+RECIPE_RATING_PRIOR_WEIGHT = 5
+
+# Shared cache (e.g. CACHE_URL=redis://...) in production so user cache
+# invalidation reaches every worker; locmem is per process.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Seconds a JWT-authenticated user is served from the cache
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# How often each worker checks for newly revoked tokens: a counter in the
+# cache, or the revocation tables when the cache is per process (locmem)
+TOKEN_REVOCATION_CHECK_SECONDS = 5
+
 # Simple JWT Configuration
 from datetime import timedelta
 
@@ -238,12 +364,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework.simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
-CORS_ALLOWED_ORIGINS = [
-    "https://recipe-hubb.netlify.app",
-    "http://localhost:5173",
-    "https://recipe-drf.onrender.com",
-]
-CORS_ALLOW_ALL_ORIGINS = False
+# CORS_ALLOWED_ORIGINS and CORS_ALLOW_ALL_ORIGINS are read from the
+# environment near the top, before INSTALLED_APPS depends on them
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = [
     "GET",
@@ -271,12 +393,34 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 
+# Console output goes through a queue so request threads never block on the
+# stream; LOG_FORMAT=json switches to one JSON object per line.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+        'json': {
+            '()': 'recipe_config.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'recipe_config.log.SamplingFilter',
+            # Fraction of DEBUG/INFO records kept per logger prefix
+            'rates': {
+                'users.permissions': env.float('LOG_SAMPLE_PERMISSIONS', default=0.1),
+                'recipe.views': env.float('LOG_SAMPLE_RECIPE_VIEWS', default=1.0),
+            },
+        },
+    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            '()': 'recipe_config.log.QueueConsoleHandler',
+            'formatter': env('LOG_FORMAT', default='plain'),
+            'filters': ['sampling'],
         },
     },
     'loggers': {
@@ -284,10 +428,10 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'INFO',
         },
-        'users': {  # Added a logger for the users app
+        'users': {
             'handlers': ['console'],
-            'level': 'DEBUG',  # DEBUG implemented for more details
+            'level': 'INFO',
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
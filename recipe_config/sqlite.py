@@ -0,0 +1,87 @@
+import functools
+import random
+import re
+import sqlite3
+import time
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+# Per-connection tuning for the SQLite database; override any of these in
+# settings.SQLITE_PRAGMAS. WAL lets readers run alongside the single writer,
+# and synchronous=NORMAL is durable across application crashes in WAL mode.
+# busy_timeout comes first so switching the journal mode waits for locks too.
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,            # ms to wait for the write lock
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes of the file read through mmap
+    'cache_size': -20000,            # negative: KiB of page cache per connection
+    'temp_store': 'MEMORY',
+}
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def pragmas():
+    return {**DEFAULT_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+def apply_pragmas(cursor, values):
+    for name, value in values.items():
+        # Pragmas cannot be parameterized; settings are trusted, but keep
+        # the statement to a single name and value anyway
+        if not (PRAGMA_VALUE.match(str(name)) and PRAGMA_VALUE.match(str(value))):
+            raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver, wired in recipe/apps.py."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas())
+
+
+def is_locked(exc):
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def retry_on_locked(func, attempts=None, backoff=None):
+    """Call func(), retrying while SQLite reports the database locked.
+
+    busy_timeout covers most contention, but a transaction that started
+    as a reader and then tries to write fails at once if another writer
+    committed meanwhile. Retries wait `backoff` seconds, doubling each time,
+    with jitter so competing writers do not collide again.
+    """
+    attempts = attempts or getattr(settings, 'SQLITE_WRITE_RETRIES', 5)
+    backoff = backoff if backoff is not None else getattr(settings, 'SQLITE_WRITE_RETRY_BACKOFF', 0.05)
+    for attempt in range(attempts):
+        try:
+            return func()
+        except (OperationalError, sqlite3.OperationalError) as exc:
+            if not is_locked(exc) or attempt == attempts - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def write_transaction(func=None, *, using=DEFAULT_DB_ALIAS):
+    """Run the decorated function in its own transaction, retried on lock errors.
+
+    For short read-modify-write paths (reactions, saves). Inside an outer
+    atomic block there is nothing to restart, so the function just runs.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return func(*args, **kwargs)
+
+            def attempt():
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            return retry_on_locked(attempt)
+        return wrapper
+
+    return decorator(func) if func else decorator
@@ -0,0 +1,99 @@
+import logging
+import uuid
+from itertools import islice
+from django.http import StreamingHttpResponse
+from .db_router import keep_routing
+from .renderers import ENCODER, render_json
+
+logger = logging.getLogger(__name__)
+
+# Encoded items are sent in chunks of about this size rather than one write each
+CHUNK_BYTES = 64 * 1024
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def wants_stream(request):
+    return request.GET.get('stream') == 'true'
+
+
+def _replace(envelope, path, value):
+    if not path:
+        return value
+    return {**envelope, path[0]: _replace(envelope[path[0]], path[1:], value)}
+
+
+def stream_json(items, envelope=None, path=('results',)):
+    """Yield the JSON of `envelope` with the list at `path` filled from `items`.
+
+    Each item is encoded on its own as it comes out of the iterator, so
+    only one chunk of output is held at a time. The bytes are the same as
+    render_json() of the whole envelope; without an envelope the bare list
+    is streamed.
+    """
+    if envelope is None:
+        prefix, suffix = b'', b''
+    else:
+        marker = f'__items_{uuid.uuid4().hex}__'
+        prefix, suffix = render_json(_replace(envelope, path, marker)).split(render_json(marker))
+    separator = ENCODER.item_separator.encode()
+    chunk, size = [prefix, b'['], 0
+    try:
+        for index, item in enumerate(items):
+            if index:
+                chunk.append(separator)
+            encoded = render_json(item)
+            chunk.append(encoded)
+            size += len(encoded)
+            if size >= CHUNK_BYTES:
+                yield b''.join(chunk)
+                chunk, size = [], 0
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated body
+        logger.error("Error while streaming a JSON response: %s", e, exc_info=True)
+        raise
+    chunk += [b']', suffix]
+    yield b''.join(chunk)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """StreamingHttpResponse over stream_json(items, envelope, path).
+
+    The body reads the database with the same replica routing as the view
+    that built the response.
+    """
+
+    def __init__(self, items, envelope=None, path=('results',), **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(keep_routing(stream_json(items, envelope, path)), **kwargs)
+
+
+class StreamingListMixin:
+    """Lets a generic list view stream its response with `?stream=true`.
+
+    The page (or the whole queryset when the view is not paginated) is
+    serialized `stream_batch_size` objects at a time and each object is
+    encoded as soon as it is serialized, inside the view's usual
+    pagination envelope. Views that build their items differently
+    override stream_items().
+    """
+    stream_batch_size = 100
+
+    def list(self, request, *args, **kwargs):
+        if not wants_stream(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return StreamingJSONResponse(self.stream_items(queryset.iterator(chunk_size=self.stream_batch_size)))
+        # The paginator's envelope, with the results filled in while streaming
+        envelope = self.get_paginated_response([]).data
+        return StreamingJSONResponse(self.stream_items(page), envelope)
+
+    def stream_items(self, objects):
+        for batch in batched(objects, self.stream_batch_size):
+            yield from self.get_serializer(batch, many=True).data
@@ -1,25 +1,29 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.views.generic.base import RedirectView
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from .views import download_database
+from django.views.decorators.csrf import csrf_exempt
+from .views import download_database, serve_media
 from contact_us.views import ContactUsAPIView
 from django.conf import settings
-from django.conf.urls.static import static
 
 
+def docs_view(renderer):
+    """drf_yasg's UI view, imported on the first docs request.
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="API Documentation",
-        default_version='v1',
-        description="Recipe sharing website. Cook different recipe and make you daily life tasty!",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+    drf_yasg's views, generators and spec validators are a large share of
+    startup; workers that never serve the docs never load them. The schema
+    itself is generated once and cached, see schema.py.
+    """
+    view = None
+
+    @csrf_exempt
+    def lazy_view(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from .schema import SchemaView
+            view = SchemaView.with_ui(renderer, cache_timeout=0)
+        return view(request, *args, **kwargs)
+    return lazy_view
 
 
 
@@ -44,18 +48,23 @@ api_urlpatterns = [
 # ]
 
 urlpatterns = [
-    path('', RedirectView.as_view(url='swagger/', permanent=True)),  # Redirect root URL to Swagger UI
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc-ui'),
     path('admin/', admin.site.urls),
     path('db', download_database, name='download-database'),
     path("", include(api_urlpatterns)),
     # re_path(r'^accounts/.*$', RedirectView.as_view(url='/swagger/', permanent=False)),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.API_DOCS_ENABLED:
+    urlpatterns = [
+        path('', RedirectView.as_view(url='swagger/', permanent=True)),  # Redirect root URL to Swagger UI
+        path('swagger/', docs_view('swagger'), name='schema-swagger-ui'),
+        path('redoc/', docs_view('redoc'), name='schema-redoc-ui'),
+    ] + urlpatterns
+
+urlpatterns += [
+    # Served in every environment, with immutable caching for content-addressed blobs
+    re_path(rf"^{settings.MEDIA_URL.strip('/')}/(?P<path>.+)$", serve_media, name='media'),
+]
     
 handler404 = 'recipe_config.views.custom_accounts'
 
@@ -1,5 +1,13 @@
+import mimetypes
 import os
-from django.http import HttpResponse
+import re
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+from users.storage import is_blob
 # from django.contrib.auth.decorators import user_passes_test
 from django.core.management import call_command
 from django.conf import settings
@@ -43,6 +51,7 @@ def custom_accounts(request, exception):
     account_endpoints = [
         {"name": "Register", "url": reverse("register"), "description": "Register a new user"},
         {"name": "Login", "url": reverse("login"), "description": "Login to get a JWT token"},
+        {"name": "Logout", "url": reverse("logout"), "description": "Revoke the current JWT token (requires authentication)"},
         {"name": "Activate Email", "url": "accounts/activate/<str:uidb64>/<str:token>/", "description": "Activate your email"},
         {"name": "Resend Verification", "url": reverse("resend_verification"), "description": "Resend email verification link"},
         {"name": "Send OTP", "url": reverse("send_otp"), "description": "Send OTP for password reset"},
@@ -53,13 +62,96 @@ def custom_accounts(request, exception):
         {"name": "Profile Update", "url": reverse("profile_update"), "description": "Update your profile (requires authentication)"},
         {"name": "Role Change Request", "url": reverse("request_role_change"), "description": "Request a role change (requires authentication)"},
         {"name": "All Users", "url": reverse("all_users"), "description": "List all users (Admin only)"},
+        {"name": "Top Chefs", "url": reverse("top_chefs"), "description": "Leaderboard of chefs by reactions, saves, recipes or rating"},
+        {"name": "Import Users", "url": reverse("import_users"), "description": "Bulk-create users from a CSV upload (Admin only)"},
         {"name": "Specific User Profile", "url": "accounts/profile/<str:email>/", "description": "Get a specific user's profile (requires authentication)"},
         {"name": "Update User Role", "url": "accounts/profile/<str:email>/update-role/", "description": "Update a user's role (Admin only)"},
     ]
 
     context = {
         "account_endpoints": account_endpoints,
-        "swagger_url": reverse("schema-swagger-ui"),
+        "swagger_url": reverse("schema-swagger-ui") if settings.API_DOCS_ENABLED else None,
     }
     template = loader.get_template("accounts.html")
-    return HttpResponseNotFound(template.render(context, request))
\ No newline at end of file
+    return HttpResponseNotFound(template.render(context, request))
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _byte_range(header, size):
+    """(start, end) inclusive for a single-range header, None to send the
+    whole file, or False when the range cannot be satisfied."""
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            return False
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        start, end = max(size - length, 0), size - 1
+    return start, end
+
+
+def _read(path, start, length, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve MEDIA_ROOT files, with Range support.
+
+    Content-addressed blobs (see users/storage.py) never change under their
+    name, so they are cached as immutable for MEDIA_BLOB_MAX_AGE; files
+    saved under their upload names get MEDIA_LEGACY_MAX_AGE.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    if is_blob(path):
+        etag = f'"{os.path.splitext(os.path.basename(path))[0]}"'
+        cache_control = f"public, max-age={settings.MEDIA_BLOB_MAX_AGE}, immutable"
+    else:
+        etag = f'"{int(stat.st_mtime):x}-{size:x}"'
+        cache_control = f"public, max-age={settings.MEDIA_LEGACY_MAX_AGE}"
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Accept-Ranges': 'bytes'}
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        return HttpResponseNotModified(headers=headers)
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    byte_range = None
+    # A stale If-Range validator means the client's partial copy is outdated
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        byte_range = _byte_range(request.headers['Range'], size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _read(full_path, start, end - start + 1), status=206, content_type=content_type, headers=headers,
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from . import models
+from .revocation import revocation_filter
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ['email', 'firstName', 'lastName', 'role', 'is_staff', 'is_superuser']
@@ -29,8 +30,11 @@ class RoleChangeRequestAdmin(admin.ModelAdmin):
         for role_request in queryset:
             if role_request.status == 'Pending':
                 user = role_request.user
+                demoted = models.User.ROLE_RANK[role_request.requested_role] < models.User.ROLE_RANK[user.role]
                 user.role = role_request.requested_role
                 user.save()
+                if demoted:
+                    revocation_filter.revoke_user_tokens(user)
                 role_request.status = 'Approved'
                 role_request.save()
                 self.message_user(request, f"Approved role change for {user.email} to {user.role}")
@@ -44,6 +48,24 @@ class RoleChangeRequestAdmin(admin.ModelAdmin):
                 self.message_user(request, f"Denied role change for {role_request.user.email}")
     deny_request.short_description = "Deny selected role change requests"
 
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject']
+
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'recipe_count', 'reaction_count', 'save_count', 'rating_count', 'average_rating']
+    search_fields = ['user__email']
+    readonly_fields = ['recipe_count', 'reaction_count', 'save_count', 'rating_sum', 'rating_count', 'average_rating']
+
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'size', 'refcount', 'created_at']
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.UserProfile, UserProfileAdmin)
-admin.site.register(models.RoleChangeRequest, RoleChangeRequestAdmin)
\ No newline at end of file
+admin.site.register(models.RoleChangeRequest, RoleChangeRequestAdmin)
+admin.site.register(models.EmailOutbox, EmailOutboxAdmin)
+admin.site.register(models.AuthorStats, AuthorStatsAdmin)
+admin.site.register(models.MediaBlob, MediaBlobAdmin)
@@ -0,0 +1,53 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from recipe_config.renderers import render_json
+from .authentication import aauthenticate
+from .images import variant_urls
+from .models import AuthorStats, UserProfile
+from .serializers import AuthorStatsSerializer, EMPTY_AUTHOR_STATS
+
+
+def render(data, status=200):
+    return HttpResponse(render_json(data), content_type='application/json', status=status)
+
+
+class AsyncUserProfileView(View):
+    # Async twin of UserProfileView; same payload as UserFullSerializer
+    async def get(self, request):
+        try:
+            user, _ = await aauthenticate(request)
+        except exceptions.APIException as exc:
+            return render({'detail': exc.detail}, status=403)
+        if not user.is_authenticated:
+            return render({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+        user_data = {
+            'email': user.email,
+            'firstName': user.firstName,
+            'lastName': user.lastName,
+            'role': user.role,
+        }
+        profile = await UserProfile.objects.filter(user_id=user.pk).values(
+            'image', 'image_variants', 'age', 'portfolio', 'sex', 'bio', 'facebook'
+        ).afirst()
+        if profile is not None:
+            image_field = UserProfile._meta.get_field('image')
+            profile['image'] = image_field.storage.url(profile['image']) if profile['image'] else None
+            profile['image_variants'] = variant_urls(profile['image_variants'])
+            profile['user'] = user_data
+        stats = await AuthorStats.objects.filter(user_id=user.pk).values(*AuthorStatsSerializer.Meta.fields).afirst()
+        data = {
+            'email': user.email,
+            'firstName': user.firstName,
+            'lastName': user.lastName,
+            'mobile': user.mobile,
+            'role': user.role,
+            'profile': profile,
+            'stats': AuthorStatsSerializer(stats).data if stats else EMPTY_AUTHOR_STATS,
+        }
+        return render({
+            "status": "success",
+            "message": "Request Successful",
+            "data": data,
+        })
@@ -0,0 +1,91 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .revocation import revocation_filter
+
+# Secrets stay out of the cache; they are loaded from the DB on first access.
+UNCACHED_FIELDS = {'password', 'otp'}
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the token's user from the cache.
+
+    The user row is cached for AUTH_USER_CACHE_TIMEOUT seconds and rebuilt
+    as a regular User instance with password and otp deferred, so views can
+    still compare, assign and save() it (only loaded fields are written).
+    Entries are dropped whenever a User is saved or deleted, see
+    users/signals.py. Revoked tokens are rejected, see users/revocation.py.
+    The user is always read from the primary, never a lagging replica.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        key = user_cache_key(user_id)
+        data = cache.get(key)
+        if data is None:
+            try:
+                user = self.user_model.objects.using(DEFAULT_DB_ALIAS).get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            data = {
+                field.attname: getattr(user, field.attname)
+                for field in self.user_model._meta.concrete_fields
+                if field.attname not in UNCACHED_FIELDS
+            }
+            cache.set(key, data, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+        else:
+            user = self._from_cache(data)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if revocation_filter.is_revoked(validated_token, user):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
+
+    def _from_cache(self, data):
+        fields = [f for f in self.user_model._meta.concrete_fields if f.attname in data]
+        # Same path the ORM uses for .only() querysets: missing fields are
+        # deferred and save() only updates the loaded ones.
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, [f.attname for f in fields], [data[f.attname] for f in fields]
+        )
+
+
+async def aauthenticate(request):
+    """Authenticate a plain async Django view with the same rules as DRF.
+
+    Like DEFAULT_AUTHENTICATION_CLASSES, a logged-in, active session user
+    comes first (the async views only serve GETs, so SessionAuthentication
+    would not check CSRF either), then the JWT. Returns (user, token),
+    with token None for session users, or (AnonymousUser(), None) when
+    neither is sent. Raises the usual rest_framework exceptions for bad
+    tokens.
+    """
+    user = await request.auser()
+    if user.is_authenticated and user.is_active:
+        return user, None
+    if not CachedJWTAuthentication().get_header(request):
+        return AnonymousUser(), None
+    # One hop for the cache/revocation lookups; the view itself stays async
+    result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    if result is None:
+        return AnonymousUser(), None
+    return result
@@ -0,0 +1,184 @@
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from .importer import _init_worker
+from .models import UserProfile
+from .storage import reference_source
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each derivative; images are never upscaled
+VARIANT_SIZES = {'thumb': 96, 'card': 320, 'full': 1280}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'users/images/variants/'
+
+_executor = None
+
+
+def variant_sizes():
+    return getattr(settings, 'PROFILE_IMAGE_VARIANTS', VARIANT_SIZES)
+
+
+def storage():
+    return UserProfile._meta.get_field('image').storage
+
+
+def render_variants(data, sizes):
+    """Decode image bytes once and encode every derivative.
+
+    Returns {variant: {ext: bytes}}. The EXIF orientation is applied to the
+    pixels; EXIF, ICC and other metadata are not written to the output.
+    Pure function, so it can run in a worker process.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        base = image.convert('RGBA' if alpha else 'RGB')
+
+    rendered = {}
+    # Largest first, each resized from the previous one
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        base.thumbnail((size, size), Image.Resampling.LANCZOS)
+        flat = base
+        if alpha:
+            flat = Image.new('RGB', base.size, 'white')
+            flat.paste(base, mask=base.getchannel('A'))
+        rendered[name] = {}
+        for ext, (fmt, options) in FORMATS.items():
+            out = io.BytesIO()
+            (base if fmt == 'WEBP' else flat).save(out, fmt, **options)
+            rendered[name][ext] = out.getvalue()
+    return rendered
+
+
+def store_variants(source, rendered):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return {
+        name: {
+            ext: storage().save(f"{VARIANT_DIR}{stem}_{name}.{ext}", ContentFile(data))
+            for ext, data in formats.items()
+        }
+        for name, formats in rendered.items()
+    }
+
+
+def delete_variants(variants):
+    for formats in (variants or {}).values():
+        for path in formats.values():
+            storage().delete(path)
+
+
+def save_variants(profile_id, source, rendered):
+    """Store rendered derivatives for `source` and record them on the profile.
+
+    Nothing is recorded, and the files are removed again, if the profile's
+    image changed in the meantime; that image has a job of its own.
+    """
+    variants = store_variants(source, rendered)
+    if not UserProfile.objects.filter(pk=profile_id, image=source).update(image_variants=variants):
+        delete_variants(variants)
+        return None
+    return variants
+
+
+def generate_variants(profile_id, stale=None):
+    """Build the derivatives of a profile's current image and drop `stale` ones."""
+    delete_variants(stale)
+    profile = UserProfile.objects.filter(pk=profile_id).only('id', 'image').first()
+    if profile is None or not profile.image:
+        return None
+    with profile.image.open('rb') as f:
+        data = f.read()
+    return save_variants(profile_id, profile.image.name, render_variants(data, variant_sizes()))
+
+
+def _run(profile_id, stale):
+    try:
+        generate_variants(profile_id, stale)
+    except Exception:
+        logger.exception("Could not build image variants for profile %s", profile_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(profile_id, stale=None):
+    """Build derivatives once the current transaction commits.
+
+    They are rendered on a thread pool of PROFILE_IMAGE_WORKERS threads,
+    off the request path; 0 renders inline in the commit hook.
+    """
+    global _executor
+    workers = getattr(settings, 'PROFILE_IMAGE_WORKERS', 2)
+    if not workers:
+        transaction.on_commit(lambda: generate_variants(profile_id, stale))
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='profile-images')
+    transaction.on_commit(lambda: _executor.submit(_run, profile_id, stale))
+
+
+def backfill_variants(rebuild=False, batch_size=50, workers=None, progress=None):
+    """Build derivatives for existing profile images on a process pool.
+
+    Only profiles without variants are processed unless `rebuild`. Files
+    are read and results stored here; workers only decode and encode.
+    `progress(done, total)` is called after each batch. Returns
+    (built, failed).
+    """
+    profiles = UserProfile.objects.exclude(image='').exclude(image__isnull=True)
+    if not rebuild:
+        profiles = profiles.filter(image_variants={})
+    rows = list(profiles.order_by('id').values_list('id', 'image', 'image_variants'))
+    sizes = variant_sizes()
+    built = failed = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker) as pool:
+        for start in range(0, len(rows), batch_size):
+            jobs = []
+            for profile_id, name, old in rows[start:start + batch_size]:
+                try:
+                    with storage().open(name, 'rb') as f:
+                        jobs.append((profile_id, name, old, pool.submit(render_variants, f.read(), sizes)))
+                except OSError as e:
+                    logger.warning("Cannot read image %s of profile %s: %s", name, profile_id, e)
+                    failed += 1
+            for profile_id, name, old, future in jobs:
+                try:
+                    rendered = future.result()
+                except Exception as e:
+                    logger.warning("Cannot process image %s of profile %s: %s", name, profile_id, e)
+                    failed += 1
+                    continue
+                if save_variants(profile_id, name, rendered) is not None:
+                    delete_variants(old)
+                    built += 1
+            if progress:
+                progress(min(start + batch_size, len(rows)), len(rows))
+    return built, failed
+
+
+@reference_source
+def variant_references():
+    # The variant files are only referenced from this JSONField
+    rows = UserProfile.objects.exclude(image_variants={}).values_list('image_variants', flat=True)
+    for variants in rows.iterator():
+        for formats in variants.values():
+            yield from formats.values()
+
+
+def variant_urls(variants, request=None):
+    """{variant: {ext: url}} for the serializers, or None until built."""
+    if not variants:
+        return None
+    build = request.build_absolute_uri if request is not None else (lambda url: url)
+    return {
+        name: {ext: build(storage().url(path)) for ext, path in formats.items()}
+        for name, formats in variants.items()
+    }
@@ -0,0 +1,161 @@
+import csv
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from .models import User, UserProfile
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def _init_worker():
+    # Spawned workers (macOS, Windows) start without Django configured
+    import django
+    django.setup()
+
+
+def _hash(password):
+    # None gives an unusable password; the user sets one via the OTP flow
+    return make_password(password or None)
+
+
+def read_rows(source):
+    """Parse a CSV upload into a list of dicts.
+
+    The header names the columns: email, firstName and lastName are
+    required; password, mobile, role and is_verified are optional.
+    """
+    if isinstance(source, bytes):
+        source = source.decode("utf-8-sig")
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    return list(csv.DictReader(source))
+
+
+def clean_rows(rows, default_verified=False):
+    """Validate rows and drop emails that repeat or already exist.
+
+    Returns (valid, skipped, errors); errors are {"row", "errors"} dicts
+    with 1-based data row numbers.
+    """
+    valid, errors, seen = [], [], set()
+    for number, row in enumerate(rows, start=1):
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        row_errors = {}
+        email = row.get("email", "").lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            row_errors["email"] = "Enter a valid email address."
+        for field in ("firstName", "lastName"):
+            if not row.get(field):
+                row_errors[field] = "This field is required."
+        password = row.get("password") or None
+        if password and len(password) < 8:
+            row_errors["password"] = "Ensure this field has at least 8 characters."
+        role = row.get("role") or "User"
+        if role not in User.ROLE_RANK:
+            row_errors["role"] = "Invalid role. Must be Admin, Chef, or User."
+        if not row_errors and email in seen:
+            row_errors["email"] = "Duplicate email in file."
+        if row_errors:
+            errors.append({"row": number, "errors": row_errors})
+            continue
+        seen.add(email)
+        verified = row.get("is_verified")
+        valid.append({
+            "row": number,
+            "email": email,
+            "firstName": row["firstName"],
+            "lastName": row["lastName"],
+            "mobile": row.get("mobile") or None,
+            "role": role,
+            "is_verified": verified.lower() in TRUE_VALUES if verified else default_verified,
+            "password": password,
+        })
+
+    # Stored emails keep the case they were registered with (only the
+    # domain is normalized), so compare lowercased; see user_email_lower_idx
+    existing = set()
+    emails = [row["email"] for row in valid]
+    for start in range(0, len(emails), 500):
+        existing.update(
+            User.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=emails[start:start + 500]).values_list("email_lower", flat=True)
+        )
+    valid = [row for row in valid if row["email"] not in existing]
+    return valid, len(existing), errors
+
+
+def _insert(rows, hashes):
+    users = [
+        User(
+            email=row["email"], firstName=row["firstName"], lastName=row["lastName"],
+            mobile=row["mobile"], role=row["role"], is_verified=row["is_verified"],
+            password=password,
+        )
+        for row, password in zip(rows, hashes)
+    ]
+    with transaction.atomic():
+        # bulk_create skips post_save, so profiles are inserted here rather
+        # than one at a time by users.signals.create_user_profile
+        User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Backends without RETURNING leave pks unset
+            ids = dict(User.objects.filter(email__in=[u.email for u in users]).values_list("email", "id"))
+            for user in users:
+                user.pk = ids[user.email]
+        UserProfile.objects.bulk_create([UserProfile(user_id=user.pk) for user in users])
+    return len(users)
+
+
+def import_users(rows, batch_size=None, workers=None, default_verified=False, progress=None):
+    """Create users from parsed rows, hashing passwords on a process pool.
+
+    Each batch is hashed across `workers` processes and then inserted, users
+    and profiles together, in its own transaction; a failure only rolls back
+    the batch it happened in and is reported per row. workers=0 hashes in
+    this process instead, for callers that must not fork (web requests).
+    `progress(done, total)` is called after each batch. Returns
+    {"created", "skipped", "errors"}.
+    """
+    batch_size = batch_size or getattr(settings, "USER_IMPORT_BATCH_SIZE", 500)
+    if workers is None:
+        workers = getattr(settings, "USER_IMPORT_WORKERS", None) or os.cpu_count() or 1
+    valid, skipped, errors = clean_rows(rows, default_verified)
+    if not valid:
+        return {"created": 0, "skipped": skipped, "errors": errors}
+    if not workers:
+        return _import_batches(valid, batch_size, map, skipped, errors, progress)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        chunksize = max(batch_size // (workers * 4), 1)
+
+        def hash_all(func, passwords):
+            return pool.map(func, passwords, chunksize=chunksize)
+        return _import_batches(valid, batch_size, hash_all, skipped, errors, progress)
+
+
+def _import_batches(valid, batch_size, hash_all, skipped, errors, progress):
+    total = len(valid)
+    created = 0
+    for start in range(0, total, batch_size):
+        batch = valid[start:start + batch_size]
+        hashes = list(hash_all(_hash, [row["password"] for row in batch]))
+        try:
+            created += _insert(batch, hashes)
+        except IntegrityError as e:
+            # Most likely someone registered one of these emails meanwhile
+            logger.warning("User import batch starting at row %d rolled back: %s", batch[0]["row"], e)
+            errors.extend({"row": row["row"], "errors": {"detail": f"Batch rolled back: {e}"}} for row in batch)
+        logger.info("Imported %d/%d users", created, total)
+        if progress:
+            progress(min(start + batch_size, total), total)
+    return {"created": created, "skipped": skipped, "errors": errors}
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from users.images import backfill_variants
+
+
+class Command(BaseCommand):
+    help = "Build the resized WebP/JPEG variants of existing profile images on a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Also re-render profiles that already have variants")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Rendering processes (default: one per CPU)")
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} profiles processed")
+
+        built, failed = backfill_variants(
+            rebuild=options['rebuild'], batch_size=options['batch_size'],
+            workers=options['workers'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Done: {built} built, {failed} failed"))
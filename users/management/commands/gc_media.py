@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from users.storage import adopt_legacy_files, collect_garbage
+
+
+class Command(BaseCommand):
+    help = ("Recount media blob references and delete blobs nothing refers to. With "
+            "--adopt, first move files stored under their upload names into blobs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adopt', action='store_true',
+                            help="Deduplicate files saved before content-addressed storage")
+        parser.add_argument('--grace', type=int, default=None,
+                            help="Keep unreferenced blobs younger than this many seconds "
+                                 "(default MEDIA_GC_GRACE_SECONDS)")
+        parser.add_argument('--dry-run', action='store_true', help="Report without changing anything")
+
+    def handle(self, *args, **options):
+        if options['adopt']:
+            moved = adopt_legacy_files(dry_run=options['dry_run'])
+            self.stdout.write(f"{moved} legacy files moved into blobs")
+        stats = collect_garbage(grace_seconds=options['grace'], dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['deleted']} unreferenced blobs and {stats['strays']} stray files removed "
+            f"({stats['bytes']} bytes), {stats['recounted']} refcounts corrected"
+            + (" [dry run]" if options['dry_run'] else "")
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from users.importer import import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk-create users from a CSV file, hashing passwords in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV with email, firstName, lastName[, password, mobile, role, is_verified]")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Users per transaction (default USER_IMPORT_BATCH_SIZE)")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Hashing processes (default: one per CPU)")
+        parser.add_argument('--verified', action='store_true',
+                            help="Mark users verified unless the row says otherwise")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                rows = read_rows(f)
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} users processed")
+
+        result = import_users(
+            rows, batch_size=options['batch_size'], workers=options['workers'],
+            default_verified=options['verified'], progress=progress,
+        )
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {result['created']} created, {result['skipped']} already existed, {len(result['errors'])} rejected"
+        ))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from users.outbox import prune_sent, send_batch
+
+# Seconds between deletions of old sent emails while polling
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = "Send queued EmailOutbox messages, reusing one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep when the outbox is empty")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain what is currently due and exit")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        pruned_at = None
+        while True:
+            if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned = prune_sent()
+                pruned_at = time.monotonic()
+                if pruned:
+                    self.stdout.write(f"Deleted {pruned} sent emails past retention")
+            sent, failed = send_batch(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_sent} sent, {total_failed} failed"))
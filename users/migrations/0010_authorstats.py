@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+# Frozen copy of recipe.stats.compute_author_stats as it was when this
+# migration was written; later changes there must not rewrite history
+
+def build_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('users', 'AuthorStats')
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Reaction = apps.get_model('recipe', 'Reaction')
+    Review = apps.get_model('recipe', 'Review')
+    stats = {}
+
+    def row(user_id):
+        return stats.setdefault(user_id, {
+            'recipe_count': 0, 'reaction_count': 0, 'save_count': 0,
+            'rating_sum': 0, 'rating_count': 0, 'average_rating': 0.0,
+        })
+
+    for item in Recipe.objects.values('user_id').annotate(n=Count('id')).order_by():
+        row(item['user_id'])['recipe_count'] = item['n']
+    reactions = Reaction.objects.filter(recipe__isnull=False)
+    for item in reactions.values('recipe__user_id').annotate(n=Count('id')).order_by():
+        row(item['recipe__user_id'])['reaction_count'] = item['n']
+    saves = Recipe._meta.get_field('saved_by').remote_field.through.objects
+    for item in saves.values('recipe__user_id').annotate(n=Count('id')).order_by():
+        row(item['recipe__user_id'])['save_count'] = item['n']
+    for item in Review.objects.values('recipe__user_id').annotate(s=Sum('rating'), n=Count('id')).order_by():
+        author = row(item['recipe__user_id'])
+        author['rating_sum'] = item['s']
+        author['rating_count'] = item['n']
+        author['average_rating'] = item['s'] / item['n']
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id, **fields) for user_id, fields in stats.items()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_user_directory_indexes'),
+        ('recipe', '0016_recipe_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('reaction_count', models.IntegerField(default=0)),
+                ('save_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('average_rating', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Author Stats',
+                'verbose_name_plural': 'Author Stats',
+                'indexes': [models.Index(fields=['-reaction_count', 'user'], name='author_top_reactions_idx'), models.Index(fields=['-save_count', 'user'], name='author_top_saves_idx'), models.Index(fields=['-recipe_count', 'user'], name='author_top_recipes_idx'), models.Index(fields=['-average_rating', 'user'], name='author_top_rating_idx')],
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 class UserManager(BaseUserManager):
@@ -33,6 +34,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         ('Chef', 'Chef'),
         ('User', 'User'),
     )
+    ROLE_RANK = {'User': 0, 'Chef': 1, 'Admin': 2}
 
     id = models.AutoField(primary_key=True)
     email = models.EmailField(unique=True)
@@ -49,6 +51,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_superuser = models.BooleanField(default=False)
     is_verified = models.BooleanField(default=False)
     last_verification_sent = models.DateTimeField(null=True, blank=True) 
+    # Access tokens issued before this moment are rejected, see users/revocation.py
+    tokens_valid_after = models.DateTimeField(null=True, blank=True)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["firstName", "lastName"]
@@ -58,6 +62,17 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.firstName} {self.lastName} ({self.email})"
 
+    class Meta:
+        # Admin user directory: filters walk these in id order, and name
+        # prefix search is a range scan on the lowercased names
+        indexes = [
+            models.Index(fields=['role', 'id'], name='user_role_idx'),
+            models.Index(fields=['is_verified', 'id'], name='user_verified_idx'),
+            models.Index(Lower('firstName'), name='user_first_name_lower_idx'),
+            models.Index(Lower('lastName'), name='user_last_name_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
+
 SEX_CHOICES = [
     ('Male', 'Male'),
     ('Female', 'Female'),
@@ -66,6 +81,8 @@ SEX_CHOICES = [
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     image = models.ImageField(upload_to='users/images/', blank=True, null=True)
+    # Resized copies of `image`, {variant: {ext: path}}, built by users/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     age = models.IntegerField(default=18)
     portfolio = models.URLField(blank=True, null=True)
     sex = models.CharField(choices=SEX_CHOICES, max_length=10, default="Male")
@@ -98,4 +115,90 @@ class RoleChangeRequest(models.Model):
 
     class Meta:
         verbose_name = "Role Change Request"
-        verbose_name_plural = "Role Change Requests"
\ No newline at end of file
+        verbose_name_plural = "Role Change Requests"
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='revoked_tokens')
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.email} - {self.jti}"
+
+    class Meta:
+        verbose_name = "Revoked Token"
+        verbose_name_plural = "Revoked Tokens"
+
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = (
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(help_text="List of recipient addresses")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{', '.join(self.to)} - {self.subject} ({self.status})"
+
+    class Meta:
+        verbose_name = "Email Outbox"
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    # Running totals over an author's recipes, kept up to date by
+    # recipe/signals.py; rebuild with `manage.py rebuild_author_stats`
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='author_stats')
+    recipe_count = models.IntegerField(default=0)
+    reaction_count = models.IntegerField(default=0)
+    save_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    average_rating = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Stats of {self.user_id}"
+
+    class Meta:
+        verbose_name = "Author Stats"
+        verbose_name_plural = "Author Stats"
+        indexes = [
+            models.Index(fields=['-reaction_count', 'user'], name='author_top_reactions_idx'),
+            models.Index(fields=['-save_count', 'user'], name='author_top_saves_idx'),
+            models.Index(fields=['-recipe_count', 'user'], name='author_top_recipes_idx'),
+            models.Index(fields=['-average_rating', 'user'], name='author_top_rating_idx'),
+        ]
+
+
+class MediaBlob(models.Model):
+    # One stored file per distinct content, named by its SHA-256; see
+    # users/storage.py. Unreferenced blobs are removed by `manage.py gc_media`.
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+        indexes = [
+            models.Index(fields=['refcount', 'created_at'], name='blob_orphan_idx'),
+        ]
@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """Record an email to be sent by the `send_outbox` worker.
+
+    Call it inside the same transaction as the change that triggers the
+    email, so the row only exists if that change was committed.
+    """
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim_batch(batch_size):
+    # Push the claimed rows' next_attempt_at forward by a lease; a worker
+    # that dies mid-batch leaves them to be retried once it expires.
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    ids = list(
+        EmailOutbox.objects.filter(status='Pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    EmailOutbox.objects.filter(id__in=ids, status='Pending', next_attempt_at__lte=now).update(
+        next_attempt_at=lease_until
+    )
+    return list(EmailOutbox.objects.filter(id__in=ids, next_attempt_at=lease_until).order_by('id'))
+
+
+def prune_sent():
+    """Delete sent emails older than EMAIL_OUTBOX_RETENTION_SECONDS.
+
+    Returns the number of rows deleted.
+    """
+    retention = getattr(settings, 'EMAIL_OUTBOX_RETENTION_SECONDS', 7 * 24 * 3600)
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = EmailOutbox.objects.filter(status='Sent', sent_at__lt=cutoff).delete()
+    return deleted
+
+
+def send_batch(batch_size=50):
+    """Send one batch of due emails over a single SMTP connection.
+
+    Returns (sent, failed) counts for the batch.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error("Could not open email connection: %s", e)
+        connection = None
+
+    for email in emails:
+        email.attempts += 1
+        try:
+            if connection is None:
+                raise ConnectionError("no email connection")
+            message = EmailMessage(
+                subject=email.subject, body=email.body, from_email=email.from_email,
+                to=email.to, connection=connection,
+            )
+            message.send()
+        except Exception as e:
+            failed += 1
+            email.last_error = str(e)
+            if email.attempts >= max_attempts:
+                email.status = 'Failed'
+                logger.error("Giving up on email %s to %s after %s attempts: %s",
+                             email.id, email.to, email.attempts, e)
+            else:
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                logger.warning("Email %s to %s failed (attempt %s), retrying at %s: %s",
+                               email.id, email.to, email.attempts, email.next_attempt_at, e)
+        else:
+            sent += 1
+            email.status = 'Sent'
+            email.sent_at = timezone.now()
+            email.last_error = ''
+        email.save(update_fields=['attempts', 'status', 'next_attempt_at', 'last_error', 'sent_at'])
+
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
@@ -8,21 +8,20 @@ class RoleBasedPermission(permissions.BasePermission):
         self.allowed_roles = allowed_roles or []
 
     def has_permission(self, request, view):
-        logger.info(f"User: {request.user}, Role: {getattr(request.user, 'role', 'Not set')}, Email: {getattr(request.user, 'email', 'Not set')}")
         if not request.user or not request.user.is_authenticated:
             logger.warning("Unauthenticated user attempted to access a role-based endpoint")
             return False
         user_role = getattr(request.user, 'role', None)
         if user_role is None:
-            logger.error(f"User {getattr(request.user, 'email', 'Unknown')} has no role assigned")
+            logger.error("User %s has no role assigned", getattr(request.user, 'email', 'Unknown'))
             return False
         has_permission = user_role in self.allowed_roles
         if not has_permission:
-            logger.warning(f"User {getattr(request.user, 'email', 'Unknown')} with role {user_role} "
-                          f"attempted to access endpoint requiring roles {self.allowed_roles}")
+            logger.warning("User %s with role %s attempted to access endpoint requiring roles %s",
+                           getattr(request.user, 'email', 'Unknown'), user_role, self.allowed_roles)
         else:
-            logger.info(f"User {getattr(request.user, 'email', 'Unknown')} with role {user_role} "
-                       f"granted access to endpoint")
+            logger.debug("User %s with role %s granted access to endpoint",
+                         getattr(request.user, 'email', 'Unknown'), user_role)
         return has_permission
 
 
@@ -0,0 +1,174 @@
+import hashlib
+import math
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "auth:revocation:version"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 64)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def cache_is_shared():
+    # locmem is per process (and dummy stores nothing): a counter kept there
+    # never reaches the other workers
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _jti_key(jti):
+    return f"jti:{jti}"
+
+
+def _user_key(user_id):
+    return f"user:{user_id}"
+
+
+class RevocationFilter:
+    """Per-process Bloom filter in front of the revocation tables.
+
+    Holds every revoked, unexpired jti and every user whose tokens were cut
+    off by a watermark. A miss (the common case) needs no I/O at all; a hit
+    is confirmed against the database. Other processes notice new entries
+    through a version counter in the cache, polled at most every
+    TOKEN_REVOCATION_CHECK_SECONDS. Without a shared cache (no CACHE_URL)
+    the version is read from the revocation tables instead, one query per
+    poll.
+
+    Every read goes to the primary: a rebuild from a lagging replica would
+    miss a fresh revocation yet record the new version, and keep
+    accepting the token until the next one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _current_version(self):
+        if not cache_is_shared():
+            return self._database_version()
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+            cache.add(VERSION_KEY, version, None)
+            version = cache.get(VERSION_KEY, version)
+        return version
+
+    def _database_version(self):
+        from .models import RevokedToken, User
+
+        # Both only grow when something is revoked; expired rows being
+        # deleted needs no rebuild
+        return (
+            RevokedToken.objects.using(DEFAULT_DB_ALIAS).aggregate(version=Max('id'))['version'],
+            User.objects.using(DEFAULT_DB_ALIAS).aggregate(version=Max('tokens_valid_after'))['version'],
+        )
+
+    def _rebuild(self, version):
+        from .models import RevokedToken, User
+
+        now = timezone.now()
+        jtis = list(RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(expires_at__gt=now).values_list('jti', flat=True))
+        # Watermarks older than the longest access token can no longer match
+        horizon = now - settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']
+        user_ids = list(User.objects.using(DEFAULT_DB_ALIAS).filter(tokens_valid_after__gt=horizon).values_list('id', flat=True))
+
+        bloom = BloomFilter(capacity=(len(jtis) + len(user_ids)) * 2 + 1000)
+        for jti in jtis:
+            bloom.add(_jti_key(jti))
+        for user_id in user_ids:
+            bloom.add(_user_key(user_id))
+        self._bloom = bloom
+        self._version = version
+        logger.debug("Rebuilt revocation filter: %d tokens, %d users", len(jtis), len(user_ids))
+
+    def _ensure_fresh(self):
+        interval = getattr(settings, 'TOKEN_REVOCATION_CHECK_SECONDS', 5)
+        if self._bloom is not None and time.monotonic() - self._checked_at < interval:
+            return
+        with self._lock:
+            version = self._current_version()
+            if self._bloom is None or version != self._version:
+                self._rebuild(version)
+            self._checked_at = time.monotonic()
+
+    def _bump(self, *keys):
+        version = None
+        if cache_is_shared():
+            try:
+                version = cache.incr(VERSION_KEY)
+            except ValueError:
+                cache.set(VERSION_KEY, time.time_ns(), None)
+        with self._lock:
+            if self._bloom is not None:
+                if version is not None and self._version == version - 1:
+                    # Nobody else wrote in between; our filter is up to date
+                    self._version = version
+                for key in keys:
+                    self._bloom.add(key)
+
+    def is_revoked(self, token, user):
+        from .models import RevokedToken, User
+
+        self._ensure_fresh()
+        bloom = self._bloom
+        jti = token.get(settings.SIMPLE_JWT['JTI_CLAIM'])
+        if jti and _jti_key(jti) in bloom:
+            if RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(jti=jti).exists():
+                return True
+        if _user_key(user.pk) in bloom:
+            # Read it fresh: the request user may come from another worker's cache
+            watermark = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user.pk).values_list('tokens_valid_after', flat=True).first()
+            issued_at = token.get('iat')
+            if watermark and issued_at is not None:
+                return datetime.fromtimestamp(issued_at, tz=dt_timezone.utc) < watermark
+        return False
+
+    def revoke_token(self, token, user):
+        from .models import RevokedToken
+
+        jti = token[settings.SIMPLE_JWT['JTI_CLAIM']]
+        expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+        RevokedToken.objects.get_or_create(jti=jti, defaults={'user': user, 'expires_at': expires_at})
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self._bump(_jti_key(jti))
+
+    def revoke_user_tokens(self, user):
+        # Token iat has second precision, so round up: every token issued in
+        # this second is cut off, including a re-login in the same second
+        user.tokens_valid_after = timezone.now().replace(microsecond=0) + timedelta(seconds=1)
+        user.save(update_fields=['tokens_valid_after'])
+        self._bump(_user_key(user.pk))
+
+
+revocation_filter = RevocationFilter()
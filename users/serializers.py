@@ -1,10 +1,12 @@
 import logging
 from rest_framework import serializers
-from .models import User, UserProfile, RoleChangeRequest
+from .models import User, UserProfile, RoleChangeRequest, AuthorStats
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
+from django.db import transaction
+from .images import variant_urls
+from .outbox import queue_email
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +18,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
-        fields = ["image", "age", "portfolio", "sex", "bio", "facebook", "user"]
+        fields = ["image", "image_variants", "age", "portfolio", "sex", "bio", "facebook", "user"]
         extra_kwargs = {
             "image": {"required": False},
             "portfolio": {"required": False},
@@ -27,6 +30,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "age": {"required": False, "allow_null": True},
         }
 
+    def get_image_variants(self, obj):
+        # None until the background job has built them
+        return variant_urls(obj.image_variants, self.context.get('request'))
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuthorStats
+        fields = ["recipe_count", "reaction_count", "save_count", "rating_count", "average_rating"]
+
+EMPTY_AUTHOR_STATS = dict(AuthorStatsSerializer(AuthorStats()).data)
+
+def author_stats_data(user):
+    try:
+        return AuthorStatsSerializer(user.author_stats).data
+    except AuthorStats.DoesNotExist:
+        return EMPTY_AUTHOR_STATS
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=8)
 
@@ -45,12 +65,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("This email is already registered.")
         return value.lower()
 
+    @transaction.atomic
     def create(self, validated_data):
         password = validated_data.pop("password")
         user = User(**validated_data)
         user.set_password(password)
         user.save()
-        logger.info(f"User {user.email} saved successfully")
+        logger.info("User %s saved successfully", user.email)
 
         # Email verification
         token = default_token_generator.make_token(user)
@@ -58,26 +79,30 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         confirm_link = f"https://recipe-drf.onrender.com/accounts/activate/{uid}/{token}/"  
         # confirm_link = f"http://127.0.0.1:8000/users/activate/{uid}/{token}/"  
         
-        send_mail(
+        queue_email(
             subject="Verify Your Email",
             message=f"Please click this link to verify your email: {confirm_link}",
             from_email="Recipe Hub <no-reply@recipehub.com>",
             recipient_list=[user.email],
         )
-        logger.info(f"Verification email sent to {user.email}")
+        logger.info("Verification email queued for %s", user.email)
         return user
 
 class UserFullSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer()
+    stats = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True, required=False)
 
     class Meta:
         model = User
-        fields = ["email", "firstName", "lastName", "mobile", "role", "profile", "password"]
+        fields = ["email", "firstName", "lastName", "mobile", "role", "profile", "stats", "password"]
         extra_kwargs = {
             "email": {"read_only": True},
         }
 
+    def get_stats(self, obj):
+        return author_stats_data(obj)
+
     def update(self, instance, validated_data):
         profile_data = validated_data.pop("profile", {})
         password = validated_data.pop("password", None)
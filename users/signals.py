@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from .models import UserProfile
+from .authentication import invalidate_cached_user
+from .images import delete_variants, schedule_variants
+from .storage import release
+from django.db import transaction
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,7 +16,45 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created and not hasattr(instance, 'profile'):
         try:
             profile = UserProfile.objects.create(user=instance)
-            logger.info(f"Created UserProfile for user {instance.email}, profile ID: {profile.id}")
+            logger.info("Created UserProfile for user %s, profile ID: %s", instance.email, profile.id)
         except Exception as e:
-            logger.error(f"Failed to create UserProfile for user {instance.email}: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error("Failed to create UserProfile for user %s: %s", instance.email, e)
+            raise
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # Role updates, admin approvals and profile edits all end in user.save().
+    # Dropped after commit, or a request in between could cache the old row
+    # again until the entry expires.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+@receiver(pre_save, sender=UserProfile)
+def remember_profile_image(sender, instance, **kwargs):
+    # A new image makes the current variants stale; they are deleted once
+    # the replacements are scheduled
+    previous = None
+    if instance.pk:
+        previous = UserProfile.objects.filter(pk=instance.pk).values('image', 'image_variants').first()
+    old_image = (previous or {}).get('image') or ''
+    instance._image_changed = (instance.image.name or '') != old_image
+    if instance._image_changed:
+        instance._previous_image = old_image
+        instance._stale_variants = (previous or {}).get('image_variants')
+        instance.image_variants = {}
+
+@receiver(post_save, sender=UserProfile)
+def build_profile_image_variants(sender, instance, **kwargs):
+    if getattr(instance, '_image_changed', False):
+        instance._image_changed = False
+        # After commit, so a rollback leaves the old image referenced
+        previous = instance._previous_image
+        transaction.on_commit(lambda: release(previous))
+        schedule_variants(instance.pk, getattr(instance, '_stale_variants', None))
+
+@receiver(post_delete, sender=UserProfile)
+def delete_profile_image_variants(sender, instance, **kwargs):
+    image = instance.image.name
+    transaction.on_commit(lambda: release(image))
+    transaction.on_commit(lambda: delete_variants(instance.image_variants))
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = 'blobs/'
+
+# Callables yielding storage names referenced outside FileFields (e.g. the
+# profile image variants in a JSONField); gc_media counts them as well.
+REFERENCE_SOURCES = []
+
+
+def reference_source(func):
+    REFERENCE_SOURCES.append(func)
+    return func
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIR)
+
+
+def blob_name(digest, original):
+    ext = os.path.splitext(original)[1].lower()[:10]
+    return f"{BLOB_DIR}{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def add_reference(name, size):
+    from .models import MediaBlob
+    if MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=size, refcount=1)
+    except IntegrityError:
+        # Someone else stored the same content meanwhile
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop one reference to a blob; the file stays until gc_media."""
+    from .models import MediaBlob
+    if is_blob(name):
+        MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Filesystem storage that keeps each distinct file once.
+
+    Files are stored as blobs/ab/cd/<sha256><ext>, whatever name they were
+    uploaded under, so identical uploads share one file. Every save() adds a
+    reference to the MediaBlob row and delete() removes one; files nobody
+    references are removed by `manage.py gc_media`. Since a name always
+    means the same bytes, they can be cached forever (see serve_media).
+    Names saved by the previous storage keep working and are deleted as
+    usual.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name from the content. FileSystemStorage._save
+        # calls this again when its exclusive create finds the file, and
+        # retries forever with the same name; stop it instead (see _save)
+        if is_blob(name) and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        digest, size = hashlib.sha256(), 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+
+        name = blob_name(digest.hexdigest(), name)
+        if not self.exists(name):
+            try:
+                super()._save(name, content)
+            except FileExistsError:
+                # Lost a race with an identical upload; its copy is the same
+                pass
+        add_reference(name, size)
+        return name
+
+    def delete(self, name):
+        if is_blob(name):
+            release(name)
+        else:
+            super().delete(name)
+
+    def purge(self, name):
+        """Remove the file itself, whatever references remain."""
+        super().delete(name)
+
+
+def file_fields():
+    """(model, field name) for every FileField stored in the default storage."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and field.storage is default_storage:
+                yield model, field.name
+
+
+def referenced_names():
+    counts = Counter()
+    for model, field in file_fields():
+        counts.update(
+            model._default_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .values_list(field, flat=True).iterator()
+        )
+    for source in REFERENCE_SOURCES:
+        counts.update(source())
+    return counts
+
+
+def adopt_legacy_files(dry_run=False):
+    """Move files saved under their upload names into blobs.
+
+    Rows are pointed at the blob with .update(), and a legacy file is
+    deleted once no row refers to it any more. Returns the number of rows
+    moved.
+    """
+    moved = 0
+    for model, field in file_fields():
+        rows = (
+            model._default_manager.exclude(**{f'{field}__startswith': BLOB_DIR})
+            .exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .values_list('pk', field)
+        )
+        for pk, name in list(rows):
+            if not default_storage.exists(name):
+                logger.warning("%s %s refers to missing file %s", model._meta.label, pk, name)
+                continue
+            moved += 1
+            if dry_run:
+                continue
+            with default_storage.open(name, 'rb') as f:
+                blob = default_storage.save(name, f)
+            model._default_manager.filter(pk=pk, **{field: name}).update(**{field: blob})
+            if not model._default_manager.filter(**{field: name}).exists():
+                default_storage.purge(name)
+    return moved
+
+
+def collect_garbage(grace_seconds=None, dry_run=False):
+    """Recount blob references and delete blobs nobody references.
+
+    Refcounts are reset to the references actually found in the database,
+    which also repairs drift. The references are a snapshot, so a refcount
+    is only rewritten if it did not change meanwhile, and a blob is only
+    deleted if its refcount was already 0 before this run recounted it:
+    one referenced after the snapshot keeps its file. Blobs newer than the
+    grace period are kept, since their row may still be in an open
+    transaction. Blob files that
+    have no MediaBlob row (left by rolled-back uploads) are removed under
+    the same rule. Returns {"recounted", "deleted", "bytes", "strays"}.
+    """
+    from .models import MediaBlob
+    grace = grace_seconds if grace_seconds is not None else getattr(settings, 'MEDIA_GC_GRACE_SECONDS', 86400)
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    counts = referenced_names()
+    stats = {'recounted': 0, 'deleted': 0, 'bytes': 0, 'strays': 0}
+
+    known = set()
+    for pk, name, size, refcount, created_at in list(
+        MediaBlob.objects.values_list('id', 'name', 'size', 'refcount', 'created_at')
+    ):
+        known.add(name)
+        refs = counts.get(name, 0)
+        if refs != refcount:
+            stats['recounted'] += 1
+            if not dry_run:
+                MediaBlob.objects.filter(pk=pk, refcount=refcount).update(refcount=refs)
+        if refs or refcount or created_at > cutoff:
+            continue
+        stats['deleted'] += 1
+        stats['bytes'] += size
+        # Only if still unreferenced, in case an identical upload just landed
+        if not dry_run and MediaBlob.objects.filter(pk=pk, refcount=0).delete()[0]:
+            default_storage.purge(name)
+
+    for name, refs in counts.items():
+        if is_blob(name) and name not in known and default_storage.exists(name) and not dry_run:
+            # Referenced blob whose row was lost; restore it
+            MediaBlob.objects.get_or_create(name=name, defaults={'size': default_storage.size(name), 'refcount': refs})
+
+    root = default_storage.path(BLOB_DIR)
+    for directory, _, files in os.walk(root):
+        for file in files:
+            path = os.path.join(directory, file)
+            name = os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+            if name in known or name in counts or os.path.getmtime(path) > time.time() - grace:
+                continue
+            stats['strays'] += 1
+            stats['bytes'] += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+    return stats
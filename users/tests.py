@@ -1,3 +1,620 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadhandler import StopUpload
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from recipe_config.views import serve_media
+from . import storage
+from .authentication import CachedJWTAuthentication, user_cache_key
+from .importer import import_users, read_rows
+from .models import EmailOutbox, MediaBlob, User, UserProfile
+from .outbox import prune_sent, queue_email, send_batch
+from .revocation import RevocationFilter, revocation_filter
+from .uploads import BoundedImageUploadHandler
+from .views import UserDirectoryFilter
 
-# Create your tests here.
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_registration_queues_verification_email(self):
+        response = self.client.post('/accounts/register/', {
+            "email": "cook@example.com",
+            "firstName": "Jane",
+            "lastName": "Doe",
+            "password": "password123",
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = EmailOutbox.objects.get()
+        self.assertEqual(queued.to, ["cook@example.com"])
+        self.assertEqual(queued.status, 'Pending')
+
+    def test_send_otp_queues_email(self):
+        User.objects.create_user("cook@example.com", "password123", firstName="Jane", lastName="Doe")
+        response = self.client.post('/accounts/send-otp/', {"email": "cook@example.com"}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        otp = User.objects.get(email="cook@example.com").otp
+        self.assertIn(otp, EmailOutbox.objects.get().body)
+
+    def test_send_outbox_delivers_due_emails(self):
+        queue_email("One", "body", ["a@example.com"], from_email="no-reply@example.com")
+        queue_email("Two", "body", ["b@example.com"], from_email="no-reply@example.com")
+
+        call_command('send_outbox', '--once', stdout=mock.Mock())
+
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ["One", "Two"])
+        self.assertFalse(EmailOutbox.objects.exclude(status='Sent').exists())
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(3):
+            queue_email(f"Mail {i}", "body", ["a@example.com"])
+
+        with mock.patch('users.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(send_batch(), (3, 0))
+        get_connection.assert_called_once()
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = queue_email("Retry", "body", ["a@example.com"])
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError("smtp down")):
+            self.assertEqual(send_batch(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'Pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(send_batch(), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_batch(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_sent_emails_are_pruned_after_retention(self):
+        old, recent, pending = (queue_email(s, "otp 123456", ["a@example.com"]) for s in ("Old", "Recent", "Pending"))
+        EmailOutbox.objects.filter(pk=old.pk).update(status='Sent', sent_at=timezone.now() - timedelta(days=8))
+        EmailOutbox.objects.filter(pk=recent.pk).update(status='Sent', sent_at=timezone.now() - timedelta(days=6))
+        EmailOutbox.objects.filter(pk=pending.pk).update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune_sent(), 1)
+        self.assertEqual(set(EmailOutbox.objects.values_list('subject', flat=True)), {"Recent", "Pending"})
+
+        EmailOutbox.objects.filter(pk=recent.pk).update(sent_at=timezone.now() - timedelta(days=8))
+        out = io.StringIO()
+        with mock.patch('django.core.mail.EmailMessage.send'):
+            call_command('send_outbox', '--once', stdout=out)
+        self.assertIn("Deleted 1 sent emails", out.getvalue())
+
+    def test_gives_up_after_max_attempts(self):
+        email = queue_email("Broken", "body", ["a@example.com"])
+
+        with self.settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2), \
+                mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError("smtp down")):
+            send_batch()
+            EmailOutbox.objects.update(next_attempt_at=timezone.now())
+            send_batch()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'Failed')
+        self.assertEqual(email.last_error, "smtp down")
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersTests(TestCase):
+    CSV = (
+        "email,firstName,lastName,password,role\n"
+        "One@Example.com,Ada,One,password123,Chef\n"
+        "two@example.com,Bo,Two,,\n"
+        "bad-email,Cy,Three,password123,User\n"
+        "one@example.com,Ada,Again,password123,User\n"
+        "taken@example.com,Di,Four,password123,User\n"
+    )
+
+    def setUp(self):
+        # Registered with a capitalized local part; the import still sees it
+        User.objects.create_user("Taken@example.com", "password123", firstName="Old", lastName="User")
+
+    def test_import_creates_users_and_profiles(self):
+        progress = mock.Mock()
+        result = import_users(read_rows(self.CSV), batch_size=1, workers=1, progress=progress)
+
+        self.assertEqual(result["created"], 2)
+        self.assertEqual(result["skipped"], 1)
+        self.assertEqual([error["row"] for error in result["errors"]], [3, 4])
+        self.assertEqual(progress.call_args_list, [mock.call(1, 2), mock.call(2, 2)])
+
+        chef = User.objects.get(email="one@example.com")
+        self.assertEqual(chef.role, "Chef")
+        self.assertTrue(chef.check_password("password123"))
+        self.assertFalse(chef.is_verified)
+        self.assertFalse(User.objects.get(email="two@example.com").has_usable_password())
+        self.assertEqual(UserProfile.objects.filter(user__email__in=["one@example.com", "two@example.com"]).count(), 2)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.CSV)
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+
+        call_command('import_users', f.name, '--workers', '1', '--verified', stdout=out, stderr=io.StringIO())
+
+        self.assertIn("2 created, 1 already existed, 2 rejected", out.getvalue())
+        self.assertTrue(User.objects.get(email="two@example.com").is_verified)
+
+    def test_endpoint_is_admin_only(self):
+        user = User.objects.get(email="Taken@example.com")
+        client = APIClient()
+        client.force_authenticate(user)
+        upload = SimpleUploadedFile("users.csv", self.CSV.encode(), content_type="text/csv")
+        response = client.post('/accounts/import/', {"file": upload}, format='multipart')
+        self.assertEqual(response.status_code, 403)
+
+        user.role = 'Admin'
+        user.save()
+        upload.seek(0)
+        # No process pool inside a web request
+        with mock.patch("users.importer.ProcessPoolExecutor") as pool:
+            response = client.post('/accounts/import/', {"file": upload}, format='multipart')
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["created"], 2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin@example.com", "password123", firstName="Root", lastName="Admin", role="Admin")
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        revocation_filter._bloom = None
+
+    def get_profile(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client.get('/accounts/profile/')
+
+    def issued(self, user, seconds=0):
+        token = AccessToken.for_user(user)
+        token.set_iat(at_time=timezone.now() + timedelta(seconds=seconds))
+        return token
+
+    def test_logged_out_token_is_rejected(self):
+        token, other = self.issued(self.chef), self.issued(self.chef)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(client.post('/accounts/logout/').status_code, 200)
+        self.assertEqual(self.get_profile(token).status_code, 403)
+        # Only that token; the user's other sessions continue
+        self.assertEqual(self.get_profile(other).status_code, 200)
+
+    def test_demotion_rejects_older_tokens(self):
+        # Demoted a few seconds ago; PyJWT refuses tokens issued in the future
+        demoted_at = timezone.now() - timedelta(seconds=3)
+        older, same_second = self.issued(self.chef, -60), self.issued(self.chef, -3)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch("users.revocation.timezone.now", return_value=demoted_at):
+            response = client.put('/accounts/profile/chef@example.com/update-role/', {"role": "User"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_profile(older).status_code, 403)
+        self.assertEqual(self.get_profile(same_second).status_code, 403)
+        # A login after the demotion works, with the new role
+        response = self.get_profile(self.issued(self.chef))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["role"], "User")
+
+    def test_other_workers_see_revocations(self):
+        token = self.issued(self.chef)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backends = (
+            {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            # Shared between processes, like redis
+            {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name},
+        )
+        for backend in backends:
+            with self.subTest(backend=backend['BACKEND']), \
+                    override_settings(CACHES={'default': backend}, TOKEN_REVOCATION_CHECK_SECONDS=0):
+                here, elsewhere = RevocationFilter(), RevocationFilter()
+                self.assertFalse(elsewhere.is_revoked(token, self.chef))
+                here.revoke_token(token, self.chef)
+                self.assertTrue(elsewhere.is_revoked(token, self.chef))
+                token = self.issued(self.chef)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.chef = User.objects.create_user("chef@example.com", "password123", firstName="Ada", lastName="Chef", role="Chef")
+        token = AccessToken.for_user(self.chef)
+        self.request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def authenticate(self):
+        return CachedJWTAuthentication().authenticate(self.request)[0]
+
+    def test_served_from_cache(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.email, user.role), (self.chef.pk, "chef@example.com", "Chef"))
+        # Secrets are not cached; they load on access
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password("password123"))
+
+    def test_changes_apply_immediately(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chef.role = "User"
+            self.chef.save()
+        self.assertEqual(self.authenticate().role, "User")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chef.is_active = False
+            self.chef.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_evicted_after_commit(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.chef.role = "User"
+            self.chef.save()
+            # A request before the commit may still cache the old row
+            self.assertIsNotNone(cache.get(user_cache_key(self.chef.pk)))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(user_cache_key(self.chef.pk)))
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chef.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, "User not found"):
+            self.authenticate()
+
+
+class AllUsersViewTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin@example.com", "password123", firstName="Root", lastName="Admin", role="Admin")
+        User.objects.create_user("ada@example.com", "password123", firstName="Ada", lastName="Lovelace", role="Chef")
+        User.objects.filter(email="ada@example.com").update(is_verified=True)
+        User.objects.create_user("bob@example.com", "password123", firstName="Bob", lastName="Adams")
+        User.objects.create_user("cy@example.com", "password123", firstName="=HYPERLINK()", lastName="Cook")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def emails(self, response):
+        return [user["email"] for user in response.data["results"]["data"]]
+
+    def test_pages_by_cursor_without_per_row_profile_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/accounts/profile/all/', {"page_size": 2})
+        self.assertEqual(self.emails(response), ["cy@example.com", "bob@example.com"])
+        self.assertEqual(response.data["results"]["data"][0]["profile"]["age"], 18)
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(self.emails(response), ["ada@example.com", "admin@example.com"])
+        self.assertIsNone(response.data["next"])
+
+    def test_filters(self):
+        response = self.client.get('/accounts/profile/all/', {"role": "Chef"})
+        self.assertEqual(self.emails(response), ["ada@example.com"])
+        response = self.client.get('/accounts/profile/all/', {"is_verified": "false", "q": "AD"})
+        # "ad" matches admin@ by email and Bob Adams by last name
+        self.assertEqual(self.emails(response), ["bob@example.com", "admin@example.com"])
+        response = self.client.get('/accounts/profile/all/', {"role": "Owner"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prefix_search_ignores_email_case(self):
+        # create_user only lowercases the domain
+        User.objects.create_user("Taken@Example.com", "password123", firstName="Dee", lastName="Taken")
+        User.objects.filter(email="Taken@example.com").update(lastName="Other")
+        response = self.client.get('/accounts/profile/all/', {"q": "taken"})
+        self.assertEqual(self.emails(response), ["Taken@example.com"])
+        queryset = UserDirectoryFilter({"q": "taken"}, queryset=User.objects.all()).qs
+        self.assertIn("user_email_lower_idx", queryset.explain())
+
+    def test_prefix_search_uses_name_index(self):
+        queryset = UserDirectoryFilter({"q": "lov"}, queryset=User.objects.all()).qs
+        self.assertIn("user_last_name_lower_idx", queryset.explain())
+
+    def test_csv_export_streams_every_match(self):
+        response = self.client.get('/accounts/profile/all/', {"export": "csv", "is_verified": "false"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,email,firstName,lastName,mobile,role,is_verified,is_active,created_at,age,sex")
+        self.assertEqual([line.split(",")[1] for line in lines[1:]], ["admin@example.com", "bob@example.com", "cy@example.com"])
+        self.assertIn("'=HYPERLINK()", lines[3])
+
+    def test_streamed_page_matches_page(self):
+        params = {"page_size": 2, "is_verified": "false"}
+        expected = self.client.get('/accounts/profile/all/', {**params, "stream": "false"}).content
+        response = self.client.get('/accounts/profile/all/', {**params, "stream": "true"})
+        self.assertTrue(response.streaming)
+        # The links keep the stream parameter
+        self.assertEqual(b"".join(response.streaming_content), expected.replace(b"stream=false", b"stream=true"))
+
+    def test_json_export_streams_every_match(self):
+        response = self.client.get('/accounts/profile/all/', {"export": "json", "is_verified": "false"})
+        self.assertTrue(response.streaming)
+        body = json.loads(b"".join(response.streaming_content))
+        self.assertEqual((body["next"], body["previous"], body["results"]["status"]), (None, None, "success"))
+        self.assertEqual([user["email"] for user in body["results"]["data"]],
+                         ["admin@example.com", "bob@example.com", "cy@example.com"])
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(User.objects.get(email="bob@example.com"))
+        self.assertEqual(self.client.get('/accounts/profile/all/').status_code, 403)
+
+
+def jpeg_with_exif(size=(2000, 1000), color="orange"):
+    from PIL import Image
+    image = Image.new("RGB", size, color)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    exif[0x010F] = "Camera Maker"
+    out = io.BytesIO()
+    image.save(out, "JPEG", exif=exif)
+    return out.getvalue()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], PROFILE_IMAGE_WORKERS=0)
+class ProfileImageVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media = media.name
+        self.user = User.objects.create_user("ada@example.com", "password123", firstName="Ada", lastName="Lovelace")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name="me.jpg", color="orange"):
+        image = SimpleUploadedFile(name, jpeg_with_exif(color=color), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/accounts/profile/update/', {"profile.image": image}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_upload_builds_variants_after_commit(self):
+        from PIL import Image
+        response = self.upload()
+        # Rendered after the response, off the request path
+        self.assertIsNone(response.data["data"]["profile"]["image_variants"])
+
+        variants = UserProfile.objects.get(user=self.user).image_variants
+        self.assertEqual(set(variants), {"thumb", "card", "full"})
+        for name, longest in (("thumb", 96), ("card", 320), ("full", 1280)):
+            for ext, fmt in (("webp", "WEBP"), ("jpeg", "JPEG")):
+                with Image.open(os.path.join(self.media, variants[name][ext])) as image:
+                    self.assertEqual(image.format, fmt)
+                    # Orientation applied to the pixels, then dropped with the rest of EXIF
+                    self.assertEqual(image.size, (longest // 2, longest))
+                    self.assertEqual(len(image.getexif()), 0)
+
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        profile = self.client.get('/accounts/profile/').data["data"]["profile"]
+        self.assertEqual(profile["image_variants"]["thumb"]["webp"], f"/media/{variants['thumb']['webp']}")
+
+    def test_new_image_replaces_variants(self):
+        self.upload("first.jpg")
+        old = UserProfile.objects.get(user=self.user).image_variants
+        self.upload("second.jpg", color="teal")
+        new = UserProfile.objects.get(user=self.user).image_variants
+        self.assertNotEqual(new["thumb"]["jpeg"], old["thumb"]["jpeg"])
+        self.assertTrue(os.path.exists(os.path.join(self.media, new["thumb"]["jpeg"])))
+        # The old blobs are released, and removed by gc_media
+        self.assertEqual(MediaBlob.objects.get(name=old["thumb"]["jpeg"]).refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(name=new["thumb"]["jpeg"]).refcount, 1)
+
+    def test_backfill_command(self):
+        self.upload()
+        profile = UserProfile.objects.get(user=self.user)
+        UserProfile.objects.filter(pk=profile.pk).update(image_variants={})
+        out = io.StringIO()
+        call_command('build_profile_images', '--workers', '1', stdout=out)
+        self.assertIn("Done: 1 built, 0 failed", out.getvalue())
+        profile.refresh_from_db()
+        self.assertEqual(set(profile.image_variants), {"thumb", "card", "full"})
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], PROFILE_IMAGE_WORKERS=0)
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media = media.name
+        self.ada = User.objects.create_user("ada@example.com", "password123", firstName="Ada", lastName="Lovelace")
+        self.bob = User.objects.create_user("bob@example.com", "password123", firstName="Bob", lastName="Adams")
+
+    def set_image(self, user, data, name="me.jpg"):
+        profile = UserProfile.objects.get(user=user)
+        profile.image = SimpleUploadedFile(name, data, content_type="image/jpeg")
+        profile.save()
+        return profile.image.name
+
+    def test_identical_uploads_share_one_blob(self):
+        data = jpeg_with_exif()
+        first = self.set_image(self.ada, data, "brotherhood.jpg")
+        second = self.set_image(self.bob, data, "copy.jpg")
+        self.assertEqual(first, second)
+        self.assertRegex(first, r"^blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.set_image(self.bob, jpeg_with_exif(color="teal"))
+        # Released only once the new image is committed
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+        callbacks[0]()
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            UserProfile.objects.filter(user=self.ada).delete()
+        callbacks[0]()
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.media, first)))
+
+    def test_blobs_are_served_immutable_with_ranges(self):
+        name = self.set_image(self.ada, jpeg_with_exif())
+        size = os.path.getsize(os.path.join(self.media, name))
+        response = self.client.get(f"/media/{name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(len(body), size)
+
+        response = self.client.get(f"/media/{name}", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(f"/media/{name}", headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{size}")
+        self.assertEqual(b"".join(response.streaming_content), body[10:20])
+        response = self.client.get(f"/media/{name}", headers={"Range": "bytes=-5"})
+        self.assertEqual(b"".join(response.streaming_content), body[-5:])
+        response = self.client.get(f"/media/{name}", headers={"Range": f"bytes={size}-"})
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, f"bytes */{size}"))
+        # A partial copy of another version gets the whole file
+        response = self.client.get(f"/media/{name}", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_legacy_files_and_traversal(self):
+        os.makedirs(os.path.join(self.media, "users/images"))
+        with open(os.path.join(self.media, "users/images/old.jpg"), "wb") as f:
+            f.write(b"jpeg")
+        response = self.client.get("/media/users/images/old.jpg")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        with self.assertRaises(Http404):
+            serve_media(RequestFactory().get("/media/"), "../manage.py")
+        self.assertEqual(self.client.post("/media/users/images/old.jpg").status_code, 405)
+
+    def test_gc_and_adopt(self):
+        os.makedirs(os.path.join(self.media, "users/images"))
+        data = jpeg_with_exif()
+        for user, name in ((self.ada, "brotherhood.jpg"), (self.bob, "brotherhood_copy.jpg")):
+            with open(os.path.join(self.media, "users/images", name), "wb") as f:
+                f.write(data)
+            UserProfile.objects.filter(user=user).update(image=f"users/images/{name}")
+        orphan = self.set_image(self.ada, jpeg_with_exif(color="teal"))
+        UserProfile.objects.filter(user=self.ada).update(image="users/images/brotherhood.jpg")
+        stray = os.path.join(self.media, "blobs/00/00/stray.jpg")
+        os.makedirs(os.path.dirname(stray))
+        open(stray, "wb").close()
+
+        out = io.StringIO()
+        call_command("gc_media", "--adopt", "--grace", "0", stdout=out)
+        self.assertIn("2 legacy files moved into blobs", out.getvalue())
+        # Recounted to 0 by this run, deleted by the next
+        self.assertEqual(MediaBlob.objects.get(name=orphan).refcount, 0)
+        call_command("gc_media", "--grace", "0", stdout=out)
+        names = set(UserProfile.objects.values_list("image", flat=True))
+        self.assertEqual(len(names), 1)
+        [blob] = names
+        self.assertEqual(MediaBlob.objects.get(name=blob).refcount, 2)
+        self.assertFalse(os.path.exists(os.path.join(self.media, "users/images/brotherhood.jpg")))
+        self.assertFalse(MediaBlob.objects.filter(name=orphan).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media, orphan)))
+        self.assertFalse(os.path.exists(stray))
+        self.assertTrue(os.path.exists(os.path.join(self.media, blob)))
+
+    def test_save_racing_an_identical_upload(self):
+        data = jpeg_with_exif()
+        name = self.set_image(self.ada, data)
+        # The blob appears between the exists() check and the exclusive create
+        with mock.patch.object(default_storage, "exists", side_effect=[False, True]):
+            self.assertEqual(self.set_image(self.bob, data, "copy.jpg"), name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
+
+    def test_gc_keeps_blob_referenced_after_snapshot(self):
+        name = self.set_image(self.ada, jpeg_with_exif())
+        UserProfile.objects.filter(user=self.ada).update(image="")
+        MediaBlob.objects.filter(name=name).update(refcount=0)
+        snapshot = storage.referenced_names
+
+        def referenced_names():
+            counts = snapshot()
+            # An identical upload lands right after the references were read
+            storage.add_reference(name, 0)
+            return counts
+
+        with mock.patch.object(storage, "referenced_names", referenced_names):
+            storage.collect_garbage(grace_seconds=0)
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+        self.assertTrue(os.path.exists(os.path.join(self.media, name)))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], PROFILE_IMAGE_WORKERS=0)
+class BoundedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = User.objects.create_user("ada@example.com", "password123", firstName="Ada", lastName="Lovelace")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def put(self, data, name="me.jpg", **fields):
+        image = SimpleUploadedFile(name, data, content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(
+                '/accounts/profile/update/', {"profile.image": image, **fields}, format='multipart'
+            )
+
+    def assertRejected(self, response, status_code):
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response.data["status"], "failed")
+        self.assertIn("image", response.data["errors"]["profile"])
+        self.assertFalse(UserProfile.objects.get(user=self.user).image)
+
+    def test_valid_upload_is_saved(self):
+        response = self.put(jpeg_with_exif(), **{"profile.bio": "Hi"})
+        self.assertEqual(response.status_code, 200)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertTrue(profile.image)
+        self.assertEqual(profile.bio, "Hi")
+
+    def test_oversized_upload_is_rejected(self):
+        data = jpeg_with_exif()
+        with override_settings(PROFILE_IMAGE_MAX_BYTES=len(data) - 1):
+            self.assertRejected(self.put(data), 413)
+
+    def test_oversized_request_is_rejected_before_reading_the_body(self):
+        with override_settings(PROFILE_IMAGE_MAX_BYTES=1024, DATA_UPLOAD_MAX_MEMORY_SIZE=1024):
+            self.assertRejected(self.put(jpeg_with_exif()), 413)
+
+    def test_non_image_is_rejected(self):
+        self.assertRejected(self.put(b"#!/bin/sh\necho hello\n" * 100, "me.jpg"), 400)
+
+    def test_truncated_image_is_rejected(self):
+        self.assertRejected(self.put(jpeg_with_exif()[:200]), 400)
+
+    def test_too_many_pixels_is_rejected(self):
+        with override_settings(PROFILE_IMAGE_MAX_PIXELS=1000 * 1000):
+            self.assertRejected(self.put(jpeg_with_exif((2000, 1000))), 400)
+
+    def test_rejects_on_first_chunk(self):
+        data = jpeg_with_exif((4000, 4000))
+        with override_settings(PROFILE_IMAGE_MAX_PIXELS=1000):
+            handler = BoundedImageUploadHandler()
+            handler.new_file("profile.image", "me.jpg", "image/jpeg", len(data))
+            self.addCleanup(handler.file.close)
+            with self.assertRaises(StopUpload):
+                handler.receive_data_chunk(data[:handler.chunk_size], 0)
+        # Nothing but the header was looked at
+        self.assertEqual(handler.file.tell(), 0)
+        self.assertEqual(handler.error[0], "profile.image")
@@ -0,0 +1,131 @@
+import io
+import logging
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import QueryDict
+from django.template.defaultfilters import filesizeformat
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+from rest_framework import status
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of each accepted format, checked on the first chunk
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+# How much of the file may be buffered while looking for the dimensions;
+# JPEGs with large EXIF blocks put them after up to 64 KiB of metadata
+HEADER_BYTES = 256 * 1024
+
+
+def sniff_format(head):
+    for signature, fmt in SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """Stream image uploads to a temporary file and reject bad ones early.
+
+    The request is refused before its body is read when Content-Length
+    alone exceeds the limit. Otherwise each file is checked as it arrives:
+    the first chunk must start with a known image signature, the
+    dimensions are read from the header before the rest of the body, and
+    parsing stops as soon as the file passes PROFILE_IMAGE_MAX_BYTES or its
+    width * height passes PROFILE_IMAGE_MAX_PIXELS. At most HEADER_BYTES of
+    a file are ever held in memory. After parsing, `error` holds the
+    (field name, UploadRejected) that stopped it, or None.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, 'PROFILE_IMAGE_MAX_BYTES', 5 * 1024 * 1024)
+        self.max_pixels = getattr(settings, 'PROFILE_IMAGE_MAX_PIXELS', 24_000_000)
+        self.error = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Form fields are capped separately by DATA_UPLOAD_MAX_MEMORY_SIZE
+        limit = self.max_bytes + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0)
+        if content_length > limit:
+            self.error = (None, self.too_large())
+            # Handled: nothing parsed, the body is never read
+            return QueryDict(), MultiValueDict()
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.head = b''
+        self.format = None
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        try:
+            if start + len(raw_data) > self.max_bytes:
+                raise self.too_large()
+            if not self.checked:
+                self.inspect(raw_data)
+        except UploadRejected as e:
+            self.reject(e)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            try:
+                self.inspect(b'', complete=True)
+            except UploadRejected as e:
+                self.reject(e)
+        return super().file_complete(file_size)
+
+    def inspect(self, data, complete=False):
+        self.head += data
+        if self.format is None:
+            self.format = sniff_format(self.head)
+            if self.format is None:
+                raise UploadRejected("Upload a valid image (JPEG, PNG, GIF or WebP).")
+        try:
+            with Image.open(io.BytesIO(self.head)) as image:
+                fmt, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            raise self.too_many_pixels()
+        except (OSError, SyntaxError, ValueError):
+            # Header not complete yet
+            if complete or len(self.head) >= HEADER_BYTES:
+                raise UploadRejected("Upload a valid image. The file is corrupted or not an image.")
+            return
+        if fmt not in ALLOWED_FORMATS or fmt != self.format:
+            raise UploadRejected("Upload a valid image (JPEG, PNG, GIF or WebP).")
+        if width * height > self.max_pixels:
+            raise self.too_many_pixels()
+        self.checked = True
+        self.head = b''
+
+    def too_large(self):
+        return UploadRejected(
+            f"The image may be at most {filesizeformat(self.max_bytes)}.",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    def too_many_pixels(self):
+        return UploadRejected(f"The image may have at most {self.max_pixels:,} pixels.")
+
+    def reject(self, error):
+        logger.warning("Rejected upload %s (%s): %s", self.file_name, self.field_name, error.message)
+        self.error = (self.field_name, error)
+        # The parser deletes the temporary file; the rest of the body is
+        # read in chunks and discarded
+        raise StopUpload(connection_reset=False)
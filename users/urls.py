@@ -4,13 +4,16 @@ from .views import (
     VerifyOTPView, ResetPasswordView, UserProfileView, 
     UserProfileUpdateView, ValidatePasswordView,
     RoleChangeRequestView, AllUsersView, SpecificUserProfileView, 
-    UpdateUserRoleView, ActivateEmailView, ResendVerificationView, AccountsRootView
+    UpdateUserRoleView, ActivateEmailView, ResendVerificationView, AccountsRootView,
+    LogoutView, ImportUsersView, TopChefsView
 )
+from .async_views import AsyncUserProfileView
 
 urlpatterns = [
     path('', AccountsRootView.as_view(), name='accounts_root'),
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('login/', UserLoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('activate/<str:uidb64>/<str:token>/', ActivateEmailView.as_view(), name='activate'),
     path('resend-verification/', ResendVerificationView.as_view(), name='resend_verification'),
     path('send-otp/', SendOTPView.as_view(), name='send_otp'),
@@ -18,9 +21,12 @@ urlpatterns = [
     path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
     path('validate-password/', ValidatePasswordView.as_view(), name='validate_password'),
     path('profile/', UserProfileView.as_view(), name='profile'),
+    path('async/profile/', AsyncUserProfileView.as_view(), name='profile_async'),
     path('profile/update/', UserProfileUpdateView.as_view(), name='profile_update'),
     path('role-change-request/', RoleChangeRequestView.as_view(), name='request_role_change'),
     path('profile/all/', AllUsersView.as_view(), name='all_users'),
+    path('import/', ImportUsersView.as_view(), name='import_users'),
+    path('top-chefs/', TopChefsView.as_view(), name='top_chefs'),
     path('profile/<str:email>/', SpecificUserProfileView.as_view(), name='specific_user_profile'),
     path('profile/<str:email>/update-role/', UpdateUserRoleView.as_view(), name='update_user_role'),
 ]
\ No newline at end of file
@@ -1,10 +1,15 @@
+import csv
 import random
 import logging
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
-from django.core.mail import send_mail
-from django.http import HttpResponseRedirect
-from rest_framework import permissions
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django_filters.rest_framework import FilterSet, BooleanFilter, CharFilter, ChoiceFilter
+from rest_framework import pagination, permissions
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -13,10 +18,15 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .serializers import (
     UserRegistrationSerializer, UserProfileSerializer, UserFullSerializer,
-    RoleChangeRequestSerializer, RoleUpdateSerializer
+    RoleChangeRequestSerializer, RoleUpdateSerializer, AuthorStatsSerializer
 )
 from .permissions import role_based_permission_class
-from .models import RoleChangeRequest
+from .models import RoleChangeRequest, AuthorStats
+from .revocation import revocation_filter
+from .outbox import queue_email
+from .importer import import_users, read_rows
+from .uploads import BoundedImageUploadHandler
+from recipe_config.streaming import StreamingJSONResponse, batched, wants_stream
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
@@ -35,7 +45,7 @@ class UserRegistrationView(APIView):
             user = serializer.save()
             user.last_verification_sent = timezone.now()  # Set initial timestamp
             user.save()
-            logger.info(f"User registered with email {user.email} and role {user.role}")
+            logger.info("User registered with email %s and role %s", user.email, user.role)
             return Response(
                 {
                     "status": "success",
@@ -44,7 +54,7 @@ class UserRegistrationView(APIView):
                 status=status.HTTP_201_CREATED,
             )
         else:
-            logger.error(f"User registration failed: {serializer.errors}")
+            logger.error("User registration failed: %s", serializer.errors)
             return Response(
                 {"status": "Error", "message": "User Registration failed!", "errors": serializer.errors},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -102,23 +112,24 @@ class SendOTPView(APIView):
 
         try:
             otp = str(random.randint(1000, 9999))
-            user = User.objects.get(email=email)
-            user.otp = otp
-            user.save()
+            with transaction.atomic():
+                user = User.objects.get(email=email)
+                user.otp = otp
+                user.save()
 
-            send_mail(
-                subject="OTP for Password Reset",
-                message=f"Your OTP is {otp}",
-                from_email=settings.EMAIL_HOST_USER,  # Use the configured email
-                recipient_list=[email],
-            )
-            logger.info(f"OTP {otp} sent to {email}")
+                queue_email(
+                    subject="OTP for Password Reset",
+                    message=f"Your OTP is {otp}",
+                    from_email=settings.EMAIL_HOST_USER,  # Use the configured email
+                    recipient_list=[email],
+                )
+            logger.info("OTP queued for %s", email)
             return Response(
                 {"status": "success", "message": "OTP Sent Successfully"},
                 status=status.HTTP_200_OK,
             )
         except Exception as e:
-            logger.error(f"Failed to send OTP to {email}: {str(e)}")
+            logger.error("Failed to send OTP to %s: %s", email, e)
             return Response(
                 {"status": "error", "message": "Failed to send OTP. Please try again later."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -205,14 +216,14 @@ class ActivateEmailView(APIView):
 
         if user is not None and default_token_generator.check_token(user, token):
             if user.is_verified:
-                logger.info(f"Email already verified for {user.email}")
+                logger.info("Email already verified for %s", user.email)
                 return HttpResponseRedirect(f"{settings.FRONTEND_URL}/login?verified=already")
             user.is_verified = True
             user.save()
-            logger.info(f"Email verified for {user.email}")
+            logger.info("Email verified for %s", user.email)
             return HttpResponseRedirect(f"{settings.FRONTEND_URL}/login?verified=true")
         else:
-            logger.error(f"Invalid activation link for uidb64={uidb64}, token={token}")
+            logger.error("Invalid activation link for uidb64=%s, token=%s", uidb64, token)
             return HttpResponseRedirect(f"{settings.FRONTEND_URL}/login?verified=failed")
 
 class ResendVerificationView(APIView):
@@ -261,21 +272,22 @@ class ResendVerificationView(APIView):
             confirm_link = f"https://recipe-drf.onrender.com/accounts/activate/{uid}/{token}/"
             # confirm_link = f"http://127.0.0.1:8000/users/activate/{uid}/{token}/"
             try:
-                send_mail(
-                    subject="Verify Your Email",
-                    message=f"Please click this link to verify your email: {confirm_link}",
-                    from_email=settings.EMAIL_HOST_USER,  # Use the configured email
-                    recipient_list=[user.email],
-                )
-                user.last_verification_sent = timezone.now()
-                user.save()
-                logger.info(f"Verification email resent to {user.email}")
+                with transaction.atomic():
+                    queue_email(
+                        subject="Verify Your Email",
+                        message=f"Please click this link to verify your email: {confirm_link}",
+                        from_email=settings.EMAIL_HOST_USER,  # Use the configured email
+                        recipient_list=[user.email],
+                    )
+                    user.last_verification_sent = timezone.now()
+                    user.save()
+                logger.info("Verification email queued for %s", user.email)
                 return Response(
                     {"status": "success", "message": "Verification email resent successfully"},
                     status=status.HTTP_200_OK,
                 )
             except Exception as e:
-                logger.error(f"Failed to resend verification email to {user.email}: {str(e)}")
+                logger.error("Failed to resend verification email to %s: %s", user.email, e)
                 return Response(
                     {"status": "error", "message": "Failed to resend verification email. Please try again later."},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -289,6 +301,12 @@ class ResendVerificationView(APIView):
 class UserProfileUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be in place before DRF parses the body
+        self.upload_handler = BoundedImageUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
     @swagger_auto_schema(
         operation_description="Update the authenticated user's profile.",
         request_body=UserFullSerializer,
@@ -296,12 +314,28 @@ class UserProfileUpdateView(APIView):
             200: openapi.Response('Updated user profile', UserFullSerializer),
             400: 'Bad Request',
             401: 'Unauthorized',
+            413: 'Image larger than PROFILE_IMAGE_MAX_BYTES',
         }
     )
     def put(self, request):
         user = request.user
 
         if "multipart/form-data" in request.headers.get("Content-Type", "").lower():
+            request.data  # parse now, so a rejected upload is known
+            if self.upload_handler.error:
+                field, error = self.upload_handler.error
+                field = field or "profile.image"
+                errors = {field: [error.message]}
+                if field.startswith("profile."):
+                    errors = {"profile": {field.split("profile.")[1]: [error.message]}}
+                return Response(
+                    {
+                        "status": "failed",
+                        "message": "Profile Update Failed",
+                        "errors": errors,
+                    },
+                    status=error.status_code,
+                )
             data = {}
             profile_data = {}
             for key, value in request.data.items():
@@ -315,12 +349,10 @@ class UserProfileUpdateView(APIView):
         else:
             data = request.data
 
-        logger.debug(f"Data to update: {data}")
-
         serializer = UserFullSerializer(user, data=data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            logger.info(f"User profile updated for {user.email}")
+            logger.info("User profile updated for %s", user.email)
             return Response(
                 {
                     "status": "success",
@@ -329,7 +361,7 @@ class UserProfileUpdateView(APIView):
                 },
                 status=status.HTTP_200_OK,
             )
-        logger.error(f"Profile update failed for {user.email}: {serializer.errors}")
+        logger.error("Profile update failed for %s: %s", user.email, serializer.errors)
         return Response(
             {
                 "status": "failed",
@@ -339,27 +371,188 @@ class UserProfileUpdateView(APIView):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+class LogoutView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if request.auth is None:
+            return Response(
+                {"status": "failed", "message": "Logout requires a bearer token"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        revocation_filter.revoke_token(request.auth, request.user)
+        logger.info("User %s logged out", request.user.email)
+        return Response(
+            {"status": "success", "message": "Logged out successfully"},
+            status=status.HTTP_200_OK,
+        )
+
+def prefix_range(value):
+    # Strings starting with `value` sort in [value, value with its last character bumped)
+    return value, value[:-1] + chr(ord(value[-1]) + 1)
+
+class UserDirectoryFilter(FilterSet):
+    role = ChoiceFilter(choices=User.ROLE_CHOICES)
+    is_verified = BooleanFilter()
+    q = CharFilter(method='filter_prefix')
+
+    class Meta:
+        model = User
+        fields = ['role', 'is_verified']
+
+    def filter_prefix(self, queryset, name, value):
+        value = value.strip().lower()
+        if not value:
+            return queryset
+        # Range comparisons rather than LIKE so the Lower() email and name
+        # indexes are used
+        low, high = prefix_range(value)
+        return queryset.alias(
+            email_lower=Lower('email'), first_lower=Lower('firstName'), last_lower=Lower('lastName')
+        ).filter(
+            Q(email_lower__gte=low, email_lower__lt=high) |
+            Q(first_lower__gte=low, first_lower__lt=high) |
+            Q(last_lower__gte=low, last_lower__lt=high)
+        )
+
+class UserDirectoryPagination(pagination.CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-id'
+
+class Echo:
+    # File-like object for csv.writer that hands each line back to the caller
+    def write(self, value):
+        return value
+
+def csv_safe(value):
+    # Keep spreadsheet apps from evaluating user-supplied names as formulas
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
 class AllUsersView(APIView):
     permission_classes = [permissions.IsAuthenticated, role_based_permission_class(allowed_roles=['Admin'])]
-
+    pagination_class = UserDirectoryPagination
+    EXPORT_COLUMNS = [
+        ('id', 'id'), ('email', 'email'), ('firstName', 'firstName'), ('lastName', 'lastName'),
+        ('mobile', 'mobile'), ('role', 'role'), ('is_verified', 'is_verified'), ('is_active', 'is_active'),
+        ('created_at', 'created_at'), ('profile__age', 'age'), ('profile__sex', 'sex'),
+    ]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('role', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(User.ROLE_RANK)),
+        openapi.Parameter('is_verified', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Email, first name or last name prefix'),
+        openapi.Parameter('export', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['csv', 'json'],
+                          description='Stream every matching user as CSV, or as JSON in a single page, instead of a page'),
+        openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                          description='Stream the page, encoding one user at a time'),
+    ])
     def get(self, request):
-        users = User.objects.all()
-        serializer = UserFullSerializer(users, many=True)
+        filterset = UserDirectoryFilter(request.query_params, queryset=User.objects.all(), request=request)
+        if not filterset.is_valid():
+            return Response(
+                {"status": "failed", "message": filterset.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        users = filterset.qs
+
+        if request.query_params.get("export") == "csv":
+            return self.export_csv(users)
+        if request.query_params.get("export") == "json":
+            return self.export_json(users)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(users.select_related('profile', 'author_stats'), request)
+        if wants_stream(request):
+            envelope = paginator.get_paginated_response(self.envelope()).data
+            return StreamingJSONResponse(self.user_items(page), envelope, path=('results', 'data'))
+        serializer = UserFullSerializer(page, many=True)
+        return paginator.get_paginated_response({
+            "status": "success",
+            "message": "Request Successful",
+            "data": serializer.data,
+        })
+
+    def export_csv(self, users):
+        fields = [field for field, _ in self.EXPORT_COLUMNS]
+        rows = users.order_by('id').values_list(*fields).iterator(chunk_size=2000)
+
+        def lines():
+            writer = csv.writer(Echo())
+            yield writer.writerow([header for _, header in self.EXPORT_COLUMNS])
+            for row in rows:
+                yield writer.writerow([csv_safe(value) for value in row])
+
+        response = StreamingHttpResponse(lines(), content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="users.csv"'
+        return response
+
+    def export_json(self, users):
+        # Shaped like a page holding every match, with no links
+        users = users.select_related('profile', 'author_stats').order_by('id').iterator(chunk_size=2000)
+        envelope = {"next": None, "previous": None, "results": self.envelope()}
+        response = StreamingJSONResponse(self.user_items(users), envelope, path=('results', 'data'))
+        response["Content-Disposition"] = 'attachment; filename="users.json"'
+        return response
+
+    def envelope(self):
+        return {"status": "success", "message": "Request Successful", "data": []}
+
+    def user_items(self, users):
+        for batch in batched(users, 500):
+            yield from UserFullSerializer(batch, many=True).data
+
+class ImportUsersView(APIView):
+    permission_classes = [permissions.IsAuthenticated, role_based_permission_class(allowed_roles=['Admin'])]
+    parser_classes = [MultiPartParser]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                          description='CSV with email, firstName, lastName[, password, mobile, role, is_verified]'),
+        openapi.Parameter('verified', openapi.IN_FORM, type=openapi.TYPE_BOOLEAN,
+                          description='Mark users verified unless the row says otherwise'),
+    ])
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"status": "failed", "message": "A CSV file is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            rows = read_rows(upload.read())
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response(
+                {"status": "failed", "message": f"Could not parse CSV: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        verified = str(request.data.get("verified", "")).lower() in ("1", "true", "yes")
+        # Hashed in this process: forking a threaded server for a pool is
+        # unsafe; big files belong in `manage.py import_users`
+        result = import_users(rows, workers=0, default_verified=verified)
+        logger.info("Admin %s imported %d users (%d skipped, %d rejected)",
+                    request.user.email, result["created"], result["skipped"], len(result["errors"]))
         return Response(
             {
                 "status": "success",
-                "message": "Request Successful",
-                "data": serializer.data,
+                "message": f"{result['created']} users imported",
+                "data": result,
             },
-            status=status.HTTP_200_OK,
+            status=status.HTTP_201_CREATED if result["created"] else status.HTTP_200_OK,
         )
 
 class SpecificUserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    read_replica = True
 
     def get(self, request, email):
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.select_related('profile', 'author_stats').get(email=email)
             serializer = UserFullSerializer(user)
             return Response(
                 {
@@ -375,6 +568,57 @@ class SpecificUserProfileView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+class TopChefsView(APIView):
+    # Public leaderboard; rows carry no contact details
+    permission_classes = [permissions.AllowAny]
+    ORDERINGS = {
+        'reactions': ('-reaction_count', 'user_id'),
+        'saves': ('-save_count', 'user_id'),
+        'recipes': ('-recipe_count', 'user_id'),
+        'rating': ('-average_rating', 'user_id'),
+    }
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(ORDERINGS)),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='At most 100'),
+    ])
+    def get(self, request):
+        ordering = request.query_params.get("ordering", "reactions")
+        if ordering not in self.ORDERINGS:
+            return Response(
+                {"status": "failed", "message": f"ordering must be one of {', '.join(self.ORDERINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 100)
+        except ValueError:
+            limit = 10
+
+        # Walks the matching author_top_*_idx index and stops after `limit`
+        stats = AuthorStats.objects.filter(
+            user__role__in=['Chef', 'Admin'], recipe_count__gt=0
+        ).select_related('user').order_by(*self.ORDERINGS[ordering])
+        if ordering == 'rating':
+            stats = stats.filter(rating_count__gt=0)
+        data = [
+            {
+                "id": row.user_id,
+                "firstName": row.user.firstName,
+                "lastName": row.user.lastName,
+                "role": row.user.role,
+                "stats": AuthorStatsSerializer(row).data,
+            }
+            for row in stats[:limit]
+        ]
+        return Response(
+            {
+                "status": "success",
+                "message": "Request Successful",
+                "data": data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 class ValidatePasswordView(APIView):
     @swagger_auto_schema(request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
@@ -425,7 +669,7 @@ class RoleChangeRequestView(APIView):
                 requested_role=serializer.validated_data['requested_role'],
                 reason=serializer.validated_data.get('reason', '')
             )
-            logger.info(f"Role change request submitted by {user.email} for role {serializer.validated_data['requested_role']}")
+            logger.info("Role change request submitted by %s for role %s", user.email, serializer.validated_data['requested_role'])
             return Response(
                 {"status": "success", "message": "Role change request submitted successfully"},
                 status=status.HTTP_201_CREATED,
@@ -437,6 +681,7 @@ class RoleChangeRequestView(APIView):
 
 class UserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    read_replica = True
 
     @swagger_auto_schema(
         operation_description="Retrieve the authenticated user's profile.",
@@ -464,7 +709,7 @@ class UpdateUserRoleView(APIView):
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
-            logger.warning(f"User with email {email} not found for role update")
+            logger.warning("User with email %s not found for role update", email)
             return Response(
                 {"status": "failed", "message": "User not found"},
                 status=status.HTTP_404_NOT_FOUND,
@@ -484,9 +729,13 @@ class UpdateUserRoleView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        demoted = User.ROLE_RANK[new_role] < User.ROLE_RANK[user.role]
         user.role = new_role
         user.save()
-        logger.info(f"User {user.email} role updated to {new_role} by admin {request.user.email}")
+        if demoted:
+            # Outstanding tokens were issued for the old role
+            revocation_filter.revoke_user_tokens(user)
+        logger.info("User %s role updated to %s by admin %s", user.email, new_role, request.user.email)
         return Response(
             {"status": "success", "message": f"User role updated to {new_role} successfully"},
             status=status.HTTP_200_OK,
@@ -501,6 +750,7 @@ class AccountsRootView(APIView):
         endpoints = {
             "register": request.build_absolute_uri(reverse("register")),
             "login": request.build_absolute_uri(reverse("login")),
+            "logout": request.build_absolute_uri(reverse("logout")),
             "activate": request.build_absolute_uri("accounts/activate/<str:uidb64>/<str:token>/"),
             "resend-verification": request.build_absolute_uri(reverse("resend_verification")),
             "send-otp": request.build_absolute_uri(reverse("send_otp")),
@@ -511,6 +761,8 @@ class AccountsRootView(APIView):
             "profile-update": request.build_absolute_uri(reverse("profile_update")),
             "role-change-request": request.build_absolute_uri(reverse("request_role_change")),
             "all-users": request.build_absolute_uri(reverse("all_users")),
+            "top-chefs": request.build_absolute_uri(reverse("top_chefs")),
+            "import-users": request.build_absolute_uri(reverse("import_users")),
             "specific-user-profile": request.build_absolute_uri("accounts/profile/<str:email>/"),
             "update-user-role": request.build_absolute_uri("accounts/profile/<str:email>/update-role/"),
         }